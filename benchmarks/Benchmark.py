@@ -0,0 +1,228 @@
+import datetime
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from birkett_lake_extract.benchmarks.LocalDaacServer import LocalDaacServer
+from birkett_lake_extract.benchmarks.SyntheticMOD44W import SyntheticMOD44W
+from birkett_lake_extract.model.CmrProcess import CmrProcess
+from birkett_lake_extract.model.LakeExtract import LakeExtract
+
+
+# -----------------------------------------------------------------------------
+# class Benchmark
+#
+# Times CmrProcess and every LakeExtract stage on synthetic MOD44W tiles
+# served by LocalDaacServer, for several lake sizes and year ranges. Each
+# case is appended as one JSON line to the results file so runs can be
+# compared over time with Benchmark.compare().
+# -----------------------------------------------------------------------------
+class Benchmark(object):
+
+    LAKE_NUMBER = '9000'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 workDir: str,
+                 resultsFile: str,
+                 label: str = '',
+                 numIslands: int = 3,
+                 shorelineComplexity: int = 6,
+                 crossTile: bool = False,
+                 repeats: int = 1,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._workDir = workDir
+        self._resultsFile = resultsFile
+        self._label = label or Benchmark._gitRevision()
+        self._numIslands = numIslands
+        self._shorelineComplexity = shorelineComplexity
+        self._crossTile = crossTile
+        self._repeats = repeats
+        self._logger = logger
+        os.makedirs(self._workDir, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # run()
+    # -------------------------------------------------------------------------
+    def run(self, lakeSizes: list, yearRanges: list) -> list:
+        """
+        Run every combination of lake radius (pixels) and (start, end) year
+        range. Returns the result records.
+        """
+        results = []
+
+        for lakeSize in lakeSizes:
+            tileDir = os.path.join(self._workDir, 'tiles',
+                                   self._caseName(lakeSize))
+            synthetic = SyntheticMOD44W(
+                tileDir,
+                lakeRadiusPx=lakeSize,
+                numIslands=self._numIslands,
+                shorelineComplexity=self._shorelineComplexity,
+                crossTile=self._crossTile)
+            allYears = range(min(r[0] for r in yearRanges),
+                             max(r[1] for r in yearRanges) + 1)
+            synthetic.writeYears(allYears)
+
+            with LocalDaacServer(tileDir, logger=self._logger) as server:
+                for startYear, endYear in yearRanges:
+                    for repeat in range(self._repeats):
+                        result = self._runCase(synthetic, server, lakeSize,
+                                               startYear, endYear)
+                        result['repeat'] = repeat
+                        self._write(result)
+                        results.append(result)
+
+        return results
+
+    # -------------------------------------------------------------------------
+    # _runCase()
+    # -------------------------------------------------------------------------
+    def _runCase(self, synthetic: SyntheticMOD44W, server: LocalDaacServer,
+                 lakeSize: int, startYear: int, endYear: int) -> dict:
+
+        bbox = synthetic.bbox()
+        outDir = os.path.join(self._workDir, 'output')
+        shutil.rmtree(outDir, ignore_errors=True)
+
+        if self._logger:
+            self._logger.info('Benchmarking lake radius {}px, {}-{}'.format(
+                lakeSize, startYear, endYear))
+
+        cmrSeconds = []
+        for year in range(startYear, endYear + 1):
+            cmrProcessor = CmrProcess(
+                mission=LakeExtract.MODSHORT,
+                dateTime=LakeExtract._getTemporalWindow(year=year),
+                lonLat=','.join(bbox),
+                baseUrl=server.cmrBaseUrl())
+            start = time.perf_counter()
+            cmrProcessor.run()
+            cmrSeconds.append(time.perf_counter() - start)
+
+        lakeExtract = LakeExtract(outDir=outDir,
+                                  bbox=bbox,
+                                  lakeNumber=Benchmark.LAKE_NUMBER,
+                                  startYear=startYear,
+                                  endYear=endYear,
+                                  logger=self._logger,
+                                  cmrBaseUrl=server.cmrBaseUrl())
+        start = time.perf_counter()
+        lakeExtract.extractLakes()
+        totalSeconds = time.perf_counter() - start
+        metrics = lakeExtract.getMetrics()
+
+        return {'label': self._label,
+                'timestamp': datetime.datetime.now().isoformat(),
+                'host': os.uname().nodename,
+                'case': self._caseName(lakeSize),
+                'lakeRadiusPx': lakeSize,
+                'numIslands': self._numIslands,
+                'shorelineComplexity': self._shorelineComplexity,
+                'crossTile': self._crossTile,
+                'startYear': startYear,
+                'endYear': endYear,
+                'cmrSecondsPerQuery': sum(cmrSeconds) / len(cmrSeconds),
+                'totalSeconds': totalSeconds,
+                'stages': metrics['stages'],
+                'commands': metrics['commands']}
+
+    # -------------------------------------------------------------------------
+    # _caseName()
+    # -------------------------------------------------------------------------
+    def _caseName(self, lakeSize: int) -> str:
+        return 'r{}.i{}.c{}{}'.format(lakeSize,
+                                      self._numIslands,
+                                      self._shorelineComplexity,
+                                      '.x' if self._crossTile else '')
+
+    # -------------------------------------------------------------------------
+    # _write()
+    # -------------------------------------------------------------------------
+    def _write(self, result: dict) -> None:
+
+        resultsDir = os.path.dirname(self._resultsFile)
+
+        if resultsDir:
+            os.makedirs(resultsDir, exist_ok=True)
+
+        with open(self._resultsFile, 'a') as outFile:
+            outFile.write(json.dumps(result, default=str) + '\n')
+
+    # -------------------------------------------------------------------------
+    # _gitRevision()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _gitRevision() -> str:
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
+
+    # -------------------------------------------------------------------------
+    # load()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def load(resultsFile: str) -> list:
+        with open(resultsFile) as inFile:
+            return [json.loads(line) for line in inFile if line.strip()]
+
+    # -------------------------------------------------------------------------
+    # compare()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def compare(resultsFile: str, baselineLabel: str, label: str) -> str:
+        """
+        Per case and stage, compare the median wall time of two labelled
+        runs. Returns a text table, ratios above 1 are slower than baseline.
+        """
+        results = Benchmark.load(resultsFile)
+        baseline = Benchmark._medians(results, baselineLabel)
+        current = Benchmark._medians(results, label)
+        lines = ['{:<28} {:<28} {:>10} {:>10} {:>7}'.format(
+            'case', 'stage', baselineLabel[:10], label[:10], 'ratio')]
+
+        for key in sorted(set(baseline) & set(current)):
+            ratio = current[key] / baseline[key] if baseline[key] else \
+                float('nan')
+            lines.append('{:<28} {:<28} {:>10.3f} {:>10.3f} {:>7.2f}'.format(
+                key[0], key[1], baseline[key], current[key], ratio))
+
+        return '\n'.join(lines)
+
+    # -------------------------------------------------------------------------
+    # _medians()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _medians(results: list, label: str) -> dict:
+
+        samples = {}
+
+        for result in results:
+            if result['label'] != label:
+                continue
+            case = '{}.{}-{}'.format(result['case'], result['startYear'],
+                                     result['endYear'])
+            samples.setdefault((case, 'total'), []).append(
+                result['totalSeconds'])
+            samples.setdefault((case, 'cmrQuery'), []).append(
+                result['cmrSecondsPerQuery'])
+            stageSeconds = {}
+            for record in result['stages']:
+                stageSeconds[record['stage']] = \
+                    stageSeconds.get(record['stage'], 0.0) + \
+                    record['wallSeconds']
+            for stage, seconds in stageSeconds.items():
+                samples.setdefault((case, stage), []).append(seconds)
+
+        return {key: sorted(values)[len(values) // 2]
+                for key, values in samples.items()}
@@ -0,0 +1,372 @@
+import filecmp
+import importlib
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import shutil
+import time
+
+import numpy as np
+from osgeo import gdal
+from osgeo import osr
+
+from birkett_lake_extract.benchmarks.LocalDaacServer import LocalDaacServer
+from birkett_lake_extract.model.LakeExtract import LakeExtract
+
+
+# -----------------------------------------------------------------------------
+# legacyEngine()
+#
+# The reference engine, the frozen baseline extractLakes pipeline, so the
+# reference does not move with LakeExtract. An engine is any importable
+# function with this signature that writes the final rasters to
+# <outDir>/final-buffered-rasters.
+# -----------------------------------------------------------------------------
+def legacyEngine(outDir: str, bbox: list, lakeNumber: str, startYear: int,
+                 endYear: int, cmrBaseUrl: str) -> None:
+
+    from birkett_lake_extract.benchmarks.BaselineLakeExtract \
+        import BaselineLakeExtract
+
+    lakeExtract = BaselineLakeExtract(outDir=outDir,
+                                      bbox=bbox,
+                                      lakeNumber=lakeNumber,
+                                      startYear=startYear,
+                                      endYear=endYear,
+                                      cmrBaseUrl=cmrBaseUrl)
+    lakeExtract.extractLakes()
+
+
+# -----------------------------------------------------------------------------
+# currentEngine()
+#
+# The current extractLakes pipeline, as a candidate to check against the
+# baseline.
+# -----------------------------------------------------------------------------
+def currentEngine(outDir: str, bbox: list, lakeNumber: str, startYear: int,
+                  endYear: int, cmrBaseUrl: str) -> None:
+
+    lakeExtract = LakeExtract(outDir=outDir,
+                              bbox=bbox,
+                              lakeNumber=lakeNumber,
+                              startYear=startYear,
+                              endYear=endYear,
+                              cmrBaseUrl=cmrBaseUrl)
+    lakeExtract.extractLakes()
+
+
+# -----------------------------------------------------------------------------
+# rasterMaskEngine()
+#
+# The current extractLakes pipeline cutting the years against the
+# rasterized lake mask rather than the cutline, which gdalwarp uses.
+# -----------------------------------------------------------------------------
+def rasterMaskEngine(outDir: str, bbox: list, lakeNumber: str,
+                     startYear: int, endYear: int, cmrBaseUrl: str) -> None:
+
+    lakeExtract = LakeExtract(outDir=outDir,
+                              bbox=bbox,
+                              lakeNumber=lakeNumber,
+                              startYear=startYear,
+                              endYear=endYear,
+                              cmrBaseUrl=cmrBaseUrl,
+                              cutlineMaxVertices=1)
+    lakeExtract.extractLakes()
+
+
+# -----------------------------------------------------------------------------
+# _runEngine()
+#
+# Child process entry point. Each engine runs in a fresh process so its
+# peak memory is measured on its own. The time excludes interpreter start
+# and imports.
+# -----------------------------------------------------------------------------
+def _runEngine(engine: str, kwargs: dict, queue) -> None:
+
+    engineFunction = GoldenHarness.loadEngine(engine)
+    start = time.perf_counter()
+
+    try:
+        engineFunction(**kwargs)
+        error = None
+
+    except Exception as e:
+        error = '{}: {}'.format(type(e).__name__, e)
+
+    peakRssKb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                    resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    queue.put({'error': error,
+               'seconds': time.perf_counter() - start,
+               'peakRssKb': peakRssKb})
+
+
+# -----------------------------------------------------------------------------
+# class GoldenHarness
+#
+# Runs a reference engine and a candidate engine on the same local inputs,
+# compares the lake_{n}_MOD44W_{year}_C6.tif outputs pixel by pixel and
+# checks the candidate's runtime and peak memory against the reference. Each
+# engine runs REPEATS times by default and the medians are compared, one
+# run is too noisy on a shared node.
+# Engines are named as 'package.module:function'.
+# -----------------------------------------------------------------------------
+class GoldenHarness(object):
+
+    LEGACY_ENGINE = 'birkett_lake_extract.benchmarks.GoldenHarness:' + \
+        'legacyEngine'
+    CURRENT_ENGINE = 'birkett_lake_extract.benchmarks.GoldenHarness:' + \
+        'currentEngine'
+    RASTER_MASK_ENGINE = 'birkett_lake_extract.benchmarks.GoldenHarness:' + \
+        'rasterMaskEngine'
+    FINAL_DIR = 'final-buffered-rasters'
+    NODATA = 3.0
+    REPEATS = 3
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 workDir: str,
+                 dataDir: str,
+                 bbox: list,
+                 startYear: int,
+                 endYear: int,
+                 lakeNumber: str = '9000',
+                 maxTimeRegression: float = 0.10,
+                 maxMemoryRegression: float = 0.10,
+                 repeats: int = REPEATS,
+                 logger: logging.Logger or None = None) -> None:
+
+        if repeats < 1:
+            raise RuntimeError('Repeats must be at least 1, got {}'.format(
+                repeats))
+
+        self._workDir = workDir
+        self._dataDir = dataDir
+        self._bbox = bbox
+        self._startYear = startYear
+        self._endYear = endYear
+        self._lakeNumber = lakeNumber
+        self._maxTimeRegression = maxTimeRegression
+        self._maxMemoryRegression = maxMemoryRegression
+        self._repeats = repeats
+        self._logger = logger
+
+    # -------------------------------------------------------------------------
+    # loadEngine()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def loadEngine(engine: str):
+        moduleName, functionName = engine.split(':')
+        return getattr(importlib.import_module(moduleName), functionName)
+
+    # -------------------------------------------------------------------------
+    # run()
+    # -------------------------------------------------------------------------
+    def run(self, candidate: str,
+            reference: str = LEGACY_ENGINE) -> dict:
+        """
+        Run both engines and compare them. The returned report has 'passed'
+        set to False if any output differs or the candidate regresses.
+        """
+        with LocalDaacServer(self._dataDir, logger=self._logger) as server:
+            referenceRun = self._timeEngine('reference', reference, server)
+            candidateRun = self._timeEngine('candidate', candidate, server)
+
+        failures = []
+
+        for name, engineRun in [('reference', referenceRun),
+                                ('candidate', candidateRun)]:
+            if engineRun['error']:
+                failures.append('{} engine failed: {}'.format(
+                    name, engineRun['error']))
+
+        if not failures:
+            failures += GoldenHarness.compareDirs(
+                os.path.join(referenceRun['outDir'], GoldenHarness.FINAL_DIR),
+                os.path.join(candidateRun['outDir'], GoldenHarness.FINAL_DIR))
+            failures += self._checkRegression(referenceRun, candidateRun)
+
+        report = {'passed': not failures,
+                  'failures': failures,
+                  'reference': referenceRun,
+                  'candidate': candidateRun}
+
+        if self._logger:
+            for failure in failures:
+                self._logger.info('FAIL: {}'.format(failure))
+            self._logger.info('Golden comparison {}'.format(
+                'passed' if report['passed'] else 'failed'))
+
+        return report
+
+    # -------------------------------------------------------------------------
+    # _timeEngine()
+    # -------------------------------------------------------------------------
+    def _timeEngine(self, name: str, engine: str,
+                    server: LocalDaacServer) -> dict:
+        """
+        Run an engine repeats times in child processes. Returns the median
+        wall time and peak RSS.
+        """
+        outDir = os.path.join(self._workDir, name)
+        kwargs = {'outDir': outDir,
+                  'bbox': self._bbox,
+                  'lakeNumber': self._lakeNumber,
+                  'startYear': self._startYear,
+                  'endYear': self._endYear,
+                  'cmrBaseUrl': server.cmrBaseUrl()}
+        context = multiprocessing.get_context('spawn')
+        seconds = []
+        peakRssKb = []
+        error = None
+
+        for _ in range(self._repeats):
+            shutil.rmtree(outDir, ignore_errors=True)
+            queue = context.Queue()
+            process = context.Process(target=_runEngine,
+                                      args=(engine, kwargs, queue))
+            process.start()
+            process.join()
+
+            try:
+                result = queue.get(timeout=5)
+            except queue_module.Empty:
+                result = {'error': 'Exited with code {}'.format(
+                    process.exitcode), 'seconds': 0, 'peakRssKb': 0}
+
+            seconds.append(result['seconds'])
+            peakRssKb.append(result['peakRssKb'])
+            error = error or result['error']
+
+        if self._logger:
+            self._logger.info('{} {}: {:.2f}s, {} KB peak RSS'.format(
+                name, engine, np.median(seconds), np.median(peakRssKb)))
+
+        return {'engine': engine,
+                'outDir': outDir,
+                'seconds': float(np.median(seconds)),
+                'peakRssKb': float(np.median(peakRssKb)),
+                'error': error}
+
+    # -------------------------------------------------------------------------
+    # _checkRegression()
+    # -------------------------------------------------------------------------
+    def _checkRegression(self, referenceRun: dict,
+                         candidateRun: dict) -> list:
+
+        failures = []
+        checks = [('seconds', 'Runtime', self._maxTimeRegression),
+                  ('peakRssKb', 'Peak memory', self._maxMemoryRegression)]
+
+        for key, label, threshold in checks:
+            limit = referenceRun[key] * (1.0 + threshold)
+            if candidateRun[key] > limit:
+                failures.append(
+                    '{} regressed: {:.1f} > {:.1f} ({:.0%} over {:.1f})'.
+                    format(label, candidateRun[key], limit, threshold,
+                           referenceRun[key]))
+
+        return failures
+
+    # -------------------------------------------------------------------------
+    # compareDirs()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def compareDirs(referenceDir: str, candidateDir: str) -> list:
+        """
+        Compare every raster of two output directories, and any other file
+        byte for byte. Returns a list of differences, empty when the outputs
+        are identical.
+        """
+        referenceFiles = sorted(os.listdir(referenceDir))
+        candidateFiles = sorted(os.listdir(candidateDir)) \
+            if os.path.isdir(candidateDir) else []
+        failures = []
+
+        for fileName in sorted(set(referenceFiles) - set(candidateFiles)):
+            failures.append('{} missing from candidate'.format(fileName))
+
+        for fileName in sorted(set(candidateFiles) - set(referenceFiles)):
+            failures.append('{} not in reference'.format(fileName))
+
+        for fileName in sorted(set(referenceFiles) & set(candidateFiles)):
+            referencePath = os.path.join(referenceDir, fileName)
+            candidatePath = os.path.join(candidateDir, fileName)
+
+            if fileName.endswith('.tif'):
+                failures += GoldenHarness.compareRasters(referencePath,
+                                                         candidatePath)
+
+            elif not filecmp.cmp(referencePath, candidatePath,
+                                 shallow=False):
+                failures.append('{} differs'.format(fileName))
+
+        return failures
+
+    # -------------------------------------------------------------------------
+    # compareRasters()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def compareRasters(referencePath: str, candidatePath: str) -> list:
+        """
+        Compare size, geotransform, projection, nodata value and every pixel
+        of two rasters.
+        """
+        name = os.path.basename(referencePath)
+        referenceDS = gdal.Open(referencePath)
+        candidateDS = gdal.Open(candidatePath)
+        failures = []
+
+        referenceShape = (referenceDS.RasterCount, referenceDS.RasterYSize,
+                          referenceDS.RasterXSize)
+        candidateShape = (candidateDS.RasterCount, candidateDS.RasterYSize,
+                          candidateDS.RasterXSize)
+        if referenceShape != candidateShape:
+            return ['{}: shape {} != {}'.format(name, candidateShape,
+                                                referenceShape)]
+
+        if referenceDS.GetGeoTransform() != candidateDS.GetGeoTransform():
+            failures.append('{}: geotransform {} != {}'.format(
+                name, candidateDS.GetGeoTransform(),
+                referenceDS.GetGeoTransform()))
+
+        referenceSRS = osr.SpatialReference(wkt=referenceDS.GetProjection())
+        candidateSRS = osr.SpatialReference(wkt=candidateDS.GetProjection())
+        if not referenceSRS.IsSame(candidateSRS):
+            failures.append('{}: projection differs'.format(name))
+
+        for bandNumber in range(1, referenceDS.RasterCount + 1):
+            referenceBand = referenceDS.GetRasterBand(bandNumber)
+            candidateBand = candidateDS.GetRasterBand(bandNumber)
+
+            if referenceBand.DataType != candidateBand.DataType:
+                failures.append('{}: band {} data type {} != {}'.format(
+                    name, bandNumber,
+                    gdal.GetDataTypeName(candidateBand.DataType),
+                    gdal.GetDataTypeName(referenceBand.DataType)))
+
+            if referenceBand.GetNoDataValue() != \
+                    candidateBand.GetNoDataValue():
+                failures.append('{}: band {} nodata {} != {}'.format(
+                    name, bandNumber, candidateBand.GetNoDataValue(),
+                    referenceBand.GetNoDataValue()))
+
+            referenceArray = referenceBand.ReadAsArray()
+            candidateArray = candidateBand.ReadAsArray()
+            differs = referenceArray != candidateArray
+
+            if differs.any():
+                nodataDiffers = differs & (
+                    (referenceArray == GoldenHarness.NODATA) |
+                    (candidateArray == GoldenHarness.NODATA))
+                failures.append(
+                    '{}: band {} {} pixels differ, {} of them nodata'.format(
+                        name, bandNumber, int(differs.sum()),
+                        int(nodataDiffers.sum())))
+
+        referenceDS = None
+        candidateDS = None
+        return failures
@@ -0,0 +1,273 @@
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import datetime
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from birkett_lake_extract.model.ModisGrid import ModisGrid
+
+
+# -----------------------------------------------------------------------------
+# class LocalDaacServer
+#
+# A local HTTP stand-in for CMR and LP DAAC. It answers the granule searches
+# CmrProcess sends with UMM JSON pointing back at itself and serves the
+# files in dataDir, so LakeExtract can run end to end without the network.
+# Given a token, it also stands in for the Earthdata Login token API and
+# serves files only to requests bearing that token.
+#
+# with LocalDaacServer(dataDir) as server:
+#     LakeExtract(..., cmrBaseUrl=server.cmrBaseUrl())
+# -----------------------------------------------------------------------------
+class LocalDaacServer(object):
+
+    SEARCH_PATH = '/search/granules.umm_json_v1_4'
+    DATA_PATH = '/data/'
+    TOKEN_PATH = '/api/users/find_or_create_token'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 dataDir: str,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 latency: float = 0.0,
+                 throttle: int = 0,
+                 token: str or None = None,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._dataDir = dataDir
+        self._latency = latency
+        self._throttle = throttle
+        self._token = token
+        self._logger = logger
+        self._requestCounts = {'search': 0, 'data': 0, 'throttled': 0,
+                               'token': 0}
+        self._countLock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port),
+                                           LocalDaacServer._makeHandler(self))
+        self._thread = None
+
+    # -------------------------------------------------------------------------
+    # __enter__
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        self.start()
+        return self
+
+    # -------------------------------------------------------------------------
+    # __exit__
+    # -------------------------------------------------------------------------
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.stop()
+
+    # -------------------------------------------------------------------------
+    # start()
+    # -------------------------------------------------------------------------
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # stop()
+    # -------------------------------------------------------------------------
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    # -------------------------------------------------------------------------
+    # baseUrl()
+    # -------------------------------------------------------------------------
+    def baseUrl(self) -> str:
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    # -------------------------------------------------------------------------
+    # cmrBaseUrl()
+    # -------------------------------------------------------------------------
+    def cmrBaseUrl(self) -> str:
+        """
+        The value to pass as CmrProcess baseUrl / LakeExtract cmrBaseUrl.
+        """
+        return self.baseUrl() + LocalDaacServer.SEARCH_PATH + '?'
+
+    # -------------------------------------------------------------------------
+    # requestCounts()
+    # -------------------------------------------------------------------------
+    def requestCounts(self) -> dict:
+        return dict(self._requestCounts)
+
+    # -------------------------------------------------------------------------
+    # search()
+    # -------------------------------------------------------------------------
+    def search(self, query: dict) -> dict:
+        """
+        Resolve a CMR granule search against the files in dataDir. Results
+        are returned on the first page only, as CMR does for MOD44W.
+        """
+        pageNum = int(query.get('page_num', ['1'])[0])
+        shortName = query.get('short_name', [''])[0]
+        items = []
+
+        if pageNum == 1:
+            bbox = list(map(float, query['bounding_box'][0].split(',')))
+            tiles = {ModisGrid.tileName(h, v)
+                     for h, v in ModisGrid.tilesForBbox(*bbox)}
+            years = LocalDaacServer._parseYears(query['temporal'][0])
+
+            for fileName in sorted(os.listdir(self._dataDir)):
+                parts = fileName.split('.')
+                if len(parts) < 3 or parts[0] != shortName:
+                    continue
+                if parts[2] in tiles and int(parts[1][1:5]) in years:
+                    items.append(self._umm(fileName, int(parts[1][1:5])))
+
+        return {'hits': len(items), 'items': items}
+
+    # -------------------------------------------------------------------------
+    # _parseYears()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _parseYears(temporal: str) -> range:
+        start, end = temporal.split(',')
+        return range(int(start[:4]), int(end[:4]) + 1)
+
+    # -------------------------------------------------------------------------
+    # _umm()
+    # -------------------------------------------------------------------------
+    def _umm(self, fileName: str, year: int) -> dict:
+        """
+        The subset of a UMM-G record that CmrProcess reads.
+        """
+        return {'umm': {
+            'RelatedUrls': [
+                {'URL': self.baseUrl() + LocalDaacServer.DATA_PATH + fileName,
+                 'Type': 'GET DATA'}],
+            'TemporalExtent': {'RangeDateTime': {
+                'BeginningDateTime': '{}-01-01T00:00:00.000Z'.format(year),
+                'EndingDateTime': '{}-12-31T23:59:59.000Z'.format(year)}},
+            'DataGranule': {
+                'DayNightFlag': 'Unspecified',
+                'ArchiveAndDistributionInformation': [
+                    {'Name': fileName,
+                     'SizeInBytes': os.path.getsize(
+                         os.path.join(self._dataDir, fileName))}]},
+            'SpatialExtent': {'HorizontalSpatialDomain': {}}}}
+
+    # -------------------------------------------------------------------------
+    # _count()
+    # -------------------------------------------------------------------------
+    def _count(self, key: str) -> None:
+        with self._countLock:
+            self._requestCounts[key] += 1
+
+    # -------------------------------------------------------------------------
+    # _isThrottled()
+    # -------------------------------------------------------------------------
+    def _isThrottled(self) -> bool:
+        """
+        Answer the first throttle data requests with 429, like an
+        overloaded LP DAAC.
+        """
+        with self._countLock:
+            if self._requestCounts['throttled'] >= self._throttle:
+                return False
+            self._requestCounts['throttled'] += 1
+            return True
+
+    # -------------------------------------------------------------------------
+    # _makeHandler()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeHandler(server):
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+
+                if server._latency:
+                    time.sleep(server._latency)
+
+                url = urlparse(self.path)
+
+                if url.path == LocalDaacServer.SEARCH_PATH:
+                    server._count('search')
+                    body = json.dumps(
+                        server.search(parse_qs(url.query))).encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                elif url.path.startswith(LocalDaacServer.DATA_PATH) and \
+                        server._isThrottled():
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+                elif url.path.startswith(LocalDaacServer.DATA_PATH) and \
+                        server._token and \
+                        self.headers.get('Authorization') != \
+                        'Bearer ' + server._token:
+                    self.send_error(401)
+
+                elif url.path.startswith(LocalDaacServer.DATA_PATH):
+                    server._count('data')
+                    fileName = os.path.basename(url.path)
+                    filePath = os.path.join(server._dataDir, fileName)
+                    if not os.path.isfile(filePath):
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type',
+                                     'application/octet-stream')
+                    self.send_header('Content-Length',
+                                     str(os.path.getsize(filePath)))
+                    self.send_header('Last-Modified', formatdate(
+                        os.path.getmtime(filePath), usegmt=True))
+                    self.end_headers()
+                    with open(filePath, 'rb') as inFile:
+                        shutil.copyfileobj(inFile, self.wfile)
+
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+
+                if self.path != LocalDaacServer.TOKEN_PATH or \
+                        not server._token or \
+                        not self.headers.get('Authorization', '').startswith(
+                            'Basic '):
+                    self.send_error(401)
+                    return
+
+                server._count('token')
+                expires = datetime.date.today() + datetime.timedelta(60)
+                body = json.dumps({
+                    'access_token': server._token,
+                    'token_type': 'Bearer',
+                    'expiration_date': expires.strftime('%m/%d/%Y')}).encode(
+                        'utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                if server._logger:
+                    server._logger.debug(format % args)
+
+        return Handler
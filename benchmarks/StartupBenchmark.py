@@ -0,0 +1,143 @@
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+
+# -----------------------------------------------------------------------------
+# class StartupBenchmark
+#
+# Times how long the command line applications take to answer requests that
+# need no raster processing, each in a fresh interpreter, and reports which
+# heavy geospatial modules they load. The eager geospatial import of
+# LakeExtract.warmUp() is timed as the baseline the lazy imports avoid.
+# -----------------------------------------------------------------------------
+class StartupBenchmark(object):
+
+    HEAVY_MODULES = ['osgeo', 'geopandas', 'core', 'pandas', 'shapely']
+
+    # Python statements timed in a fresh interpreter.
+    CASES = {
+        'interpreter': 'pass',
+        'importLakeExtract':
+            'from birkett_lake_extract.model.LakeExtract import LakeExtract',
+        'warmUp':
+            'from birkett_lake_extract.model.LakeExtract import LakeExtract;'
+            'LakeExtract.warmUp()',
+        'cliHelp':
+            'import sys; sys.argv = ["lakeExtractCLV", "-h"];'
+            'from birkett_lake_extract.view.lakeExtractCLV import main;'
+            'main()',
+        'cliBadArgs':
+            'import sys; sys.argv = ["lakeExtractCLV", "-lakenumber", "1",'
+            '"-bbox", "1", "2"];'
+            'from birkett_lake_extract.view.lakeExtractCLV import main;'
+            'main()',
+    }
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 resultsFile: str or None = None,
+                 label: str = '',
+                 repeats: int = 5,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._resultsFile = resultsFile
+        self._label = label
+        self._repeats = repeats
+        self._logger = logger
+
+    # -------------------------------------------------------------------------
+    # run()
+    # -------------------------------------------------------------------------
+    def run(self, cases: list or None = None) -> list:
+        """
+        Time each case and return one record per case with the median
+        seconds and the heavy modules it loaded.
+        """
+        results = []
+
+        for case in cases or list(StartupBenchmark.CASES):
+            statement = StartupBenchmark.CASES[case]
+            seconds = sorted(StartupBenchmark._time(statement)
+                             for _ in range(self._repeats))
+            result = {'label': self._label,
+                      'timestamp': datetime.datetime.now().isoformat(),
+                      'case': case,
+                      'seconds': seconds[len(seconds) // 2],
+                      'minSeconds': seconds[0],
+                      'heavyModules': StartupBenchmark.heavyModules(
+                          statement)}
+
+            if self._logger:
+                self._logger.info('{}: {:.3f}s, loads {}'.format(
+                    case, result['seconds'], result['heavyModules']))
+
+            if self._resultsFile:
+                with open(self._resultsFile, 'a') as outFile:
+                    outFile.write(json.dumps(result) + '\n')
+
+            results.append(result)
+
+        return results
+
+    # -------------------------------------------------------------------------
+    # heavyModules()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def heavyModules(statement: str) -> list or None:
+        """
+        The heavy top level modules loaded after running statement in a
+        fresh interpreter, None when the statement fails.
+        """
+        probe = '\n'.join([
+            'import json, sys',
+            'try:',
+            '    exec({!r})'.format(statement),
+            'except SystemExit:',
+            '    pass',
+            'print(json.dumps(sorted({{m.split(".")[0] for m in sys.modules}}'
+            ' & set({!r}))))'.format(StartupBenchmark.HEAVY_MODULES)])
+        process = subprocess.run([sys.executable, '-c', probe],
+                                 env=StartupBenchmark._environ(),
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL)
+
+        if process.returncode != 0:
+            return None
+
+        return json.loads(process.stdout.decode().strip().splitlines()[-1])
+
+    # -------------------------------------------------------------------------
+    # _time()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _time(statement: str) -> float:
+        """
+        Wall time of a fresh interpreter running statement. Exit statuses
+        are ignored, argument errors exit with 2 by design.
+        """
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement],
+                       env=StartupBenchmark._environ(),
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    # -------------------------------------------------------------------------
+    # _environ()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _environ() -> dict:
+        """
+        This interpreter's environment, with its module search path so the
+        child finds the package the same way.
+        """
+        environ = dict(os.environ)
+        environ['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+        return environ
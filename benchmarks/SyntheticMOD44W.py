@@ -0,0 +1,219 @@
+import logging
+import math
+import os
+
+import numpy as np
+from osgeo import gdal
+from osgeo import osr
+
+from birkett_lake_extract.model.ModisGrid import ModisGrid
+
+
+# -----------------------------------------------------------------------------
+# class SyntheticMOD44W
+#
+# Generates MOD44W-like water mask tiles containing one synthetic lake with
+# controllable size, island count and shoreline complexity. The lake can be
+# centered on a tile boundary so it spans two tiles. Files follow the MOD44W
+# naming convention so LakeExtract parses year and tile from them. With
+# fillPx, even years have a square of fill pixels, the band's nodata value,
+# at the lake center, which is water in the other years.
+# -----------------------------------------------------------------------------
+class SyntheticMOD44W(object):
+
+    LAND = 0
+    WATER = 1
+    FILL = 255
+    EXTENSIONS = {'GTiff': 'tif', 'HDF4Image': 'hdf'}
+    FILE_NAME = 'MOD44W.A{}001.{}.006.2018000000000.{}'
+
+    # Total relative amplitude of the shoreline harmonics.
+    SHORELINE_AMPLITUDE = 0.35
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 outDir: str,
+                 lakeRadiusPx: float = 50,
+                 numIslands: int = 0,
+                 shorelineComplexity: int = 0,
+                 crossTile: bool = False,
+                 center: tuple = (-122.1, 42.9),
+                 fileFormat: str = 'GTiff',
+                 seed: int = 0,
+                 fillPx: int = 0,
+                 logger: logging.Logger or None = None) -> None:
+
+        if fileFormat not in SyntheticMOD44W.EXTENSIONS:
+            raise RuntimeError('Unsupported format {}, expected one of {}'.
+                               format(fileFormat,
+                                      list(SyntheticMOD44W.EXTENSIONS)))
+
+        self._outDir = outDir
+        self._radius = lakeRadiusPx * ModisGrid.PIXEL_SIZE
+        self._fileFormat = fileFormat
+        self._fillPx = fillPx
+        self._logger = logger
+        os.makedirs(self._outDir, exist_ok=True)
+
+        rng = np.random.default_rng(seed)
+
+        self._centerX, self._centerY = ModisGrid.toSinusoidal(*center)
+        if crossTile:
+            h, _ = ModisGrid.tileOf(self._centerX, self._centerY)
+            self._centerX = ModisGrid.tileOrigin(h + 1, 0)[0]
+
+        self._harmonics = []
+        if shorelineComplexity > 0:
+            weights = 1.0 / np.arange(2, shorelineComplexity + 2)
+            amplitudes = SyntheticMOD44W.SHORELINE_AMPLITUDE * \
+                weights / weights.sum()
+            for k, amplitude in enumerate(amplitudes, start=2):
+                self._harmonics.append(
+                    (k, amplitude, rng.uniform(0, 2 * math.pi)))
+
+        self._islands = []
+        for _ in range(numIslands):
+            theta = rng.uniform(0, 2 * math.pi)
+            distance = rng.uniform(0.2, 0.5) * self._radius
+            islandRadius = max(rng.uniform(0.03, 0.08) * self._radius,
+                               ModisGrid.PIXEL_SIZE)
+            self._islands.append((distance * math.cos(theta),
+                                  distance * math.sin(theta),
+                                  islandRadius))
+
+    # -------------------------------------------------------------------------
+    # bbox()
+    # -------------------------------------------------------------------------
+    def bbox(self, marginPx: int = 10) -> list:
+        """
+        Lon/lat bounding box around the lake, in the string form the CLI
+        hands to LakeExtract.
+        """
+        half = self._maxRadius() + marginPx * ModisGrid.PIXEL_SIZE
+        corners = [ModisGrid.toLonLat(self._centerX + dx, self._centerY + dy)
+                   for dx in (-half, half) for dy in (-half, half)]
+        lons = [c[0] for c in corners]
+        lats = [c[1] for c in corners]
+        return [str(round(v, 5)) for v in
+                (min(lons), min(lats), max(lons), max(lats))]
+
+    # -------------------------------------------------------------------------
+    # tiles()
+    # -------------------------------------------------------------------------
+    def tiles(self) -> list:
+        half = self._maxRadius()
+        return sorted({ModisGrid.tileOf(self._centerX + dx,
+                                        self._centerY + dy)
+                       for dx in (-half, half) for dy in (-half, half)})
+
+    # -------------------------------------------------------------------------
+    # writeYears()
+    # -------------------------------------------------------------------------
+    def writeYears(self, years: list) -> list:
+        """
+        Write one tile per year for every tile the lake touches. Existing
+        files are kept. Returns the file paths.
+        """
+        filePaths = []
+        for year in years:
+            for h, v in self.tiles():
+                filePaths.append(self._writeTile(int(year), h, v))
+        return filePaths
+
+    # -------------------------------------------------------------------------
+    # _writeTile()
+    # -------------------------------------------------------------------------
+    def _writeTile(self, year: int, h: int, v: int) -> str:
+
+        fileName = SyntheticMOD44W.FILE_NAME.format(
+            year, ModisGrid.tileName(h, v),
+            SyntheticMOD44W.EXTENSIONS[self._fileFormat])
+        filePath = os.path.join(self._outDir, fileName)
+
+        if os.path.exists(filePath):
+            return filePath
+
+        image = np.full((ModisGrid.TILE_PIXELS, ModisGrid.TILE_PIXELS),
+                        SyntheticMOD44W.LAND, dtype=np.uint8)
+        transform = ModisGrid.geoTransform(h, v)
+        self._burnLake(image, transform, year)
+
+        srs = osr.SpatialReference()
+        srs.ImportFromProj4(ModisGrid.PROJ4)
+
+        options = ['COMPRESS=DEFLATE'] if self._fileFormat == 'GTiff' else []
+        driver = gdal.GetDriverByName(self._fileFormat)
+        ds = driver.Create(filePath,
+                           ModisGrid.TILE_PIXELS,
+                           ModisGrid.TILE_PIXELS,
+                           1,
+                           gdal.GDT_Byte,
+                           options=options)
+        ds.SetGeoTransform(transform)
+        ds.SetProjection(srs.ExportToWkt())
+        ds.GetRasterBand(1).WriteArray(image)
+
+        if self._fillPx:
+            ds.GetRasterBand(1).SetNoDataValue(SyntheticMOD44W.FILL)
+
+        ds = None
+        driver = None
+
+        if self._logger:
+            self._logger.debug('Wrote {}'.format(filePath))
+
+        return filePath
+
+    # -------------------------------------------------------------------------
+    # _burnLake()
+    # -------------------------------------------------------------------------
+    def _burnLake(self, image: np.ndarray, transform: tuple,
+                  year: int) -> None:
+        """
+        Set the lake pixels of one tile. Only the window around the lake is
+        evaluated. The lake radius varies slightly from year to year.
+        """
+        pixel = ModisGrid.PIXEL_SIZE
+        half = self._maxRadius()
+        col0 = max(int((self._centerX - half - transform[0]) // pixel), 0)
+        col1 = min(int((self._centerX + half - transform[0]) // pixel) + 1,
+                   image.shape[1])
+        row0 = max(int((transform[3] - self._centerY - half) // pixel), 0)
+        row1 = min(int((transform[3] - self._centerY + half) // pixel) + 1,
+                   image.shape[0])
+
+        if col0 >= col1 or row0 >= row1:
+            return
+
+        xs = transform[0] + (np.arange(col0, col1) + 0.5) * pixel
+        ys = transform[3] - (np.arange(row0, row1) + 0.5) * pixel
+        dx, dy = np.meshgrid(xs - self._centerX, ys - self._centerY)
+
+        theta = np.arctan2(dy, dx)
+        shoreline = np.ones_like(theta)
+        for k, amplitude, phase in self._harmonics:
+            shoreline += amplitude * np.cos(k * theta + phase)
+
+        radius = self._radius * (1.0 + 0.04 * math.sin(year))
+        water = np.hypot(dx, dy) <= radius * shoreline
+
+        for islandX, islandY, islandRadius in self._islands:
+            water &= np.hypot(dx - islandX, dy - islandY) > islandRadius
+
+        image[row0:row1, col0:col1][water] = SyntheticMOD44W.WATER
+
+        if self._fillPx and year % 2 == 0:
+            col = int((self._centerX - transform[0]) // pixel)
+            row = int((transform[3] - self._centerY) // pixel)
+            image[max(row, 0):max(row + self._fillPx, 0),
+                  max(col, 0):max(col + self._fillPx, 0)] = \
+                SyntheticMOD44W.FILL
+
+    # -------------------------------------------------------------------------
+    # _maxRadius()
+    # -------------------------------------------------------------------------
+    def _maxRadius(self) -> float:
+        amplitude = sum(h[1] for h in self._harmonics)
+        return self._radius * 1.04 * (1.0 + amplitude)
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+import argparse
+import logging
+import sys
+
+from birkett_lake_extract.benchmarks.Benchmark import Benchmark
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to benchmark LakeExtract on synthetic MOD44W tiles
+# served from a local CMR/LP DAAC stand-in, or to compare two labelled runs.
+#
+# Ex.
+# python benchmarkCLV.py -o bench -sizes 25 100 400 \
+#   -years 2001-2003 2001-2015 -label before
+# python benchmarkCLV.py -results bench/results.jsonl -compare before after
+# -------------------------------------------------------------------------
+def main() -> None:
+
+    desc = 'Use this application to benchmark LakeExtract on synthetic ' + \
+        'MOD44W tiles served from a local CMR/LP DAAC stand-in.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-o',
+                        default='benchmark',
+                        help='Path to the benchmark working directory')
+
+    parser.add_argument('-results',
+                        default=None,
+                        help='JSON lines file the results are appended to. ' +
+                        'Defaults to <o>/results.jsonl.')
+
+    parser.add_argument('-label',
+                        default='',
+                        help='Label of this run. Defaults to the git ' +
+                        'revision.')
+
+    parser.add_argument('-sizes',
+                        default=[25, 100, 400],
+                        nargs='+',
+                        type=int,
+                        help='Lake radii in pixels.')
+
+    parser.add_argument('-years',
+                        default=['2001-2003', '2001-2015'],
+                        nargs='+',
+                        help='Year ranges as <start>-<end>.')
+
+    parser.add_argument('-islands',
+                        default=3,
+                        type=int,
+                        help='Number of islands in the lake.')
+
+    parser.add_argument('-complexity',
+                        default=6,
+                        type=int,
+                        help='Number of shoreline harmonics.')
+
+    parser.add_argument('-crosstile',
+                        action='store_true',
+                        help='Center the lake on a tile boundary.')
+
+    parser.add_argument('-repeats',
+                        default=1,
+                        type=int,
+                        help='Number of times each case is run.')
+
+    parser.add_argument('-compare',
+                        default=None,
+                        nargs=2,
+                        metavar=('BASELINE', 'LABEL'),
+                        help='Compare two labelled runs in the results ' +
+                        'file instead of benchmarking.')
+
+    args = parser.parse_args()
+
+    resultsFile = args.results or '{}/results.jsonl'.format(args.o)
+
+    if args.compare:
+        print(Benchmark.compare(resultsFile, *args.compare))
+        return
+
+    yearRanges = []
+    for yearRange in args.years:
+        try:
+            start, end = map(int, yearRange.split('-'))
+        except ValueError:
+            parser.error('Invalid year range {}'.format(yearRange))
+        yearRanges.append((start, end))
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    benchmark = Benchmark(workDir=args.o,
+                          resultsFile=resultsFile,
+                          label=args.label,
+                          numIslands=args.islands,
+                          shorelineComplexity=args.complexity,
+                          crossTile=args.crosstile,
+                          repeats=args.repeats,
+                          logger=logger)
+
+    for result in benchmark.run(args.sizes, yearRanges):
+        logger.info('{} {}-{}: {:.2f}s'.format(result['case'],
+                                               result['startYear'],
+                                               result['endYear'],
+                                               result['totalSeconds']))
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+import argparse
+import json
+import logging
+import os
+import sys
+
+from birkett_lake_extract.benchmarks.GoldenHarness import GoldenHarness
+from birkett_lake_extract.benchmarks.SyntheticMOD44W import SyntheticMOD44W
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to check that an alternative LakeExtract engine
+# produces the same rasters as the frozen baseline pipeline without
+# regressing runtime or peak memory. Exits with 1 when the check fails.
+#
+# Ex.
+# python goldenCLV.py -o golden \
+#   -engine birkett_lake_extract.benchmarks.GoldenHarness:currentEngine
+# python goldenCLV.py -o golden \
+#   -engine birkett_lake_extract.some.module:someEngine -size 100
+# python goldenCLV.py -o golden -fill 5 \
+#   -engine birkett_lake_extract.benchmarks.GoldenHarness:rasterMaskEngine
+# python goldenCLV.py -o golden -engine <module:function> \
+#   -data /path/to/MOD44W -bbox -122.52 42.8 -121.69 43.05
+# -------------------------------------------------------------------------
+def main() -> int:
+
+    desc = 'Use this application to compare an alternative LakeExtract ' + \
+        'engine against the legacy pipeline.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-o',
+                        default='golden',
+                        help='Path to the working directory')
+
+    parser.add_argument('-engine',
+                        default=GoldenHarness.CURRENT_ENGINE,
+                        help='Candidate engine as package.module:function. ' +
+                        'Defaults to the current extractLakes pipeline.')
+
+    parser.add_argument('-reference',
+                        default=GoldenHarness.LEGACY_ENGINE,
+                        help='Reference engine as package.module:function. ' +
+                        'Defaults to the frozen baseline pipeline.')
+
+    parser.add_argument('-data',
+                        default=None,
+                        help='Directory of MOD44W granules to serve. ' +
+                        'Synthetic tiles are generated when omitted.')
+
+    parser.add_argument('-bbox',
+                        default=None,
+                        nargs='+',
+                        help='Bounding box of the lake, required with -data.')
+
+    parser.add_argument('-start',
+                        default=2001,
+                        type=int,
+                        help='Starting year.')
+
+    parser.add_argument('-end',
+                        default=2003,
+                        type=int,
+                        help='Ending year.')
+
+    parser.add_argument('-size',
+                        default=100,
+                        type=int,
+                        help='Synthetic lake radius in pixels.')
+
+    parser.add_argument('-islands',
+                        default=3,
+                        type=int,
+                        help='Synthetic lake island count.')
+
+    parser.add_argument('-complexity',
+                        default=6,
+                        type=int,
+                        help='Synthetic lake shoreline harmonics.')
+
+    parser.add_argument('-fill',
+                        default=0,
+                        type=int,
+                        help='Side, in pixels, of a square of fill values ' +
+                        'at the synthetic lake center in even years.')
+
+    parser.add_argument('-crosstile',
+                        action='store_true',
+                        help='Center the synthetic lake on a tile boundary.')
+
+    parser.add_argument('-time-threshold',
+                        default=0.10,
+                        type=float,
+                        help='Allowed runtime regression as a fraction.')
+
+    parser.add_argument('-memory-threshold',
+                        default=0.10,
+                        type=float,
+                        help='Allowed peak memory regression as a fraction.')
+
+    parser.add_argument('-repeats',
+                        default=GoldenHarness.REPEATS,
+                        type=int,
+                        help='Runs per engine, the median is compared.')
+
+    args = parser.parse_args()
+
+    if args.data and not args.bbox:
+        parser.error('-bbox is required with -data')
+
+    if args.repeats < 1:
+        parser.error('-repeats must be at least 1')
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    dataDir = args.data
+    bbox = args.bbox
+
+    if not dataDir:
+        dataDir = os.path.join(args.o, 'tiles')
+        synthetic = SyntheticMOD44W(dataDir,
+                                    lakeRadiusPx=args.size,
+                                    numIslands=args.islands,
+                                    shorelineComplexity=args.complexity,
+                                    crossTile=args.crosstile,
+                                    fillPx=args.fill,
+                                    logger=logger)
+        synthetic.writeYears(range(args.start, args.end + 1))
+        bbox = synthetic.bbox()
+
+    harness = GoldenHarness(workDir=args.o,
+                            dataDir=dataDir,
+                            bbox=bbox,
+                            startYear=args.start,
+                            endYear=args.end,
+                            maxTimeRegression=args.time_threshold,
+                            maxMemoryRegression=args.memory_threshold,
+                            repeats=args.repeats,
+                            logger=logger)
+
+    report = harness.run(args.engine, reference=args.reference)
+
+    with open(os.path.join(args.o, 'golden-report.json'), 'w') as outFile:
+        json.dump(report, outFile, indent=2)
+
+    return 0 if report['passed'] else 1
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+import argparse
+import logging
+import sys
+
+from birkett_lake_extract.benchmarks.StartupBenchmark import StartupBenchmark
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to time the startup of the command line applications
+# for requests that need no raster processing (help, argument errors) and to
+# list the heavy geospatial modules each one loads.
+#
+# Ex.
+# python startupCLV.py -repeats 10 -results startup.jsonl -label lazy
+# -------------------------------------------------------------------------
+def main() -> None:
+
+    desc = 'Use this application to time the startup of the LakeExtract ' + \
+        'command line applications.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-cases',
+                        default=None,
+                        nargs='+',
+                        choices=list(StartupBenchmark.CASES),
+                        help='Cases to time. Defaults to all.')
+
+    parser.add_argument('-repeats',
+                        default=5,
+                        type=int,
+                        help='Fresh interpreters per case, the median is ' +
+                        'reported.')
+
+    parser.add_argument('-results',
+                        default=None,
+                        help='JSON lines file to append the results to.')
+
+    parser.add_argument('-label',
+                        default='',
+                        help='Label of this run.')
+
+    args = parser.parse_args()
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    StartupBenchmark(resultsFile=args.results,
+                     label=args.label,
+                     repeats=args.repeats,
+                     logger=logger).run(args.cases)
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+
+# -----------------------------------------------------------------------------
+# class GoldenHarnessTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest benchmarks.tests.test_GoldenHarness
+# -----------------------------------------------------------------------------
+@unittest.skipIf(gdal is None, 'GDAL is not installed')
+class GoldenHarnessTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testRasterMaskFill
+    # -------------------------------------------------------------------------
+    def testRasterMaskFill(self):
+        from birkett_lake_extract.benchmarks.GoldenHarness import \
+            GoldenHarness
+        from birkett_lake_extract.benchmarks.SyntheticMOD44W import \
+            SyntheticMOD44W
+
+        with tempfile.TemporaryDirectory() as workDir:
+            dataDir = os.path.join(workDir, 'tiles')
+            synthetic = SyntheticMOD44W(dataDir,
+                                        lakeRadiusPx=40,
+                                        shorelineComplexity=6,
+                                        fillPx=5)
+            synthetic.writeYears([2001, 2002])
+
+            # Only the pixels are checked, the timings of one small lake
+            # are noise.
+            harness = GoldenHarness(workDir=workDir,
+                                    dataDir=dataDir,
+                                    bbox=synthetic.bbox(),
+                                    startYear=2001,
+                                    endYear=2002,
+                                    maxTimeRegression=float('inf'),
+                                    maxMemoryRegression=float('inf'),
+                                    repeats=1)
+            report = harness.run(GoldenHarness.RASTER_MASK_ENGINE)
+            self.assertEqual(report['failures'], [])
+
+            finalPath = os.path.join(
+                workDir, 'candidate', GoldenHarness.FINAL_DIR,
+                'lake_9000_MOD44W_2002_C6.tif')
+            values = gdal.Open(finalPath).ReadAsArray()
+            self.assertNotIn(SyntheticMOD44W.FILL, values)
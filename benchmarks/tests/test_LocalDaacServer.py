@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from birkett_lake_extract.benchmarks.LocalDaacServer import LocalDaacServer
+from birkett_lake_extract.model.ModisGrid import ModisGrid
+from birkett_lake_extract.model.CmrProcess import CmrProcess
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.EarthdataAuth import EarthdataAuth
+from birkett_lake_extract.model.libraries import daac_download
+from birkett_lake_extract.model.libraries.daac_download import httpdl
+from birkett_lake_extract.model.libraries.daac_download import setAuth
+from birkett_lake_extract.model.libraries.daac_download import setLimiter
+
+
+# -----------------------------------------------------------------------------
+# class LocalDaacServerTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest benchmarks.tests.test_LocalDaacServer
+# -----------------------------------------------------------------------------
+class LocalDaacServerTestCase(unittest.TestCase):
+
+    mission = 'MOD44W'
+    bbox = '-122.52,42.8,-121.69,43.05'
+    dateRange = '2001-01-01T00:00:00Z,2001-12-31T00:00:00Z'
+    fileNames = ['MOD44W.A2001001.h08v04.006.2018000000000.tif',
+                 'MOD44W.A2001001.h09v04.006.2018000000000.tif',
+                 'MOD44W.A2002001.h09v04.006.2018000000000.tif',
+                 'MOD44W.A2001001.h20v10.006.2018000000000.tif']
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.dataDir = os.path.join(self.tmpDir.name, 'data')
+        os.makedirs(self.dataDir)
+        for fileName in self.fileNames:
+            with open(os.path.join(self.dataDir, fileName), 'wb') as f:
+                f.write(b'\0' * 1024)
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testTilesForBbox
+    # -------------------------------------------------------------------------
+    def testTilesForBbox(self):
+        tiles = ModisGrid.tilesForBbox(*map(float, self.bbox.split(',')))
+        self.assertIn((8, 4), tiles)
+        self.assertIn((9, 4), tiles)
+        self.assertNotIn((20, 10), tiles)
+
+    # -------------------------------------------------------------------------
+    # testCmrSearch
+    # -------------------------------------------------------------------------
+    def testCmrSearch(self):
+        with LocalDaacServer(self.dataDir) as server:
+            urls = CmrProcess(mission=self.mission,
+                              dateTime=self.dateRange,
+                              lonLat=self.bbox,
+                              baseUrl=server.cmrBaseUrl()).run()
+        self.assertEqual([os.path.basename(url) for url in urls],
+                         self.fileNames[:2])
+
+    # -------------------------------------------------------------------------
+    # testDownload
+    # -------------------------------------------------------------------------
+    def testDownload(self):
+        downloadDir = os.path.join(self.tmpDir.name, 'download')
+        with LocalDaacServer(self.dataDir) as server:
+            url = server.baseUrl() + LocalDaacServer.DATA_PATH + \
+                self.fileNames[0]
+            status = httpdl(url, localpath=downloadDir)
+            self.assertEqual(server.requestCounts()['data'], 1)
+        self.assertEqual(status, 0)
+        self.assertEqual(os.path.getsize(
+            os.path.join(downloadDir, self.fileNames[0])), 1024)
+
+    # -------------------------------------------------------------------------
+    # testThrottledDownload
+    # -------------------------------------------------------------------------
+    def testThrottledDownload(self):
+        downloadDir = os.path.join(self.tmpDir.name, 'download')
+        limiter = DownloadLimiter(requestsPerSecond=100,
+                                  maxConcurrency=4,
+                                  backoffBase=0.01)
+        setLimiter(limiter)
+        try:
+            with LocalDaacServer(self.dataDir, throttle=2) as server:
+                url = server.baseUrl() + LocalDaacServer.DATA_PATH + \
+                    self.fileNames[0]
+                status = httpdl(url, localpath=downloadDir)
+                host = url.split('/')[2]
+                self.assertEqual(server.requestCounts()['data'], 1)
+        finally:
+            setLimiter(None)
+        self.assertEqual(status, 0)
+        self.assertEqual(limiter.getConcurrency(host), 1)
+        stats = limiter.getStats()
+        self.assertEqual(stats['retries'], {'429': 2})
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['bytes'], 1024)
+
+    # -------------------------------------------------------------------------
+    # testThrottledThenCurrent
+    # -------------------------------------------------------------------------
+    def testThrottledThenCurrent(self):
+        # A throttled attempt followed by one finding the local copy current
+        # succeeds, rather than returning the earlier 429.
+        downloadDir = os.path.join(self.tmpDir.name, 'download')
+        os.makedirs(downloadDir)
+        localFile = os.path.join(downloadDir, self.fileNames[0])
+        with open(localFile, 'wb') as f:
+            f.write(b'local')
+        os.utime(os.path.join(self.dataDir, self.fileNames[0]),
+                 (978307200, 978307200))
+        setLimiter(DownloadLimiter(requestsPerSecond=100,
+                                   backoffBase=0.01))
+        try:
+            with LocalDaacServer(self.dataDir, throttle=1) as server:
+                url = server.baseUrl() + LocalDaacServer.DATA_PATH + \
+                    self.fileNames[0]
+                status = httpdl(url, localpath=downloadDir)
+        finally:
+            setLimiter(None)
+        self.assertEqual(status, 0)
+        with open(localFile, 'rb') as f:
+            self.assertEqual(f.read(), b'local')
+
+    # -------------------------------------------------------------------------
+    # testTokenDownload
+    # -------------------------------------------------------------------------
+    def testTokenDownload(self):
+        downloadDir = os.path.join(self.tmpDir.name, 'download')
+        cacheFile = os.path.join(self.tmpDir.name, 'earthdata.json')
+        netrcFile = os.path.join(self.tmpDir.name, 'netrc')
+        with open(netrcFile, 'w') as f:
+            f.write('machine 127.0.0.1 login user password secret\n')
+
+        with LocalDaacServer(self.dataDir, token='abc') as server:
+            # A revoked token left in the cache is replaced on first use.
+            EarthdataAuth(cacheFile)._save(
+                {'token': 'revoked', 'expires': time.time() + 864000})
+            try:
+                for fileName in self.fileNames[:2]:
+                    # A new process each time: no session, a new auth.
+                    daac_download.obpgSession = None
+                    setAuth(EarthdataAuth(cacheFile,
+                                          ursUrl=server.baseUrl(),
+                                          netrcFile=netrcFile))
+                    url = server.baseUrl() + LocalDaacServer.DATA_PATH + \
+                        fileName
+                    self.assertEqual(httpdl(url, localpath=downloadDir), 0)
+            finally:
+                setAuth(None)
+                daac_download.obpgSession = None
+            counts = server.requestCounts()
+        self.assertEqual(counts['token'], 1)
+        self.assertEqual(counts['data'], 2)
+        with open(cacheFile) as f:
+            self.assertEqual(json.load(f)['token'], 'abc')
@@ -0,0 +1,29 @@
+import unittest
+
+from birkett_lake_extract.benchmarks.StartupBenchmark import StartupBenchmark
+
+
+# -----------------------------------------------------------------------------
+# class StartupBenchmarkTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest benchmarks.tests.test_StartupBenchmark
+# -----------------------------------------------------------------------------
+class StartupBenchmarkTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testNoHeavyImports
+    # -------------------------------------------------------------------------
+    def testNoHeavyImports(self):
+
+        for case in ('importLakeExtract', 'cliHelp', 'cliBadArgs'):
+            self.assertEqual(StartupBenchmark.heavyModules(
+                StartupBenchmark.CASES[case]), [], case)
+
+    # -------------------------------------------------------------------------
+    # testRun
+    # -------------------------------------------------------------------------
+    def testRun(self):
+        results = StartupBenchmark(repeats=1).run(['interpreter'])
+        self.assertEqual(results[0]['case'], 'interpreter')
+        self.assertGreater(results[0]['seconds'], 0)
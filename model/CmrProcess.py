@@ -7,6 +7,8 @@ import certifi
 import urllib3
 from urllib.parse import urlencode
 
+from birkett_lake_extract.model.libraries.daac_download import addNetworkBytes
+
 
 # -----------------------------------------------------------------------------
 # class CmrProcess
@@ -26,6 +28,8 @@ class CmrProcess(object):
     LATITUDE_RANGE = (-90, 90)
     LONGITUDE_RANGE = (-180, 180)
 
+    SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
@@ -37,8 +41,10 @@ class CmrProcess(object):
                  dayNightFlag: str = '',
                  pageSize: int = 150,
                  maxPages: int = 50,
-                 logger: logging.Logger or None = None) -> None:
+                 logger: logging.Logger or None = None,
+                 baseUrl: str or None = None) -> None:
 
+        self._baseUrl = baseUrl or CmrProcess.CMR_BASE_URL
         self._error = error
         self._dateTime = dateTime
         self._mission = mission
@@ -59,24 +65,42 @@ class CmrProcess(object):
         the most relevant file. This uses CMR to search metadata for
         relevant matches.
         """
+        return [granule['file_url'] for granule in self.runGranules()]
+
+    # -------------------------------------------------------------------------
+    # failed()
+    # -------------------------------------------------------------------------
+    def failed(self) -> bool:
+        """
+        True when a request of the search failed, so an empty result does
+        not mean that there are no granules.
+        """
+        return self._error
+
+    # -------------------------------------------------------------------------
+    # runGranules()
+    # -------------------------------------------------------------------------
+    def runGranules(self) -> list:
+        """
+        Same search as run(), returning the processed metadata of each
+        granule (file name, URL, size, ...) sorted by URL.
+        """
         if self._logger:
             self._logger.debug('Starting CMR query')
-        outout = set()
+        outout = dict()
         for i in range(self._maxPages):
 
             d, e = self._cmrQuery(pageNum=i+1)
 
             if e and i > 1:
-                return sorted(list(outout))
+                break
 
             if not e:
                 if self._logger:
                     self._logger.debug('Results found on page: {}'.format(i+1))
-                out = [r['file_url'] for r in d.values()]
-                outout.update(out)
+                outout.update({r['file_url']: r for r in d.values()})
 
-        outout = sorted(list(outout))
-        return outout
+        return [outout[url] for url in sorted(outout)]
 
     # -------------------------------------------------------------------------
     # cmrQuery()
@@ -129,7 +153,7 @@ class CmrProcess(object):
         with urllib3.PoolManager(cert_reqs='CERT_REQUIRED',
                                  ca_certs=certifi.where()) as httpPoolManager:
             encodedParameters = urlencode(requestDictionary, doseq=True)
-            requestUrl = self.CMR_BASE_URL + encodedParameters
+            requestUrl = self._baseUrl + encodedParameters
             if self._logger:
                 self._logger.debug(requestUrl)
             try:
@@ -139,6 +163,7 @@ class CmrProcess(object):
                 self._error = True
                 return 0, None
 
+            addNetworkBytes(len(requestResultPackage.data))
             requestResultData = json.loads(
                 requestResultPackage.data.decode('utf-8'))
             status = int(requestResultPackage.status)
@@ -152,6 +177,7 @@ class CmrProcess(object):
                     'Status: {}, Request URL: {}, Params: {}'.format(
                         str(status), requestUrl, encodedParameters)
                 warnings.warn(msg)
+                self._error = True
                 return 0, None
 
     # -------------------------------------------------------------------------
@@ -184,6 +210,7 @@ class CmrProcess(object):
             spatialExtent = hit['umm']['SpatialExten' +
                                        't']['HorizontalSpatialDom' +
                                             'ain']
+            sizeBytes = CmrProcess._getSizeBytes(hit['umm'])
 
             key = fileName
 
@@ -192,10 +219,37 @@ class CmrProcess(object):
                 'file_url': fileUrl,
                 'temporal_range': temporalRange,
                 'spatial_extent': spatialExtent,
-                'day_night_flag': dayNight}
+                'day_night_flag': dayNight,
+                'size_bytes': sizeBytes}
 
         return resultDictProcessed
 
+    # -------------------------------------------------------------------------
+    # _getSizeBytes()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _getSizeBytes(umm: dict) -> int or None:
+        """
+        Granule size from the archive information, None when CMR does not
+        report it.
+        """
+        archiveInfo = umm.get('DataGranule', {}).get(
+            'ArchiveAndDistributionInformation', [])
+
+        if not archiveInfo:
+            return None
+
+        if 'SizeInBytes' in archiveInfo[0]:
+            return int(archiveInfo[0]['SizeInBytes'])
+
+        size = archiveInfo[0].get('Size')
+        unit = archiveInfo[0].get('SizeUnit', 'B')
+
+        if size is None or unit not in CmrProcess.SIZE_UNITS:
+            return None
+
+        return int(float(size) * CmrProcess.SIZE_UNITS[unit])
+
     # -------------------------------------------------------------------------
     # _validateLatLonInput()
     # -------------------------------------------------------------------------
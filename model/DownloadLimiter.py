@@ -0,0 +1,214 @@
+from contextlib import contextmanager
+import logging
+import random
+import threading
+import time
+
+
+# -----------------------------------------------------------------------------
+# class DownloadLimiter
+#
+# Paces the requests of every download thread of a process. A token bucket
+# caps the request rate, and each host gets a concurrency limit that grows by
+# one after a run of successful requests and halves when the host throttles
+# (429, 503) or times out. Throttled requests are retried after an
+# exponential backoff with full jitter, so threads that were throttled
+# together do not come back together.
+#
+# limiter = DownloadLimiter(requestsPerSecond=5, maxConcurrency=4)
+# with limiter.slot('e4ftl01.cr.usgs.gov'):
+#     response = session.get(url)
+# -----------------------------------------------------------------------------
+class DownloadLimiter(object):
+
+    THROTTLE_STATUSES = (429, 503)
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 requestsPerSecond: float = 10.0,
+                 maxConcurrency: int = 4,
+                 burst: int or None = None,
+                 increaseAfter: int = 4,
+                 backoffBase: float = 1.0,
+                 backoffMax: float = 60.0,
+                 logger: logging.Logger or None = None) -> None:
+
+        if requestsPerSecond <= 0 or maxConcurrency < 1:
+            raise ValueError('The request rate must be positive and the ' +
+                             'concurrency at least 1.')
+
+        self._rate = float(requestsPerSecond)
+        self._burst = float(burst or max(1, maxConcurrency))
+        self._maxConcurrency = maxConcurrency
+        self._increaseAfter = increaseAfter
+        self._backoffBase = backoffBase
+        self._backoffMax = backoffMax
+        self._logger = logger
+
+        self._tokens = self._burst
+        self._refillTime = time.monotonic()
+        self._condition = threading.Condition()
+        self._hosts = {}
+
+        self._stats = {'requests': 0, 'downloads': 0, 'bytes': 0,
+                       'seconds': 0.0, 'retries': {}}
+
+    # -------------------------------------------------------------------------
+    # getMaxConcurrency()
+    # -------------------------------------------------------------------------
+    def getMaxConcurrency(self) -> int:
+        return self._maxConcurrency
+
+    # -------------------------------------------------------------------------
+    # getConcurrency()
+    # -------------------------------------------------------------------------
+    def getConcurrency(self, host: str) -> int:
+        """
+        The current concurrency limit of a host.
+        """
+        with self._condition:
+            return self._getHost(host)['limit']
+
+    # -------------------------------------------------------------------------
+    # slot()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def slot(self, host: str):
+        """
+        Block until the host is below its concurrency limit and a token is
+        available, and hold the slot for the enclosed request.
+        """
+        with self._condition:
+            state = self._getHost(host)
+
+            while True:
+                if state['active'] < state['limit']:
+                    wait = self._takeToken()
+
+                    if wait == 0:
+                        break
+
+                else:
+                    wait = None
+
+                self._condition.wait(wait)
+
+            state['active'] += 1
+            self._stats['requests'] += 1
+
+        try:
+            yield
+
+        finally:
+            with self._condition:
+                state['active'] -= 1
+                self._condition.notify_all()
+
+    # -------------------------------------------------------------------------
+    # succeeded()
+    # -------------------------------------------------------------------------
+    def succeeded(self, host: str) -> None:
+        """
+        Additive increase: one more concurrent request after a run of
+        successes, up to maxConcurrency.
+        """
+        with self._condition:
+            state = self._getHost(host)
+            state['successes'] += 1
+
+            if state['successes'] >= self._increaseAfter and \
+                    state['limit'] < self._maxConcurrency:
+                state['limit'] += 1
+                state['successes'] = 0
+                self._condition.notify_all()
+
+    # -------------------------------------------------------------------------
+    # throttled()
+    # -------------------------------------------------------------------------
+    def throttled(self, host: str, reason: str, attempt: int,
+                  retryAfter: float or None = None) -> float:
+        """
+        Multiplicative decrease of the host's concurrency, and the jittered
+        delay to wait before retrying. reason is recorded in the retry
+        counts, e.g. '429' or 'timeout'.
+        """
+        with self._condition:
+            state = self._getHost(host)
+            state['limit'] = max(1, state['limit'] // 2)
+            state['successes'] = 0
+            limit = state['limit']
+            retries = self._stats['retries']
+            retries[reason] = retries.get(reason, 0) + 1
+
+        delay = random.uniform(
+            0, min(self._backoffMax, self._backoffBase * 2 ** attempt))
+
+        if retryAfter is not None:
+            delay = max(delay, min(self._backoffMax, retryAfter))
+
+        if self._logger:
+            self._logger.warning(
+                '{} from {}, retrying in {:.1f}s with {} concurrent '
+                'requests'.format(reason, host, delay, limit))
+
+        return delay
+
+    # -------------------------------------------------------------------------
+    # addDownload()
+    # -------------------------------------------------------------------------
+    def addDownload(self, nbytes: int, seconds: float) -> None:
+        """
+        Record a completed download for the throughput figures.
+        """
+        with self._condition:
+            self._stats['downloads'] += 1
+            self._stats['bytes'] += nbytes
+            self._stats['seconds'] += seconds
+
+    # -------------------------------------------------------------------------
+    # getStats()
+    # -------------------------------------------------------------------------
+    def getStats(self) -> dict:
+        """
+        Running totals of requests, completed downloads, their bytes and
+        seconds, and retries by reason.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats['retries'] = dict(self._stats['retries'])
+
+        return stats
+
+    # -------------------------------------------------------------------------
+    # _takeToken()
+    # -------------------------------------------------------------------------
+    def _takeToken(self) -> float:
+        """
+        Take a token if one is available and return 0, otherwise return the
+        seconds until the next one. Called holding the condition.
+        """
+        now = time.monotonic()
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._refillTime) *
+                           self._rate)
+        self._refillTime = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+
+        return (1 - self._tokens) / self._rate
+
+    # -------------------------------------------------------------------------
+    # _getHost()
+    # -------------------------------------------------------------------------
+    def _getHost(self, host: str) -> dict:
+
+        if host not in self._hosts:
+            self._hosts[host] = {'limit': self._maxConcurrency,
+                                 'active': 0,
+                                 'successes': 0}
+
+        return self._hosts[host]
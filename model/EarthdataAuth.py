@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+import datetime
+import fcntl
+import json
+import logging
+import netrc
+import os
+import time
+from urllib.parse import urlparse
+
+import requests
+
+
+# -----------------------------------------------------------------------------
+# class EarthdataAuth
+#
+# Gets an Earthdata Login bearer token once, with the .netrc credentials,
+# and caches it on disk with its expiry so every process of a batch sends it
+# with its downloads instead of going through the URS redirects for each new
+# session. The cache file is readable by its owner only and is written under
+# an exclusive lock, so concurrent workers wait for one of them to fetch the
+# token rather than each asking URS.
+#
+# auth = EarthdataAuth('~/.cache/birkett_lake_extract/earthdata.json')
+# auth.apply(session)
+# -----------------------------------------------------------------------------
+class EarthdataAuth(object):
+
+    URS_URL = 'https://urs.earthdata.nasa.gov'
+    TOKEN_PATH = '/api/users/find_or_create_token'
+
+    # Refresh tokens expiring within this many seconds.
+    REFRESH_MARGIN = 86400
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 cacheFile: str,
+                 ursUrl: str or None = None,
+                 netrcFile: str or None = None,
+                 timeout: float = 30.0,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._cacheFile = os.path.expanduser(cacheFile)
+        self._ursUrl = (ursUrl or EarthdataAuth.URS_URL).rstrip('/')
+        self._netrcFile = netrcFile
+        self._timeout = timeout
+        self._logger = logger
+
+    # -------------------------------------------------------------------------
+    # apply()
+    # -------------------------------------------------------------------------
+    def apply(self, session: requests.Session) -> bool:
+        """
+        Send the bearer token with every request of session. Returns False,
+        leaving the session to the .netrc redirects, when no token could be
+        had.
+        """
+        try:
+            token = self.getToken()
+
+        except (OSError, ValueError, requests.exceptions.RequestException) \
+                as e:
+            if self._logger:
+                self._logger.warning(
+                    'No Earthdata token, using .netrc redirects: {}'.format(e))
+            return False
+
+        session.headers['Authorization'] = 'Bearer ' + token
+        return True
+
+    # -------------------------------------------------------------------------
+    # getToken()
+    # -------------------------------------------------------------------------
+    def getToken(self) -> str:
+        """
+        The cached token, or a new one from URS when the cache is missing or
+        the token is about to expire.
+        """
+        cached = self._load()
+
+        if cached:
+            return cached['token']
+
+        with self._locked():
+
+            # Another process may have fetched it while this one waited.
+            cached = self._load()
+
+            if cached:
+                return cached['token']
+
+            entry = self._fetch()
+            self._save(entry)
+
+        return entry['token']
+
+    # -------------------------------------------------------------------------
+    # invalidate()
+    # -------------------------------------------------------------------------
+    def invalidate(self) -> None:
+        """
+        Forget the cached token, after it was refused.
+        """
+        try:
+            os.remove(self._cacheFile)
+
+        except FileNotFoundError:
+            pass
+
+    # -------------------------------------------------------------------------
+    # _load()
+    # -------------------------------------------------------------------------
+    def _load(self) -> dict or None:
+        """
+        The cache entry, None if it is missing, unreadable or expiring.
+        """
+        try:
+            with open(self._cacheFile) as cacheFile:
+                entry = json.load(cacheFile)
+
+        except (OSError, ValueError):
+            return None
+
+        if not entry.get('token') or \
+                entry.get('expires', 0) - time.time() < \
+                EarthdataAuth.REFRESH_MARGIN:
+            return None
+
+        return entry
+
+    # -------------------------------------------------------------------------
+    # _save()
+    # -------------------------------------------------------------------------
+    def _save(self, entry: dict) -> None:
+        """
+        Write the entry readable by its owner only, under a temporary name
+        renamed into place.
+        """
+        tmpPath = '{}.{}.tmp'.format(self._cacheFile, os.getpid())
+        fd = os.open(tmpPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(fd, 'w') as cacheFile:
+            json.dump(entry, cacheFile)
+
+        os.replace(tmpPath, self._cacheFile)
+
+    # -------------------------------------------------------------------------
+    # _fetch()
+    # -------------------------------------------------------------------------
+    def _fetch(self) -> dict:
+        """
+        Ask URS for the user's token, creating one if there is none.
+        """
+        machine = urlparse(self._ursUrl).hostname
+        credentials = netrc.netrc(self._netrcFile).authenticators(machine)
+
+        if not credentials:
+            raise ValueError('No {} entry in .netrc'.format(machine))
+
+        login, _, password = credentials
+        response = requests.post(self._ursUrl + EarthdataAuth.TOKEN_PATH,
+                                 auth=(login, password),
+                                 timeout=self._timeout)
+        response.raise_for_status()
+        result = response.json()
+        expires = datetime.datetime.strptime(result['expiration_date'],
+                                             '%m/%d/%Y')
+
+        if self._logger:
+            self._logger.info('Got an Earthdata token expiring {}'.format(
+                result['expiration_date']))
+
+        return {'token': result['access_token'],
+                'expires': expires.timestamp()}
+
+    # -------------------------------------------------------------------------
+    # _locked()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def _locked(self):
+        """
+        Hold an exclusive lock next to the cache file.
+        """
+        cacheDir = os.path.dirname(self._cacheFile)
+
+        if cacheDir:
+            os.makedirs(cacheDir, mode=0o700, exist_ok=True)
+
+        with open(self._cacheFile + '.lock', 'a') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+            try:
+                yield
+
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
@@ -0,0 +1,193 @@
+import logging
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    from birkett_lake_extract.model.TileCache import TileCache
+
+
+# -----------------------------------------------------------------------------
+# class GranuleReader
+#
+# Opens a MOD44W granule once and keeps the water mask dataset, its
+# geotransform and projection for every stage that needs them. Discovering
+# the subdatasets of an HDF4 file is expensive, so it is done once per
+# granule rather than once per stage. Call close(), or use the reader as a
+# context manager, to release the GDAL handles.
+#
+# Given a TileCache, the reader serves the granule from its memory-mapped
+# copy instead, decoding the HDF only if the tile is not cached yet.
+# -----------------------------------------------------------------------------
+class GranuleReader(object):
+
+    WATER = 1
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 filePath: str,
+                 cacheArray: bool = False,
+                 tileCache: 'TileCache' or None = None,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._filePath = filePath
+        self._cacheArray = cacheArray
+        self._tileCache = tileCache
+        self._entry = None
+        self._logger = logger
+        self._waterMaskName = None
+        self._dataset = None
+        self._arrays = {}
+
+    # -------------------------------------------------------------------------
+    # __enter__
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        return self
+
+    # -------------------------------------------------------------------------
+    # __exit__
+    # -------------------------------------------------------------------------
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # getFilePath()
+    # -------------------------------------------------------------------------
+    def getFilePath(self) -> str:
+        return self._filePath
+
+    # -------------------------------------------------------------------------
+    # getWaterMaskName()
+    # -------------------------------------------------------------------------
+    def getWaterMaskName(self) -> str:
+        """
+        The GDAL name of the water mask, the first subdataset of the HDF.
+        Single band rasters, such as the synthetic benchmark tiles, are
+        their own water mask.
+        """
+        if self._tileCache:
+            return self._getEntry()['vrt']
+
+        self._open()
+        return self._waterMaskName
+
+    # -------------------------------------------------------------------------
+    # getTransform()
+    # -------------------------------------------------------------------------
+    def getTransform(self) -> tuple:
+
+        if self._tileCache:
+            return tuple(self._getEntry()['transform'])
+
+        return self._open().GetGeoTransform()
+
+    # -------------------------------------------------------------------------
+    # getProjection()
+    # -------------------------------------------------------------------------
+    def getProjection(self) -> str:
+
+        if self._tileCache:
+            return self._getEntry()['projection']
+
+        return self._open().GetProjection()
+
+    # -------------------------------------------------------------------------
+    # getNoDataValue()
+    # -------------------------------------------------------------------------
+    def getNoDataValue(self) -> float or None:
+
+        if self._tileCache:
+            return self._getEntry()['nodata']
+
+        return self._open().GetRasterBand(1).GetNoDataValue()
+
+    # -------------------------------------------------------------------------
+    # readArray()
+    # -------------------------------------------------------------------------
+    def readArray(self, window: tuple or None = None) -> np.ndarray:
+        """
+        The water mask values of the whole granule or of a window given as
+        (xOff, yOff, xSize, ySize). From a tile cache this is a read-only
+        view of the mapped file.
+        """
+        if self._tileCache:
+            return self._tileCache.read(self._getEntry(), window)
+
+        band = self._open().GetRasterBand(1)
+        return band.ReadAsArray() if window is None else \
+            band.ReadAsArray(*window)
+
+    # -------------------------------------------------------------------------
+    # readWater()
+    # -------------------------------------------------------------------------
+    def readWater(self, window: tuple or None = None) -> np.ndarray:
+        """
+        Boolean water mask of the whole granule or of a window given as
+        (xOff, yOff, xSize, ySize). With cacheArray the result is kept for
+        later calls with the same window.
+        """
+        if window in self._arrays:
+            return self._arrays[window]
+
+        water = self.readArray(window) == GranuleReader.WATER
+
+        if self._cacheArray:
+            self._arrays[window] = water
+
+        return water
+
+    # -------------------------------------------------------------------------
+    # close()
+    # -------------------------------------------------------------------------
+    def close(self) -> None:
+        self._dataset = None
+        self._entry = None
+        self._arrays = {}
+
+    # -------------------------------------------------------------------------
+    # _getEntry()
+    # -------------------------------------------------------------------------
+    def _getEntry(self) -> dict:
+
+        if self._entry is None:
+            self._entry = self._tileCache.get(self._filePath)
+
+        return self._entry
+
+    # -------------------------------------------------------------------------
+    # _open()
+    # -------------------------------------------------------------------------
+    def _open(self):
+        """
+        Open the granule and its water mask on first use.
+        """
+        if self._dataset is not None:
+            return self._dataset
+
+        from osgeo import gdal
+
+        if self._waterMaskName is None:
+            granule = gdal.Open(self._filePath)
+
+            if granule is None:
+                raise RuntimeError('Unable to open {}'.format(
+                    self._filePath))
+
+            subdatasets = granule.GetSubDatasets()
+
+            if subdatasets:
+                self._waterMaskName = subdatasets[0][0]
+            else:
+                self._waterMaskName = self._filePath
+                self._dataset = granule
+
+        if self._dataset is None:
+            self._dataset = gdal.Open(self._waterMaskName)
+
+        if self._logger:
+            self._logger.debug('Opened {}'.format(self._waterMaskName))
+
+        return self._dataset
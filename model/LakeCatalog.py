@@ -0,0 +1,56 @@
+import csv
+
+
+# -----------------------------------------------------------------------------
+# class LakeCatalog
+#
+# A CSV list of lakes to process, one lake per row:
+#
+# lakenumber,minlon,minlat,maxlon,maxlat
+# 366,-122.52,42.8,-121.69,43.05
+# -----------------------------------------------------------------------------
+class LakeCatalog(object):
+
+    COLUMNS = ['lakenumber', 'minlon', 'minlat', 'maxlon', 'maxlat']
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self, catalogFile: str) -> None:
+
+        self._catalogFile = catalogFile
+        self._lakes = LakeCatalog._read(catalogFile)
+
+    # -------------------------------------------------------------------------
+    # lakes()
+    # -------------------------------------------------------------------------
+    def lakes(self) -> list:
+        """
+        The lakes as dictionaries with lakeNumber and bbox, the bbox in the
+        string form LakeExtract takes.
+        """
+        return list(self._lakes)
+
+    # -------------------------------------------------------------------------
+    # _read()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _read(catalogFile: str) -> list:
+
+        lakes = []
+
+        with open(catalogFile, newline='') as inFile:
+            reader = csv.DictReader(inFile)
+            missing = set(LakeCatalog.COLUMNS) - set(reader.fieldnames or [])
+
+            if missing:
+                raise RuntimeError('{} is missing columns: {}'.format(
+                    catalogFile, ', '.join(sorted(missing))))
+
+            for row in reader:
+                bbox = [row[column].strip()
+                        for column in LakeCatalog.COLUMNS[1:]]
+                lakes.append({'lakeNumber': row['lakenumber'].strip(),
+                              'bbox': bbox})
+
+        return lakes
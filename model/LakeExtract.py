@@ -1,24 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import errno
+import importlib
 import logging
 import os
 import shutil
+import tempfile
+import time
+import typing
 from typing import Tuple
 import warnings
 
-import geopandas as gpd
 import numpy as np
-from osgeo import gdal
-from osgeo import ogr
-from osgeo import osr
 
-from birkett_lake_extract.model.CmrProcess import CmrProcess
-from birkett_lake_extract.model.libraries.daac_download import httpdl
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.GranuleReader import GranuleReader
+from birkett_lake_extract.model.LakeMasks import LakeMasks
+from birkett_lake_extract.model.OutputCatalog import OutputCatalog
+from birkett_lake_extract.model.StageCache import StageCache
+from birkett_lake_extract.model.StageMetrics import StageMetrics
+from birkett_lake_extract.model.TileCache import TileCache
+from birkett_lake_extract.model.TileStack import TileStack
+from birkett_lake_extract.model.WaterStatistics import WaterStatistics
 
-from core.model.Envelope import Envelope
-from core.model.SystemCommand import SystemCommand
-from core.model.GeospatialImageFile import GeospatialImageFile
+# GDAL and core are imported where they are used, to keep startup fast.
+if typing.TYPE_CHECKING:
+    from osgeo import ogr
+    from osgeo import osr
+    from core.model.Envelope import Envelope
 
 
+# -----------------------------------------------------------------------------
+# class LakeExtract
+#
+# GDAL, core and the CMR and download clients are imported by the
+# methods that use them, so the CLIs answer --help, argument errors and plans
+# from checkpoints without loading the geospatial stack.
+# -----------------------------------------------------------------------------
 class LakeExtract(object):
 
     MODSHORT = 'MOD44W'
@@ -30,6 +48,9 @@ class LakeExtract(object):
     TR_P = 231.656345
     TR_N = -231.656345
 
+    GEOSPATIAL_MODULES = ['osgeo.gdal', 'osgeo.ogr', 'osgeo.osr',
+                          'core.model.Envelope', 'core.model.SystemCommand']
+
     # -------------------------------------------------------------------------
     # __init__
     # -------------------------------------------------------------------------
@@ -39,23 +60,71 @@ class LakeExtract(object):
                  lakeNumber: str,
                  startYear: int,
                  endYear: int,
-                 logger: logging.Logger or None = None) -> None:
+                 logger: logging.Logger or None = None,
+                 metricsFile: str or None = None,
+                 cmrBaseUrl: str or None = None,
+                 force: bool = False,
+                 keepDownloads: bool = False,
+                 tileCacheDir: str or None = None,
+                 shareTileStacks: bool = False,
+                 yearWorkers: int = 1,
+                 warpThreads: int or None = None,
+                 warpMemory: int or None = None,
+                 cutlineTolerance: float or None = None,
+                 cutlineMaxVertices: int or None = None,
+                 statsFile: str or None = None,
+                 catalogFile: str or None = None,
+                 scratchDir: str or None = None) -> None:
 
         self._logger = logger
+        self._force = force
+        self._keepDownloads = keepDownloads
+        self._cmrBaseUrl = cmrBaseUrl
+        self._metricsFile = metricsFile
+        self._metrics = StageMetrics(lakeNumber, logger=logger)
         self._bbox = bbox
         self._lakeNumber = lakeNumber
         self._startYear = startYear
         self._endYear = endYear
         self._outDir = outDir
-        os.makedirs(self._outDir, exist_ok=True)
 
-        self._mod44wDir = os.path.join(self._outDir, 'MOD44W')
-        self._maxExtentDir = os.path.join(self._outDir, 'maxextent')
-        self._polygonDir = os.path.join(self._outDir, 'polygons')
-        self._bufferedDir = os.path.join(self._outDir, 'buffered-rasters')
+        # ---
+        # Downloads and intermediates go to the workspace, outDir unless a
+        # scratch directory is given. Kept downloads are shared by the lakes
+        # using the same scratch directory.
+        # ---
+        self._scratchDir = scratchDir
+        self._workDir = os.path.join(scratchDir,
+                                     'lake_{}'.format(lakeNumber)) \
+            if scratchDir else self._outDir
+        self._mod44wDir = os.path.join(
+            scratchDir if scratchDir and keepDownloads else self._workDir,
+            'MOD44W')
+        self._maxExtentDir = os.path.join(self._workDir, 'maxextent')
+        self._polygonDir = os.path.join(self._workDir, 'polygons')
+        self._bufferedDir = os.path.join(self._workDir, 'buffered-rasters')
         self._finalBufferedDir = os.path.join(self._outDir,
                                               'final-buffered-rasters')
-        self._makeOutputDirs()
+        self._statsDir = os.path.join(self._outDir, 'water-statistics')
+        self._checkpointDir = os.path.join(self._outDir, 'checkpoints')
+        self._stageCache = StageCache(self._checkpointDir, logger=logger)
+        self._stageKeys = {}
+        self._granuleReaders = {}
+        self._tileCache = TileCache(tileCacheDir, logger=logger) \
+            if tileCacheDir else None
+        self._shareTileStacks = shareTileStacks
+        self._tileStacks = []
+        self._yearWorkers = max(1, yearWorkers)
+        self._warpThreads = warpThreads
+        self._warpMemory = warpMemory
+        self._cutlineTolerance = cutlineTolerance or 0
+        self._cutlineMaxVertices = cutlineMaxVertices
+        self._statsFile = statsFile
+        self._yearStatistics = {}
+        self._catalog = OutputCatalog(catalogFile, logger=logger) \
+            if catalogFile else None
+        self._yearGranules = {}
+        self._yearSeconds = {}
         if self._endYear > 2015:
             msg = \
                 '{} is outside the'.format(self._endYear) + \
@@ -78,29 +147,82 @@ class LakeExtract(object):
             self._startYear = 2001
 
         self._yearRange = np.arange(self._startYear, self._endYear+1)
-        self._createStr = LakeExtract._getPostStr()
-        self._envelope = self._createEnvelope()
+        self._createStr = StageCache.key(self._getParams())
+        self._envelope = None
+
+    # -------------------------------------------------------------------------
+    # warmUp()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def warmUp() -> None:
+        """
+        Import the geospatial stack and initialize GDAL and PROJ now rather
+        than in the first stage, for processes that run many lakes.
+        """
+        for moduleName in LakeExtract.GEOSPATIAL_MODULES:
+            importlib.import_module(moduleName)
+
+        from osgeo import gdal
+        from osgeo import osr
+
+        gdal.AllRegister()
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
 
     # -------------------------------------------------------------------------
     # _makeOutputDirs()
     # -------------------------------------------------------------------------
     def _makeOutputDirs(self) -> None:
         """
-        Creates the output directories.
+        Creates the output directories, when a lake is extracted rather
+        than planned.
         """
         os.makedirs(self._mod44wDir, exist_ok=True)
         os.makedirs(self._maxExtentDir, exist_ok=True)
         os.makedirs(self._polygonDir, exist_ok=True)
         os.makedirs(self._bufferedDir, exist_ok=True)
         os.makedirs(self._finalBufferedDir, exist_ok=True)
+        os.makedirs(self._checkpointDir, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # _getParams()
+    # -------------------------------------------------------------------------
+    def _getParams(self) -> dict:
+        """
+        Parameters that determine the outputs of this lake.
+        """
+        return {'lakeNumber': self._lakeNumber,
+                'bbox': [float(coord) for coord in self._bbox],
+                'startYear': self._startYear,
+                'endYear': self._endYear,
+                'buffers': [LakeExtract.BUFFER_1PX, LakeExtract.BUFFER_6PX],
+                'srs': LakeExtract.MOD_SRS,
+                'resolution': [LakeExtract.TR_P, LakeExtract.TR_N],
+                'cutlineTolerance': self._cutlineTolerance,
+                'cutlineMaxVertices': self._cutlineMaxVertices}
+
+    # -------------------------------------------------------------------------
+    # _getEnvelope()
+    # -------------------------------------------------------------------------
+    def _getEnvelope(self) -> 'Envelope':
+        """
+        The spatial envelope of the bounding box, created on first use.
+        """
+        if self._envelope is None:
+            self._envelope = self._createEnvelope()
+
+        return self._envelope
 
     # -------------------------------------------------------------------------
     # _createEnvelope()
     # -------------------------------------------------------------------------
-    def _createEnvelope(self) -> Envelope:
+    def _createEnvelope(self) -> 'Envelope':
         """
         Creates spatial envelope.
         """
+        from osgeo import osr
+        from core.model.Envelope import Envelope
+
         envelope = Envelope()
 
         ulx = self._bbox[0]
@@ -126,70 +248,504 @@ class LakeExtract(object):
         if self._logger:
             self._logger.debug('In extractLakes')
 
+        self._metrics.setInfo(bbox=self._bbox,
+                              startYear=self._startYear,
+                              endYear=self._endYear)
+        self._makeOutputDirs()
+
         try:
-            mod44w_list = []
-            mod44w_list = self._getMOD44W()
-            tile = os.path.basename(mod44w_list[0]).split('.')[2]
-            maxExtentFilePath = self._makeMaxExtent(mod44w_list, tile)
-            maxExtentFilePathClipped = self._clipMaxExtent(maxExtentFilePath)
+            self._runStages()
+
+        finally:
+            self._closeGranuleReaders()
+            self._releaseTileStacks()
+            self._emitMetrics()
+
+    # -------------------------------------------------------------------------
+    # _runStages()
+    # -------------------------------------------------------------------------
+    def _runStages(self) -> None:
+        """
+        Run each processing stage under the stage instrumentation. A stage
+        whose inputs and parameters match a completed checkpoint is skipped,
+        as is the whole lake when its final outputs are complete.
+        """
+        metrics = self._metrics
+
+        with metrics.stage('resolveGranules'):
+            lakeKey = self._getLakeKey()
+
+            if self._isCataloged(lakeKey):
+                self._metrics.setInfo(resumed=True, cataloged=True)
+                if self._logger:
+                    self._logger.info(
+                        'Lake {} outputs are cataloged and current, '
+                        'skipping.'.format(self._lakeNumber))
+                return
+
+            finalOutputs = self._loadStage('lake', lakeKey)
+
+        if finalOutputs is not None:
+            self._metrics.setInfo(resumed=True)
+            if self._logger:
+                self._logger.info(
+                    'Lake {} outputs are complete, skipping.'.format(
+                        self._lakeNumber))
+            return
+
+        try:
+            mod44w_list, tile, maxExtentFilePathClipped = \
+                self._runMaxExtentStages()
         except RuntimeError:
             # ---
             # If there are more than one tile, try one that isn't outside of
             # extent.
             # ---
-            mod44w_list = self._getMOD44W(index=1)
-            tile = os.path.basename(mod44w_list[0]).split('.')[2]
-            maxExtentFilePath = self._makeMaxExtent(mod44w_list, tile)
-            maxExtentFilePathClipped = self._clipMaxExtent(maxExtentFilePath)
+            mod44w_list, tile, maxExtentFilePathClipped = \
+                self._runMaxExtentStages(index=1)
 
-        polygonizedLakeFilePath = \
-            self._polygonizeLake(maxExtentFilePathClipped)
-        cleanedPolygonLakeFilePath = \
-            self._cleanPolygon(polygonizedLakeFilePath)
+        self._metrics.setInfo(tile=tile, numGranules=len(mod44w_list))
 
-        bufferedPolygonFilePath = \
-            os.path.join(self._polygonDir,
-                         'Lake.{}.InitialBuffered.{}.shp'.format(
-                             self._lakeNumber,
-                             self._createStr))
+        polygonizedLakeFilePath = self._runStage(
+            'polygonizeLake',
+            {'parent': self._stageKeys['clipMaxExtent']},
+            self._polygonizeLake, maxExtentFilePathClipped)
 
-        bufferedPolygonFilePath = self._createBuffer(
-            cleanedPolygonLakeFilePath,
-            bufferedPolygonFilePath,
-            LakeExtract.BUFFER_1PX)
+        # The vector stages run in memory, only the buffered lake is
+        # written and checkpointed.
+        bufferedFullFilePath = self._runStage(
+            'bufferLake',
+            {'parent': self._stageKeys['polygonizeLake'],
+             'buffers': [LakeExtract.BUFFER_1PX, LakeExtract.BUFFER_6PX]},
+            self._bufferLakeFile, polygonizedLakeFilePath)
 
-        dissolvedPolygonOutputPath = \
-            self._dissolveBuffered(bufferedPolygonFilePath)
+        cutlineFilePath = self._runStage(
+            'prepareCutline',
+            {'parent': self._stageKeys['bufferLake'],
+             'tolerance': self._cutlineTolerance,
+             'maxVertices': self._cutlineMaxVertices},
+            self._prepareCutline, bufferedFullFilePath, mod44w_list[0])
 
-        targetLakeFilePath = self._getTargetLake(dissolvedPolygonOutputPath)
+        with metrics.stage('extractLakePerYear'):
+            finalOutputs = self._extractLakePerYear(mod44w_list,
+                                                    cutlineFilePath)
 
-        bufferedFullFilePath = os.path.join(
-            self._polygonDir,
-            'Lake.{}.Buffered.{}.shp'.format(self._lakeNumber,
-                                             self._createStr))
+        with metrics.stage('writeWaterStatistics'):
+            finalOutputs.append(self._writeWaterStatistics())
 
-        bufferedFullFilePath = self._createBuffer(targetLakeFilePath,
-                                                  bufferedFullFilePath,
-                                                  LakeExtract.BUFFER_6PX)
+        if self._catalog:
+            with metrics.stage('recordOutputs'):
+                self._recordOutputs(lakeKey, finalOutputs[:-1])
 
-        self._extractLakePerYear(mod44w_list, bufferedFullFilePath)
-        self._rmOutputDirs()
+        self._stageCache.save('lake', lakeKey, finalOutputs)
+
+        with metrics.stage('rmOutputDirs'):
+            self._rmOutputDirs()
 
     # -------------------------------------------------------------------------
-    # _getMOD44W()
+    # _runMaxExtentStages()
     # -------------------------------------------------------------------------
-    def _getMOD44W(self, index: int = 0) -> list:
+    def _runMaxExtentStages(self, index: int = 0) -> Tuple[list, str, str]:
         """
-        For a given range of years and a bounding box, find and download
-        the corresponding MOD44W tile.
+        Download the granules of CMR result index of each year, folding each
+        into the max extent as it arrives, and clip the max extent to the
+        bounding box. Returns the granules, the tile and the clipped max
+        extent.
         """
-        mod44List = []
+        downloads = self._getMOD44WDownloads(index)
+        tile = os.path.basename(downloads[0][1]).split('.')[2]
+        maxExtentFilePath = self._runStage(
+            'makeMaxExtent',
+            {'granules': LakeExtract._getGranuleIds(
+                [filePath for _, filePath in downloads])},
+            self._makeMaxExtent, downloads, tile)
+
+        # Already downloaded unless makeMaxExtent came from a checkpoint.
+        with self._metrics.stage('getMOD44W'):
+            mod44w_list = self._getMOD44W(downloads)
+
+        maxExtentFilePathClipped = self._runStage(
+            'clipMaxExtent',
+            {'parent': self._stageKeys['makeMaxExtent'],
+             'bbox': self._getParams()['bbox']},
+            self._clipMaxExtent, maxExtentFilePath)
+
+        return mod44w_list, tile, maxExtentFilePathClipped
+
+    # -------------------------------------------------------------------------
+    # extractMasks()
+    # -------------------------------------------------------------------------
+    def extractMasks(self) -> LakeMasks:
+        """
+        Run the lake in memory and return its per-year masks, on the same
+        grid and with the same values as the rasters extractLakes writes,
+        and the buffered lake polygon. Nothing is written to outDir, the
+        MOD44W granules are downloaded to a temporary directory in the
+        scratch directory, or the system's, unless keepDownloads is set, and
+        there are no checkpoints, not even of the CMR results.
+        LakeMasks.write() writes the rasters when they are wanted too.
+        """
+        self._metrics.setInfo(bbox=self._bbox,
+                              startYear=self._startYear,
+                              endYear=self._endYear,
+                              inMemory=True)
+        keptDir = self._mod44wDir
+        stageCache = self._stageCache
+        self._stageCache = StageCache(None, logger=self._logger)
+
+        if self._keepDownloads:
+            os.makedirs(self._mod44wDir, exist_ok=True)
+
+        else:
+            self._mod44wDir = tempfile.mkdtemp(
+                prefix='lake_{}_MOD44W_'.format(self._lakeNumber),
+                dir=self._scratchDir)
+
+        try:
+            try:
+                mod44wList, lakes = self._makeLakeInMemory()
+            except RuntimeError:
+                # ---
+                # If there are more than one tile, try one that isn't outside
+                # of extent.
+                # ---
+                mod44wList, lakes = self._makeLakeInMemory(index=1)
+
+            self._metrics.setInfo(numGranules=len(mod44wList))
+
+            with self._metrics.stage('extractLakePerYear'):
+                masks = self._extractMasksPerYear(mod44wList, lakes)
+
+        finally:
+            self._closeGranuleReaders()
+            self._releaseTileStacks()
+            self._emitMetrics()
+            self._stageCache = stageCache
+
+            if not self._keepDownloads:
+                self._rmDownloadDir(self._mod44wDir)
+                self._mod44wDir = keptDir
+
+        return masks
+
+    # -------------------------------------------------------------------------
+    # _makeLakeInMemory()
+    # -------------------------------------------------------------------------
+    def _makeLakeInMemory(self, index: int = 0) -> Tuple[list, list]:
+        """
+        The max extent, clipping and polygonizing stages of extractLakes on
+        in-memory datasets, followed by the vector stages extractLakes
+        runs. Returns the granules and the simplified buffered lake
+        polygons.
+        """
+        from osgeo import gdal
+        from osgeo import ogr
+
+        downloads = self._getMOD44WDownloads(index)
+        tile = os.path.basename(downloads[0][1]).split('.')[2]
+
+        with self._metrics.stage('makeMaxExtent'):
+            maxExtent, transform, projection = \
+                self._computeMaxExtent(downloads, tile)
+
+        with self._metrics.stage('getMOD44W'):
+            mod44wList = self._getMOD44W(downloads)
+
+        with self._metrics.stage('clipMaxExtent'):
+            maxExtentDS = gdal.GetDriverByName('MEM').Create(
+                '', maxExtent.shape[1], maxExtent.shape[0], 1,
+                gdal.GDT_Int16)
+            maxExtentDS.SetGeoTransform(transform)
+            maxExtentDS.SetProjection(projection)
+            maxExtentDS.GetRasterBand(1).WriteArray(maxExtent)
+            maxExtentDS.GetRasterBand(1).SetNoDataValue(250)
+            clippedDS = gdal.Translate(
+                '', maxExtentDS, options='-of MEM' + self._getClipOptions())
+            maxExtentDS = None
+
+            if clippedDS is None:
+                raise RuntimeError('The bounding box is outside of tile ' +
+                                   tile)
+
+        with self._metrics.stage('polygonizeLake'):
+            polygonDS = ogr.GetDriverByName('Memory').CreateDataSource('')
+            polygonLayer = polygonDS.CreateLayer(
+                'lake', clippedDS.GetSpatialRef(), ogr.wkbPolygon)
+            polygonLayer.CreateField(ogr.FieldDefn('DN', ogr.OFTInteger))
+            band = clippedDS.GetRasterBand(1)
+            gdal.Polygonize(band, band.GetMaskBand(), polygonLayer, 0)
+            band = None
+            clippedDS = None
+
+        with self._metrics.stage('bufferLake'):
+            lakes = self._bufferLake(polygonLayer)
+            polygonLayer = None
+            polygonDS = None
+
+        with self._metrics.stage('prepareCutline'):
+            lakes = self._simplifyLake(lakes)
+
+        self._metrics.setInfo(tile=tile)
+        return mod44wList, lakes
+
+    # -------------------------------------------------------------------------
+    # _extractMasksPerYear()
+    # -------------------------------------------------------------------------
+    def _extractMasksPerYear(self, mod44wList: list,
+                             lakes: list) -> LakeMasks:
+        """
+        Cut each year to the lake and warp it to the bounding box, in
+        memory, on yearWorkers threads. The lake is written once to a
+        /vsimem/ cutline shared by the years.
+        """
+        from osgeo import gdal
+        from osgeo import ogr
+        from osgeo import osr
+
+        self._getEnvelope()
+        srs = osr.SpatialReference()
+        srs.SetFromUserInput(LakeExtract.MOD_SRS)
+        cutlineFilePath = LakeExtract._writePolygons(
+            lakes, srs, '/vsimem/Lake.{}.Cutline.{}.fgb'.format(
+                self._lakeNumber, self._createStr))
+        years = []
+        results = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._yearWorkers,
+                                    thread_name_prefix='year') as workers:
+                for mod44wFilePath in mod44wList:
+                    years.append(
+                        os.path.basename(mod44wFilePath).split('.')[1][1:5])
+                    subdatasetName = self._getGranuleReader(
+                        mod44wFilePath).getWaterMaskName()
+                    results.append(workers.submit(self._warpOneYearInMemory,
+                                                  subdatasetName,
+                                                  cutlineFilePath))
+
+                results = [result.result() for result in results]
+
+        finally:
+            gdal.Unlink(cutlineFilePath)
+
+        lake = lakes[0]
+
+        if len(lakes) > 1:
+            lake = ogr.Geometry(ogr.wkbMultiPolygon)
+
+            for polygon in lakes:
+                lake.AddGeometry(polygon)
+
+        return LakeMasks(self._lakeNumber,
+                         years,
+                         np.stack([array for array, _, _ in results]),
+                         results[0][1],
+                         results[0][2],
+                         lake.ExportToWkt())
+
+    # -------------------------------------------------------------------------
+    # _warpOneYearInMemory()
+    # -------------------------------------------------------------------------
+    def _warpOneYearInMemory(self, subdatasetName: str,
+                             cutlineFilePath: str) -> tuple:
+        """
+        The two gdalwarp calls of _extractOneYear to in-memory datasets.
+        Returns the final array, its geotransform and its projection. Runs
+        on a year worker.
+        """
+        from osgeo import gdal
+
+        bufferedDS = gdal.Warp('', subdatasetName,
+                               options='-of MEM' +
+                               self._getCutOptions(cutlineFilePath))
+
+        if bufferedDS is None:
+            raise RuntimeError('Unable to cut {}'.format(subdatasetName))
+
+        finalDS = gdal.Warp('', bufferedDS,
+                            options='-of MEM' + self._getBboxOptions())
+        bufferedDS = None
+
+        if finalDS is None:
+            raise RuntimeError('Unable to warp {}'.format(subdatasetName))
+
+        result = (finalDS.GetRasterBand(1).ReadAsArray(),
+                  finalDS.GetGeoTransform(),
+                  finalDS.GetProjection())
+        finalDS = None
+        return result
+
+    # -------------------------------------------------------------------------
+    # _getLakeKey()
+    # -------------------------------------------------------------------------
+    def _getLakeKey(self) -> str:
+        """
+        Key of the whole lake, its parameters and the granules CMR returns.
+        """
+        lakeParams = self._getParams()
+        lakeParams['granules'] = [self._getGranuleUrls(year)
+                                  for year in self._yearRange]
+        return StageCache.key(lakeParams)
+
+    # -------------------------------------------------------------------------
+    # _getCatalogParamsKey()
+    # -------------------------------------------------------------------------
+    def _getCatalogParamsKey(self) -> str:
+        """
+        Key of the parameters of the lake and of its per-year stages.
+        """
+        return StageCache.key(self._getParams())
+
+    # -------------------------------------------------------------------------
+    # _isCataloged()
+    # -------------------------------------------------------------------------
+    def _isCataloged(self, lakeKey: str) -> bool:
+        """
+        True when the output catalog has every year with granules of this
+        lake, for the same granules and parameters.
+        """
+        if self._catalog is None or self._force:
+            return False
+
+        years = [year for year in self._yearRange if self._getGranules(year)]
+        return self._catalog.isCurrent(self._lakeNumber, lakeKey,
+                                       self._getCatalogParamsKey(), years)
+
+    # -------------------------------------------------------------------------
+    # _recordOutputs()
+    # -------------------------------------------------------------------------
+    def _recordOutputs(self, lakeKey: str, yearOutputs: list) -> None:
+        """
+        Record each year's raster in the output catalog, with its checksum.
+        Years reused from checkpoints have no timing.
+        """
+        minLon, minLat, maxLon, maxLat = [float(c) for c in self._bbox]
+        paramsKey = self._getCatalogParamsKey()
+        rows = []
+
+        for outputPath in yearOutputs:
+            year = os.path.basename(outputPath).split('_')[-2]
+            rows.append({'lakeNumber': self._lakeNumber,
+                         'year': int(year),
+                         'minLon': minLon,
+                         'minLat': minLat,
+                         'maxLon': maxLon,
+                         'maxLat': maxLat,
+                         'granule': self._yearGranules.get(year),
+                         'paramsKey': paramsKey,
+                         'lakeKey': lakeKey,
+                         'outputPath': os.path.abspath(outputPath),
+                         'bytes': os.path.getsize(outputPath),
+                         'checksum': OutputCatalog.checksum(outputPath),
+                         'seconds': self._yearSeconds.get(year)})
+
+        self._catalog.record(rows)
+
+    # -------------------------------------------------------------------------
+    # _runStage()
+    # -------------------------------------------------------------------------
+    def _runStage(self, stageName: str, params: dict, function, *args):
+        """
+        Run one stage of the graph, or reuse its checkpointed result when a
+        previous run completed it with the same inputs and parameters. The
+        stage key is kept so downstream stages can chain on it.
+        """
+        key = StageCache.key(params)
+        self._stageKeys[stageName] = key
+
+        with self._metrics.stage(stageName):
+            result = self._loadStage(stageName, key)
+
+            if result is not None:
+                if self._logger:
+                    self._logger.info('Reusing {} from checkpoint: {}'.format(
+                        stageName, result))
+                return result
+
+            result = function(*args)
+            self._stageCache.save(stageName, key, result)
+
+        return result
+
+    # -------------------------------------------------------------------------
+    # _loadStage()
+    # -------------------------------------------------------------------------
+    def _loadStage(self, stageName: str, key: str):
+        """
+        Return a checkpointed result if all of its output files are still
+        present and readable.
+        """
+        if self._force:
+            return None
+
+        result = self._stageCache.load(stageName, key)
+
+        if result is None:
+            return None
+
+        outputs = result if isinstance(result, list) else [result]
+
+        for output in outputs:
+            if not LakeExtract._isValidOutput(output):
+                return None
+
+        return result
+
+    # -------------------------------------------------------------------------
+    # _isValidOutput()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _isValidOutput(filePath: str) -> bool:
+
+        if not os.path.isfile(filePath) or os.path.getsize(filePath) == 0:
+            return False
+
+        if filePath.endswith('.tif'):
+            from osgeo import gdal
+            return gdal.Open(filePath) is not None
+
+        return True
+
+    # -------------------------------------------------------------------------
+    # _getGranuleIds()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _getGranuleIds(mod44wFileList: list) -> list:
+        return [os.path.basename(filePath) for filePath in mod44wFileList]
+
+    # -------------------------------------------------------------------------
+    # _emitMetrics()
+    # -------------------------------------------------------------------------
+    def _emitMetrics(self) -> None:
+        """
+        Log the stage metrics as JSON and append them to the metrics file.
+        """
+        if self._logger:
+            self._logger.info('Metrics: {}'.format(self._metrics.toJson()))
+
+        if self._metricsFile:
+            self._metrics.write(self._metricsFile)
+
+    # -------------------------------------------------------------------------
+    # getMetrics()
+    # -------------------------------------------------------------------------
+    def getMetrics(self) -> dict:
+        """
+        Return the stage metrics recorded so far.
+        """
+        return self._metrics.toDict()
+
+    # -------------------------------------------------------------------------
+    # _getMOD44WDownloads()
+    # -------------------------------------------------------------------------
+    def _getMOD44WDownloads(self, index: int = 0) -> list:
+        """
+        For a given range of years and a bounding box, find the URL and local
+        path of the corresponding MOD44W tile of each year.
+        """
+        downloads = []
         for year in self._yearRange:
-            temporalStr = LakeExtract._getTemporalWindow(year=year)
-            cmrProcessor = CmrProcess(mission=LakeExtract.MODSHORT,
-                                      dateTime=temporalStr,
-                                      lonLat=','.join(self._bbox))
-            mod44DownloadURLList = cmrProcessor.run()
+            mod44DownloadURLList = self._getGranuleUrls(year)
             if len(mod44DownloadURLList) > 1:
                 warnings.warn(
                     'More than one results in CMR query.' +
@@ -200,26 +756,173 @@ class LakeExtract(object):
                 msg = 'No results from CMR'
                 raise IndexError(msg)
             fileName = os.path.basename(mod44DownloadURL.rstrip())
-            filePath = os.path.join(self._mod44wDir, fileName)
-            if os.path.exists(filePath):
+            downloads.append((mod44DownloadURL,
+                              os.path.join(self._mod44wDir, fileName)))
+        return downloads
+
+    # -------------------------------------------------------------------------
+    # _getMOD44W()
+    # -------------------------------------------------------------------------
+    def _getMOD44W(self, downloads: list) -> list:
+        """
+        Download the MOD44W tiles that are not present yet, in order.
+        """
+        mod44List = []
+        for mod44DownloadURL, filePath in downloads:
+            if self._downloadMOD44W(mod44DownloadURL, filePath):
                 mod44List.append(filePath)
-                continue
+        return mod44List
+
+    # -------------------------------------------------------------------------
+    # _streamMOD44W()
+    # -------------------------------------------------------------------------
+    def _streamMOD44W(self, downloads: list):
+        """
+        Yield each MOD44W tile, in order, as soon as it is on disk while
+        download threads fetch the next ones, so the caller's processing
+        overlaps the downloads. The shared download limiter decides how
+        many requests actually run at once. Download errors are raised
+        here.
+        """
+        from birkett_lake_extract.model.libraries.daac_download \
+            import getLimiter
+
+        # Downloads are recorded under their own stage, not the consumer's.
+        stage = '{}/downloadMOD44W'.format(self._metrics.getStageName())
+        downloader = ThreadPoolExecutor(
+            max_workers=getLimiter().getMaxConcurrency(),
+            thread_name_prefix='MOD44W-download')
+
+        try:
+            futures = [downloader.submit(self._downloadMOD44W,
+                                         mod44DownloadURL,
+                                         filePath,
+                                         stage)
+                       for mod44DownloadURL, filePath in downloads]
+
+            for future, (_, filePath) in zip(futures, downloads):
+                if future.result():
+                    yield filePath
+
+        finally:
+            downloader.shutdown(wait=True, cancel_futures=True)
+
+    # -------------------------------------------------------------------------
+    # _downloadMOD44W()
+    # -------------------------------------------------------------------------
+    def _downloadMOD44W(self, mod44DownloadURL: str, filePath: str,
+                        stage: str or None = None) -> bool:
+        """
+        Download one MOD44W tile unless it is present, recording its time
+        and size under stage. Returns False when the download gave up after
+        too many timeouts or throttled responses.
+        """
+        if os.path.exists(filePath):
+            return True
 
+        from birkett_lake_extract.model.libraries.daac_download \
+            import httpdl
+
+        with self._metrics.download(filePath, stage=stage):
             request_status = httpdl(urlStr=mod44DownloadURL,
                                     localpath=self._mod44wDir,
                                     uncompress=True)
-            if request_status == 0 or request_status == 200 \
-                    or request_status == 304:
-                if not os.path.exists(filePath):
-                    msg = '{} was not downloaded from {}'.format(
-                        filePath, mod44DownloadURL)
-                    raise FileNotFoundError(msg)
-                mod44List.append(filePath)
-            elif request_status == 599:
-                msg = 'WARNING: experienced too many' + \
-                    ' timeout or connection errors.'
-                warnings.warn(msg)
-        return mod44List
+        if request_status == 0 or request_status == 200 \
+                or request_status == 304:
+            if not os.path.exists(filePath):
+                msg = '{} was not downloaded from {}'.format(
+                    filePath, mod44DownloadURL)
+                raise FileNotFoundError(msg)
+            return True
+        elif request_status == 599:
+            msg = 'WARNING: experienced too many' + \
+                ' timeout or connection errors.'
+            warnings.warn(msg)
+        elif request_status in DownloadLimiter.THROTTLE_STATUSES:
+            msg = 'WARNING: still throttled ({}) after retrying {}'.format(
+                request_status, mod44DownloadURL)
+            warnings.warn(msg)
+        return False
+
+    # -------------------------------------------------------------------------
+    # _getGranuleUrls()
+    # -------------------------------------------------------------------------
+    def _getGranuleUrls(self, year: int) -> list:
+        return [granule['file_url'] for granule in self._getGranules(year)]
+
+    # -------------------------------------------------------------------------
+    # _getGranules()
+    # -------------------------------------------------------------------------
+    def _getGranules(self, year: int) -> list:
+        """
+        Search CMR for the MOD44W granules of one year. Results, including
+        years without granules, are checkpointed so a rerun does not query
+        CMR again.
+        """
+        key = StageCache.key({'mission': LakeExtract.MODSHORT,
+                              'year': int(year),
+                              'bbox': [float(c) for c in self._bbox]})
+        granules = None if self._force else \
+            self._stageCache.load('cmrGranules', key)
+
+        if granules is None:
+            from birkett_lake_extract.model.CmrProcess import CmrProcess
+
+            temporalStr = LakeExtract._getTemporalWindow(year=year)
+            cmrProcessor = CmrProcess(mission=LakeExtract.MODSHORT,
+                                      dateTime=temporalStr,
+                                      lonLat=','.join(self._bbox),
+                                      baseUrl=self._cmrBaseUrl)
+            granules = [{'file_name': granule['file_name'],
+                         'file_url': granule['file_url'],
+                         'size_bytes': granule['size_bytes']}
+                        for granule in cmrProcessor.runGranules()]
+
+            # An empty result of a failed request may be transient.
+            if granules or not cmrProcessor.failed():
+                self._stageCache.save('cmrGranules', key, granules)
+
+        return granules
+
+    # -------------------------------------------------------------------------
+    # plan()
+    # -------------------------------------------------------------------------
+    def plan(self) -> dict:
+        """
+        Resolve the granules this lake needs without downloading or
+        processing any raster. The first granule of each year is the one
+        extractLakes downloads, the second is only downloaded when the lake
+        falls outside the first tile.
+        """
+        granules = []
+
+        for year in self._yearRange:
+            candidates = self._getGranules(year)
+            for index, granule in enumerate(candidates[:2]):
+                filePath = os.path.join(self._mod44wDir,
+                                        granule['file_name'])
+                granules.append({
+                    'year': int(year),
+                    'fileName': granule['file_name'],
+                    'tile': granule['file_name'].split('.')[2],
+                    'sizeBytes': granule['size_bytes'],
+                    'fallback': index > 0,
+                    'local': os.path.exists(filePath)})
+
+        lakeKey = self._getLakeKey()
+        complete = self._isCataloged(lakeKey) or \
+            self._loadStage('lake', lakeKey) is not None
+        years = {granule['year'] for granule in granules}
+
+        return {'lakeNumber': self._lakeNumber,
+                'bbox': self._bbox,
+                'startYear': self._startYear,
+                'endYear': self._endYear,
+                'complete': complete,
+                'expectedOutputs': 0 if complete else len(years),
+                'missingYears': [int(year) for year in self._yearRange
+                                 if int(year) not in years],
+                'granules': granules}
 
     # -------------------------------------------------------------------------
     # getTemporalWindow()
@@ -238,20 +941,15 @@ class LakeExtract(object):
     # -------------------------------------------------------------------------
     # _makeMaxExtent()
     # -------------------------------------------------------------------------
-    def _makeMaxExtent(self, mod44wFileList: list, tile: str) -> str:
+    def _makeMaxExtent(self, downloads: list, tile: str) -> str:
         """
-        Given a list of MOD44W products, create a max extent product from that
-        list.
+        Given the MOD44W products to download, create a max extent product
+        from them.
         """
-        transform = None
-        projection = None
-        maxExtent = np.zeros(LakeExtract.MOD44_SHAPE, dtype=np.int64)
-        for i, mod44File in enumerate(mod44wFileList):
-            if i == 0:
-                transform, projection = LakeExtract._getProjectionTransform(
-                    mod44File)
-            maxExtent = LakeExtract._getOneYear(mod44File, maxExtent)
-        maxExtent = np.where(maxExtent > 0, 1, 0)
+        from osgeo import gdal
+
+        maxExtent, transform, projection = self._computeMaxExtent(downloads,
+                                                                  tile)
         maxExtentOutFilePath = os.path.join(
             self._maxExtentDir,
             'MOD44W.{}.MaxExtent.{}.{}.{}.tif'.format(
@@ -262,7 +960,8 @@ class LakeExtract(object):
                                        LakeExtract.MOD44_SHAPE[0],
                                        LakeExtract.MOD44_SHAPE[1],
                                        gdal.GDT_Int16,
-                                       options=['COMPRESS=LZW'])
+                                       options=['COMPRESS=LZW'] +
+                                       self._getCreationThreads())
         maxExtentOutDS.SetGeoTransform(transform)
         maxExtentOutDS.SetProjection(projection)
         maxExtentOutBand = maxExtentOutDS.GetRasterBand(1)
@@ -274,36 +973,91 @@ class LakeExtract(object):
         return maxExtentOutFilePath
 
     # -------------------------------------------------------------------------
-    # _getOneYear()
+    # _computeMaxExtent()
     # -------------------------------------------------------------------------
-    @staticmethod
-    def _getOneYear(fileName: str, maxExtent: np.ndarray) -> np.ndarray:
+    def _computeMaxExtent(self, downloads: list, tile: str) -> tuple:
+        """
+        The max extent of the MOD44W products to download, 1 where any
+        year is water, with the tile's transform and projection. Each
+        product is added to the max extent as soon as it has been
+        downloaded.
+        """
+        if self._shareTileStacks:
+            mod44wFileList = list(self._streamMOD44W(downloads))
+            stack = self._getTileStack(mod44wFileList, tile).getArray()
+            maxExtent = stack.any(axis=0)
+        else:
+            mod44wFileList = []
+            maxExtent = np.zeros(LakeExtract.MOD44_SHAPE, dtype=bool)
+            for mod44File in self._streamMOD44W(downloads):
+                mod44wFileList.append(mod44File)
+                maxExtent |= self._getGranuleReader(mod44File).readWater()
+
+        if not mod44wFileList:
+            raise RuntimeError('No MOD44W products were downloaded')
+
+        reader = self._getGranuleReader(mod44wFileList[0])
+        transform = reader.getTransform()
+        projection = reader.getProjection()
+        maxExtent = np.where(maxExtent, 1, 0)
+        return maxExtent, transform, projection
+
+    # -------------------------------------------------------------------------
+    # _getGranuleReader()
+    # -------------------------------------------------------------------------
+    def _getGranuleReader(self, fileName: str) -> GranuleReader:
         """
-        Open the MOD44W subdataset and read as array, add to max extent.
+        The reader of a MOD44W product, shared by every stage of this run.
+        With a tile cache it reads the memory-mapped copy of the product.
         """
-        subdatasetFilePath = gdal.Open(fileName).GetSubDatasets()[0][0]
-        subdatasetGeoDS = GeospatialImageFile(fileName,
-                                              subdataset=subdatasetFilePath)
-        subdataset = subdatasetGeoDS.getDataset()
-        image = subdataset.GetRasterBand(1).ReadAsArray()
-        maxExtent += np.where(image == 1, 1, 0)
-        return maxExtent
+        if fileName not in self._granuleReaders:
+            self._granuleReaders[fileName] = GranuleReader(
+                fileName, tileCache=self._tileCache, logger=self._logger)
+
+        return self._granuleReaders[fileName]
 
     # -------------------------------------------------------------------------
-    # _getProjectionTransform()
+    # _getTileStack()
     # -------------------------------------------------------------------------
-    @staticmethod
-    def _getProjectionTransform(fileName: str) -> Tuple[str, str]:
+    def _getTileStack(self, mod44wFileList: list, tile: str) -> TileStack:
         """
-        Get transform and projection from a MOD44W product.
+        The water masks of all years of a tile in shared memory, loaded by
+        the first process on this node that needs them and attached to by
+        the others. Held until this lake finishes. Only the max extent is
+        computed from it, the per-year cuts read their granules.
         """
-        subdatasetFilePath = gdal.Open(fileName).GetSubDatasets()[0][0]
-        subdatasetGeoDS = GeospatialImageFile(fileName,
-                                              subdataset=subdatasetFilePath)
-        subdataset = subdatasetGeoDS.getDataset()
-        transform = subdataset.GetGeoTransform()
-        projection = subdataset.GetProjection()
-        return transform, projection
+        def load(array):
+            for i, mod44File in enumerate(mod44wFileList):
+                array[i] = self._getGranuleReader(mod44File).readWater()
+
+        key = StageCache.key({
+            'tile': tile,
+            'granules': LakeExtract._getGranuleIds(mod44wFileList)})
+        stack = TileStack.acquire(
+            key, (len(mod44wFileList),) + LakeExtract.MOD44_SHAPE, load,
+            logger=self._logger)
+        self._tileStacks.append(stack)
+        return stack
+
+    # -------------------------------------------------------------------------
+    # _releaseTileStacks()
+    # -------------------------------------------------------------------------
+    def _releaseTileStacks(self) -> None:
+
+        for stack in self._tileStacks:
+            stack.release()
+
+        self._tileStacks = []
+
+    # -------------------------------------------------------------------------
+    # _closeGranuleReaders()
+    # -------------------------------------------------------------------------
+    def _closeGranuleReaders(self) -> None:
+
+        for reader in self._granuleReaders.values():
+            reader.close()
+
+        self._granuleReaders = {}
 
     # -------------------------------------------------------------------------
     # _clipMaxExtent()
@@ -323,23 +1077,33 @@ class LakeExtract(object):
             self._maxExtentDir, maxExtentClippedFilename)
 
         cmd = 'gdal_translate' + \
-            ' -projwin' + \
-            ' ' + str(self._envelope.ulx()) + \
-            ' ' + str(self._envelope.uly()) + \
-            ' ' + str(self._envelope.lrx()) + \
-            ' ' + str(self._envelope.lry()) + \
-            ' -projwin_srs' + \
-            ' ' + LakeExtract.BBOX_SRS_EPSG + \
-            ' -epo' + \
-            ' -eco' + \
+            self._getClipOptions() + \
             ' -of GTiff' + \
             ' ' + maxExtentFilePath + \
             ' ' + maxExtentClippedFilePath
 
-        SystemCommand(cmd, logger=self._logger, raiseException=True)
+        self._runCommand(cmd, logger=self._logger)
 
         return maxExtentClippedFilePath
 
+    # -------------------------------------------------------------------------
+    # _getClipOptions()
+    # -------------------------------------------------------------------------
+    def _getClipOptions(self) -> str:
+        """
+        gdal_translate options clipping to the bounding box, failing when
+        the box is partially or completely outside of the tile.
+        """
+        return ' -projwin' + \
+            ' ' + str(self._getEnvelope().ulx()) + \
+            ' ' + str(self._getEnvelope().uly()) + \
+            ' ' + str(self._getEnvelope().lrx()) + \
+            ' ' + str(self._getEnvelope().lry()) + \
+            ' -projwin_srs' + \
+            ' ' + LakeExtract.BBOX_SRS_EPSG + \
+            ' -epo' + \
+            ' -eco'
+
     # -------------------------------------------------------------------------
     # _polygonizeLake()
     # -------------------------------------------------------------------------
@@ -349,131 +1113,176 @@ class LakeExtract(object):
         """
         polygonOutputFile = os.path.join(
             self._polygonDir,
-            'Lake.{}.Polygonized.{}.shp'.format(self._lakeNumber,
+            'Lake.{}.Polygonized.{}.fgb'.format(self._lakeNumber,
                                                 self._createStr))
 
         cmd = 'gdal_polygonize.py' + \
             ' ' + maxExtentClippedFilePath + \
             ' ' + polygonOutputFile + \
             ' -b 1' + \
-            ' -f "ESRI Shapefile"' + \
+            ' -f FlatGeobuf' + \
             ' DN'
 
-        SystemCommand(cmd, logger=self._logger, raiseException=True)
+        self._runCommand(cmd, logger=self._logger)
 
         return polygonOutputFile
 
+    # -------------------------------------------------------------------------
+    # _bufferLakeFile()
+    # -------------------------------------------------------------------------
+    def _bufferLakeFile(self, polygonizedFilePath: str) -> str:
+        """
+        Run the vector stages on the polygonized lake in memory and write
+        only their result, the buffered lake, as FlatGeobuf. It is the
+        stage checkpoint and the source of the cutline.
+        """
+        from osgeo import ogr
+
+        bufferedFilePath = os.path.join(
+            self._polygonDir,
+            'Lake.{}.Buffered.{}.fgb'.format(self._lakeNumber,
+                                             self._createStr))
+        polygonDS = ogr.Open(polygonizedFilePath)
+        polygonLayer = polygonDS.GetLayer()
+        srs = polygonLayer.GetSpatialRef()
+        srs = srs.Clone() if srs else None
+        lakes = self._bufferLake(polygonLayer)
+        polygonLayer = None
+        polygonDS = None
+        return LakeExtract._writePolygons(lakes, srs, bufferedFilePath)
+
+    # -------------------------------------------------------------------------
+    # _bufferLake()
+    # -------------------------------------------------------------------------
+    def _bufferLake(self, polygonLayer: 'ogr.Layer') -> list:
+        """
+        The clean, 1 pixel buffer, dissolve, target lake and 6 pixel buffer
+        stages, shared by extractLakes and extractMasks. Takes a polygonized
+        layer and returns the buffered target lake polygons.
+        """
+        with self._metrics.stage('cleanPolygon'):
+            lakes = LakeExtract._cleanPolygon(polygonLayer)
+
+        if not lakes:
+            raise ValueError('No water in the bounding box of lake {}'.format(
+                self._lakeNumber))
+
+        with self._metrics.stage('createBuffer1px'):
+            lakes = LakeExtract._createBuffer(lakes, LakeExtract.BUFFER_1PX)
+
+        with self._metrics.stage('dissolveBuffered'):
+            lakes = self._dissolveBuffered(lakes)
+
+        with self._metrics.stage('getTargetLake'):
+            lakes = LakeExtract._getTargetLake(lakes)
+
+        with self._metrics.stage('createBuffer6px'):
+            lakes = LakeExtract._createBuffer(lakes, LakeExtract.BUFFER_6PX)
+
+        return lakes
+
     # -------------------------------------------------------------------------
     # _cleanPolygon()
     # -------------------------------------------------------------------------
     @staticmethod
-    def _cleanPolygon(polygonOutputFile: str) -> str:
+    def _cleanPolygon(polygonLayer: 'ogr.Layer') -> list:
         """
-        Clean polygons.
+        Clean polygons, keeping the water, DN 1.
         """
-        polygonLakesCleanedFilePath = polygonOutputFile.replace(
-            'polygonized.shp', 'polygonized.cleaned.shp')
-        polygonLakes = gpd.read_file(polygonOutputFile)
-        polygonLakes = polygonLakes[polygonLakes['DN'] == 1]
-        polygonLakes.to_file(polygonLakesCleanedFilePath)
-        return polygonLakesCleanedFilePath
+        polygonLayer.ResetReading()
+
+        return [feature.GetGeometryRef().Clone() for feature in polygonLayer
+                if feature.GetField('DN') == 1 and
+                feature.GetGeometryRef() is not None]
 
     # -------------------------------------------------------------------------
     # _createBuffer()
     # -------------------------------------------------------------------------
-    def _createBuffer(self, polygonInputFile: str, outputBufferFilePath: str,
-                      pixelResolution: str) -> str:
-        """Creates a buffer of user defined extent around input shapefile."""
-        inputds = ogr.Open(polygonInputFile)
-        inputlyr = inputds.GetLayer()
-        shpdriver = ogr.GetDriverByName('ESRI Shapefile')
-        if os.path.exists(outputBufferFilePath):
-            shpdriver.DeleteDataSource(outputBufferFilePath)
-        outputBufferds = shpdriver.CreateDataSource(outputBufferFilePath)
-        bufferlyr = outputBufferds.CreateLayer(
-            outputBufferFilePath, geom_type=ogr.wkbPolygon)
-        featureDefn = bufferlyr.GetLayerDefn()
-
-        for feature in inputlyr:
-            ingeom = feature.GetGeometryRef()
-            geomBuffer = ingeom.Buffer(pixelResolution)
-
-            outFeature = ogr.Feature(featureDefn)
-            outFeature.SetGeometry(geomBuffer)
-            bufferlyr.CreateFeature(outFeature)
-            outFeature = None
-
-        return outputBufferFilePath
+    @staticmethod
+    def _createBuffer(polygons: list, pixelResolution: float) -> list:
+        """Creates a buffer of user defined extent around input polygons."""
+        return [polygon.Buffer(pixelResolution) for polygon in polygons]
 
     # -------------------------------------------------------------------------
     # dissolveBuffered()
     # -------------------------------------------------------------------------
-    def _dissolveBuffered(self, inputBufferFilePath: str) -> str:
+    def _dissolveBuffered(self, polygons: list) -> list:
         """
         Dissolves polygonized water bodies based off of geometries if more
         than one water body present.
         """
-        dissolvedPolygonOutputPath = os.path.join(
-            self._polygonDir,
-            'Lake.{}.Dissolved.{}.shp'.format(self._lakeNumber,
-                                              self._createStr))
-        initialBufferedPolygon = gpd.read_file(inputBufferFilePath)
-        if len(initialBufferedPolygon) > 1:
-            LakeExtract._dissolve(inputBufferFilePath,
-                                  dissolvedPolygonOutputPath)
-        else:
-            initialBufferedPolygon.to_file(dissolvedPolygonOutputPath)
-        return dissolvedPolygonOutputPath
+        from osgeo import ogr
 
-    # -------------------------------------------------------------------------
-    # _dissolve()
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def _dissolve(initialBufferedPolygonPath: str,
-                  dissolvedPolygonOutputPath: str,
-                  overwrite: bool = True) -> None:
-        """
-        Built to be used with createDS. Dissolves shapefile based on geometry.
-        """
-        ds = ogr.Open(initialBufferedPolygonPath)
-        lyr = ds.GetLayer()
-        out_ds, out_lyr = LakeExtract._createDS(dissolvedPolygonOutputPath,
-                                                ds.GetDriver().GetName(),
-                                                lyr.GetGeomType(),
-                                                lyr.GetSpatialRef(),
-                                                overwrite)
-        defn = out_lyr.GetLayerDefn()
-        multi = ogr.Geometry(ogr.wkbMultiPolygon)
-        for feat in lyr:
-            if feat.geometry():
+        if len(polygons) <= 1:
+            return polygons
+
+        with self._metrics.stage('dissolve'):
+            multi = ogr.Geometry(ogr.wkbMultiPolygon)
+
+            for polygon in polygons:
                 # This copies the first point to the end.
-                feat.geometry().CloseRings()
-                wkt = feat.geometry().ExportToWkt()
+                polygon.CloseRings()
+                wkt = polygon.ExportToWkt()
                 multi.AddGeometryDirectly(ogr.CreateGeometryFromWkt(wkt))
-        union = multi.UnionCascaded()
+
+            union = multi.UnionCascaded()
+
         if union.GetGeometryName() == 'MULTIPOLYGON':
-            for geom in union:
-                poly = ogr.CreateGeometryFromWkb(geom.ExportToWkb())
-                feat = ogr.Feature(defn)
-                feat.SetGeometry(poly)
-                out_lyr.CreateFeature(feat)
-        else:
-            out_feat = ogr.Feature(defn)
-            out_feat.SetGeometry(union)
-            out_lyr.CreateFeature(out_feat)
-            out_ds.Destroy()
-        ds.Destroy()
+            return [ogr.CreateGeometryFromWkb(geom.ExportToWkb())
+                    for geom in union]
+
+        return [union]
+
+    # -------------------------------------------------------------------------
+    # _getTargetLake()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _getTargetLake(polygons: list) -> list:
+        """
+        Get the largest water body of the dissolved polygons.
+        """
+        largest = max(polygon.GetArea() for polygon in polygons)
+        return [polygon for polygon in polygons
+                if polygon.GetArea() == largest]
+
+    # -------------------------------------------------------------------------
+    # _writePolygons()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _writePolygons(polygons: list, srs: 'osr.SpatialReference',
+                       filePath: str) -> str:
+        """
+        Write polygons to a FlatGeobuf file, one feature each.
+        """
+        from osgeo import ogr
+
+        outputDS, outputLayer = LakeExtract._createDS(
+            filePath, 'FlatGeobuf', ogr.wkbPolygon, srs)
+        featureDefn = outputLayer.GetLayerDefn()
+
+        for polygon in polygons:
+            outFeature = ogr.Feature(featureDefn)
+            outFeature.SetGeometry(polygon)
+            outputLayer.CreateFeature(outFeature)
+            outFeature = None
+
+        # Releasing the dataset closes and flushes the file.
+        outputLayer = None
+        del outputDS
+        return filePath
 
     # -------------------------------------------------------------------------
     # createDS()
     # -------------------------------------------------------------------------
     @staticmethod
     def _createDS(ds_name, ds_format, geom_type, srs, overwrite=True) -> \
-            Tuple[ogr.DataSource, ogr.Layer]:
+            Tuple['ogr.DataSource', 'ogr.Layer']:
         """
         Credit: s6hebern on StackExchange.
         Converts the polygon shapefile to an iterable DS.
         """
+        from osgeo import ogr
+
         drv = ogr.GetDriverByName(ds_format)
         if os.path.exists(ds_name) and overwrite is True:
             os.remove(ds_name)
@@ -483,115 +1292,584 @@ class LakeExtract(object):
         return ds, lyr
 
     # -------------------------------------------------------------------------
-    # _getTargetLake()
+    # _prepareCutline()
     # -------------------------------------------------------------------------
-    def _getTargetLake(self, dissolvedPolygonInput: str) -> str:
+    def _prepareCutline(self, bufferedFilePath: str,
+                        mod44wFilePath: str) -> str:
         """
-        Get the largest water body in the dissolved polygon DF.
+        Simplify the buffered lake, preserving topology, within the cutline
+        tolerance, when there is one. Without it, the buffered lake is the
+        cutline and is not copied. When the lake has more than
+        cutlineMaxVertices vertices, it is rasterized to a mask on the
+        MOD44W grid and the years are cut against the mask instead.
         """
-        targetLakeFilePath = os.path.join(
+        from osgeo import ogr
+
+        inputDS = ogr.Open(bufferedFilePath)
+        inputLayer = inputDS.GetLayer()
+        srs = inputLayer.GetSpatialRef()
+        srs = srs.Clone() if srs else None
+        lakes = [feature.GetGeometryRef().Clone() for feature in inputLayer
+                 if feature.GetGeometryRef() is not None]
+        inputLayer = None
+        inputDS = None
+
+        lakes = self._simplifyLake(lakes)
+        cutlineFilePath = bufferedFilePath
+
+        if self._cutlineTolerance:
+            cutlineFilePath = LakeExtract._writePolygons(
+                lakes, srs, os.path.join(
+                    self._polygonDir,
+                    'Lake.{}.Cutline.{}.fgb'.format(self._lakeNumber,
+                                                    self._createStr)))
+
+        rasterize = self._cutlineMaxVertices is not None and \
+            sum(map(LakeExtract._countVertices, lakes)) > \
+            self._cutlineMaxVertices
+        self._metrics.setInfo(cutlineRasterized=rasterize)
+
+        if rasterize:
+            if self._logger:
+                self._logger.info('Cutting against a mask of the cutline')
+
+            return self._rasterizeCutline(cutlineFilePath, mod44wFilePath)
+
+        return cutlineFilePath
+
+    # -------------------------------------------------------------------------
+    # _simplifyLake()
+    # -------------------------------------------------------------------------
+    def _simplifyLake(self, lakes: list) -> list:
+        """
+        Simplify the buffered lake polygons within the cutline tolerance,
+        recording their vertices before and after. The polygonized pixel
+        staircases carry far more vertices than a sub-pixel outline needs,
+        and gdalwarp evaluates every one.
+        """
+        vertices = sum(map(LakeExtract._countVertices, lakes))
+
+        if self._cutlineTolerance:
+            lakes = [lake.SimplifyPreserveTopology(self._cutlineTolerance)
+                     for lake in lakes]
+
+        simplifiedVertices = sum(map(LakeExtract._countVertices, lakes))
+        self._metrics.setInfo(cutlineVertices=vertices,
+                              cutlineSimplifiedVertices=simplifiedVertices)
+
+        if self._logger:
+            self._logger.info('Cutline simplified from {} to {} '
+                              'vertices'.format(vertices,
+                                                simplifiedVertices))
+
+        return lakes
+
+    # -------------------------------------------------------------------------
+    # _countVertices()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _countVertices(geometry: 'ogr.Geometry') -> int:
+
+        if geometry.GetGeometryCount():
+            return sum(LakeExtract._countVertices(geometry.GetGeometryRef(i))
+                       for i in range(geometry.GetGeometryCount()))
+
+        return geometry.GetPointCount()
+
+    # -------------------------------------------------------------------------
+    # _rasterizeCutline()
+    # -------------------------------------------------------------------------
+    def _rasterizeCutline(self, cutlineFilePath: str,
+                          mod44wFilePath: str) -> str:
+        """
+        Burn the cutline into a mask aligned with the MOD44W tile, covering
+        the cutline's extent. A pixel is in the mask when its center is in
+        the cutline, as gdalwarp -cutline decides.
+        """
+        from osgeo import gdal
+        from osgeo import ogr
+
+        maskFilePath = os.path.join(
             self._polygonDir,
-            'Lake.{}.CenteredPolygon.{}.gpkg'.format(self._lakeNumber,
-                                                     self._createStr)
-        )
-        targetLakeDF = gpd.read_file(dissolvedPolygonInput)
-        targetLakeDF['area'] = targetLakeDF['geometry'].area
-        if len(targetLakeDF) > 1:
-            targetLakeDF = targetLakeDF[targetLakeDF['area']
-                                        == targetLakeDF['area'].max()]
-        targetLakeDF.to_file(targetLakeFilePath, driver='GPKG')
-        return targetLakeFilePath
+            'Lake.{}.CutlineMask.{}.tif'.format(self._lakeNumber,
+                                                self._createStr))
+        reader = self._getGranuleReader(mod44wFilePath)
+        transform = reader.getTransform()
+        cutlineDS = ogr.Open(cutlineFilePath)
+        cutlineLayer = cutlineDS.GetLayer()
+        minX, maxX, minY, maxY = cutlineLayer.GetExtent()
+        rows, cols = LakeExtract.MOD44_SHAPE
+        xOff = max(0, int(np.floor((minX - transform[0]) / transform[1])))
+        xEnd = min(cols, int(np.ceil((maxX - transform[0]) / transform[1])))
+        yOff = max(0, int(np.floor((maxY - transform[3]) / transform[5])))
+        yEnd = min(rows, int(np.ceil((minY - transform[3]) / transform[5])))
+
+        driver = gdal.GetDriverByName('GTiff')
+        maskDS = driver.Create(maskFilePath, xEnd - xOff, yEnd - yOff, 1,
+                               gdal.GDT_Byte, options=['COMPRESS=LZW'])
+        maskDS.SetGeoTransform((transform[0] + xOff * transform[1],
+                                transform[1], 0,
+                                transform[3] + yOff * transform[5],
+                                0, transform[5]))
+        maskDS.SetProjection(reader.getProjection())
+        gdal.RasterizeLayer(maskDS, [1], cutlineLayer, burn_values=[1])
+        maskDS = None
+        cutlineDS = None
+        driver = None
+        return maskFilePath
+
+    # -------------------------------------------------------------------------
+    # _maskOneYear()
+    # -------------------------------------------------------------------------
+    def _maskOneYear(self, mod44wFilePath: str, maskFilePath: str,
+                     bufferedLakeFilePath: str) -> None:
+        """
+        Cut one MOD44W water mask to the lake mask, setting the pixels
+        outside of the lake to 3, the nodata value of the cutline path.
+        Source nodata pixels become 3 too, as gdalwarp maps them.
+        """
+        from osgeo import gdal
+        from osgeo import gdal_array
+
+        maskDS = gdal.Open(maskFilePath)
+        mask = maskDS.GetRasterBand(1).ReadAsArray().astype(bool)
+        maskTransform = maskDS.GetGeoTransform()
+        projection = maskDS.GetProjection()
+        maskDS = None
+
+        # The year workers do not share readers, GDAL handles are not
+        # thread safe.
+        with GranuleReader(mod44wFilePath, tileCache=self._tileCache,
+                           logger=self._logger) as reader:
+            transform = reader.getTransform()
+            xOff = int(round((maskTransform[0] - transform[0]) /
+                             transform[1]))
+            yOff = int(round((maskTransform[3] - transform[3]) /
+                             transform[5]))
+            values = reader.readArray((xOff, yOff,
+                                       mask.shape[1], mask.shape[0]))
+            noData = reader.getNoDataValue()
+
+        if noData is not None:
+            mask &= values != noData
+
+        values = np.where(mask, values, 3).astype(values.dtype)
+
+        driver = gdal.GetDriverByName('GTiff')
+        outDS = driver.Create(
+            bufferedLakeFilePath, mask.shape[1], mask.shape[0], 1,
+            gdal_array.NumericTypeCodeToGDALTypeCode(values.dtype))
+        outDS.SetGeoTransform(maskTransform)
+        outDS.SetProjection(projection)
+        outBand = outDS.GetRasterBand(1)
+        outBand.WriteArray(values)
+        outBand.SetNoDataValue(3)
+        outBand = None
+        outDS = None
+        driver = None
 
     # -------------------------------------------------------------------------
     # _extractLakePerYear()
     # -------------------------------------------------------------------------
     def _extractLakePerYear(self, mod44wList: list,
-                            finalBufferedPolyInput: str) -> None:
+                            finalBufferedPolyInput: str) -> list:
         """
         For each MOD44W product in the year range, output the final buffered
-        product.
+        product. Years whose output is already complete are skipped, the
+        others are extracted concurrently by yearWorkers threads. With one
+        year worker, it is a writer thread instead: it warps and compresses
+        each year while the next one is cut to the lake. Each year's stage
+        and commands are recorded by the thread running them.
         """
+        # Resolve lazily built state here rather than on the workers.
+        self._getEnvelope()
         outputList = []
-        for mod44wFilePath in mod44wList:
-            if self._logger:
-                self._logger.debug(
-                    'Extracting for ' +
-                    '{}'.format(os.path.basename(mod44wFilePath)))
-            year = os.path.basename(mod44wFilePath).split('.')[1][1:5]
-            subdatasetName = gdal.Open(mod44wFilePath).GetSubDatasets()[0][0]
-            bufferedLakeFilePath = os.path.join(
-                self._bufferedDir,
-                'Lake.{}.{}.{}.tif'.format(self._lakeNumber, year,
-                                           self._createStr))
+
+        with ThreadPoolExecutor(max_workers=self._yearWorkers,
+                                thread_name_prefix='year') as workers:
+            for mod44wFilePath in mod44wList:
+                year = os.path.basename(mod44wFilePath).split('.')[1][1:5]
+                key = StageCache.key(
+                    {'parent': self._stageKeys['prepareCutline'],
+                     'granule': os.path.basename(mod44wFilePath),
+                     'lake': self._createStr})
+                self._stageKeys[year] = key
+                self._yearGranules[year] = os.path.basename(mod44wFilePath)
+
+                finalLakePath = self._loadStage(year, key)
+
+                if finalLakePath is not None:
+                    if self._logger:
+                        self._logger.info(
+                            'Reusing {} from checkpoint: {}'.format(
+                                year, finalLakePath))
+                    self._yearStatistics[year] = \
+                        self._loadYearStatistics(year, key, finalLakePath)
+                    outputList.append(finalLakePath)
+                    continue
+
+                subdatasetName = self._getGranuleReader(
+                    mod44wFilePath).getWaterMaskName()
+                stage = '{}/{}'.format(self._metrics.getStageName(), year)
+
+                if self._yearWorkers > 1:
+                    outputList.append(workers.submit(self._extractOneYear,
+                                                     mod44wFilePath,
+                                                     subdatasetName,
+                                                     finalBufferedPolyInput,
+                                                     year,
+                                                     key,
+                                                     stage))
+                    continue
+
+                start = time.perf_counter()
+
+                with self._metrics.workerStage(stage):
+                    bufferedLakeFilePath = self._cutOneYear(
+                        mod44wFilePath, subdatasetName,
+                        finalBufferedPolyInput, year, stage)
+
+                outputList.append(workers.submit(self._writeOneYearStage,
+                                                 year,
+                                                 key,
+                                                 bufferedLakeFilePath,
+                                                 start,
+                                                 stage + '/write'))
+
+            return [output if isinstance(output, str) else output.result()
+                    for output in outputList]
+
+    # -------------------------------------------------------------------------
+    # _extractOneYear()
+    # -------------------------------------------------------------------------
+    def _extractOneYear(self, mod44wFilePath: str,
+                        subdatasetName: str,
+                        finalBufferedPolyInput: str,
+                        year: str,
+                        key: str,
+                        stage: str) -> str:
+        """
+        Cut one year and write it, on a year worker, which records the
+        year's stage.
+        """
+        with self._metrics.workerStage(stage):
+            start = time.perf_counter()
+            bufferedLakeFilePath = self._cutOneYear(mod44wFilePath,
+                                                    subdatasetName,
+                                                    finalBufferedPolyInput,
+                                                    year,
+                                                    stage)
+            return self._writeOneYear(year, key, bufferedLakeFilePath, start,
+                                      stage)
+
+    # -------------------------------------------------------------------------
+    # _cutOneYear()
+    # -------------------------------------------------------------------------
+    def _cutOneYear(self, mod44wFilePath: str,
+                    subdatasetName: str,
+                    finalBufferedPolyInput: str,
+                    year: str,
+                    stage: str) -> str:
+        """
+        Cut one MOD44W water mask to the buffered lake. The lake is either a
+        cutline or, when prepareCutline rasterized it, a mask.
+        """
+        if self._logger:
+            self._logger.debug('Extracting for {}'.format(subdatasetName))
+
+        bufferedLakeFilePath = os.path.join(
+            self._bufferedDir,
+            'Lake.{}.{}.{}.tif'.format(self._lakeNumber, year,
+                                       self._createStr))
+
+        if finalBufferedPolyInput.endswith('.tif'):
+            self._maskOneYear(mod44wFilePath, finalBufferedPolyInput,
+                              bufferedLakeFilePath)
+        else:
             cmd = 'gdalwarp' + \
                 ' -overwrite' + \
                 ' -of GTiff' + \
-                ' -cutline' + \
-                ' ' + finalBufferedPolyInput + \
-                ' -crop_to_cutline' + \
-                ' -dstnodata 3.0' + \
+                self._getCutOptions(finalBufferedPolyInput) + \
                 ' ' + subdatasetName + \
                 ' ' + bufferedLakeFilePath
 
-            SystemCommand(cmd, raiseException=True)
+            self._runCommand(cmd, stage=stage)
 
-            xmin = str(self._envelope.ulx())
-            xmax = str(self._envelope.lrx())
-            ymin = str(self._envelope.lry())
-            ymax = str(self._envelope.uly())
+        return bufferedLakeFilePath
 
-            finalLakePath = os.path.join(
-                self._finalBufferedDir,
-                'lake_{}_MOD44W_{}_C6.tif'.format(self._lakeNumber,
-                                                  year))
+    # -------------------------------------------------------------------------
+    # _writeOneYearStage()
+    # -------------------------------------------------------------------------
+    def _writeOneYearStage(self, year: str, key: str,
+                           bufferedLakeFilePath: str, start: float,
+                           stage: str) -> str:
+        """
+        Write one cut year on the writer thread, which records the write as
+        its own stage.
+        """
+        with self._metrics.workerStage(stage):
+            return self._writeOneYear(year, key, bufferedLakeFilePath, start,
+                                      stage)
 
-            cmd = 'gdalwarp' + \
-                ' -overwrite' + \
-                ' -of GTiff' + \
-                ' -te ' + \
-                ' ' + xmin + \
-                ' ' + ymin + \
-                ' ' + xmax + \
-                ' ' + ymax + \
-                ' -te_srs' + \
-                ' ' + LakeExtract.BBOX_SRS_EPSG + \
-                ' -t_srs' + \
-                ' ' + LakeExtract.MOD_SRS + \
-                ' -tr' + \
-                ' ' + str(LakeExtract.TR_P) + \
-                ' ' + str(LakeExtract.TR_N) + \
-                ' -dstnodata 3.0' + \
-                ' -co COMPRESS=LZW' + \
-                ' ' + bufferedLakeFilePath + \
-                ' ' + finalLakePath
-
-            SystemCommand(cmd, logger=self._logger, raiseException=True)
-
-            outputList.append(finalLakePath)
+    # -------------------------------------------------------------------------
+    # _writeOneYear()
+    # -------------------------------------------------------------------------
+    def _writeOneYear(self, year: str, key: str, bufferedLakeFilePath: str,
+                      start: float, stage: str) -> str:
+        """
+        Warp one cut year to the bounding box, compress it, publish it and
+        record the year as complete. start is when the year's cut began.
+        """
+        # Written to the workspace and published once complete.
+        finalLakePath = os.path.join(
+            self._bufferedDir,
+            'lake_{}_MOD44W_{}_C6.tif'.format(self._lakeNumber, year))
+
+        cmd = 'gdalwarp' + \
+            ' -overwrite' + \
+            ' -of GTiff' + \
+            self._getBboxOptions() + \
+            ' -co COMPRESS=LZW' + \
+            self._getCompressOptions() + \
+            ' ' + bufferedLakeFilePath + \
+            ' ' + finalLakePath
+
+        self._runCommand(cmd, logger=self._logger, stage=stage)
+
+        # gdalwarp writes the raster in its own process, so the counts are
+        # read back once, from the page cache, and checkpointed with the
+        # year so a resumed run does not read it again.
+        statistics = WaterStatistics.fromFile(finalLakePath,
+                                              self._lakeNumber, year)
+        self._yearStatistics[year] = statistics
+        finalLakePath = self._publish(finalLakePath)
+        self._yearSeconds[year] = time.perf_counter() - start
+        self._stageCache.save(LakeExtract._statsStage(year), key, statistics)
+        self._stageCache.save(year, key, finalLakePath)
+
+        if self._logger:
+            self._logger.info('Generated {}'.format(finalLakePath))
+
+        return finalLakePath
+
+    # -------------------------------------------------------------------------
+    # _loadYearStatistics()
+    # -------------------------------------------------------------------------
+    def _loadYearStatistics(self, year: str, key: str,
+                            finalLakePath: str) -> dict:
+        """
+        The statistics checkpointed with a year, read from its raster only
+        when the checkpoint predates them.
+        """
+        statistics = self._stageCache.load(LakeExtract._statsStage(year), key)
+
+        if statistics is None:
+            statistics = WaterStatistics.fromFile(finalLakePath,
+                                                  self._lakeNumber, year)
+
+        return statistics
+
+    # -------------------------------------------------------------------------
+    # _statsStage()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _statsStage(year: str) -> str:
+        return '{}.stats'.format(year)
+
+    # -------------------------------------------------------------------------
+    # _publish()
+    # -------------------------------------------------------------------------
+    def _publish(self, filePath: str) -> str:
+        """
+        Move a complete output from the workspace to the final directory
+        under the same name, so a partial output never appears there. On
+        the same file system it is renamed. Otherwise it is copied next to
+        its final name, synced and checked for size, and then renamed.
+        """
+        finalPath = os.path.join(self._finalBufferedDir,
+                                 os.path.basename(filePath))
+
+        try:
+            os.replace(filePath, finalPath)
+            return finalPath
+
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        tmpPath = '{}.{}.tmp'.format(finalPath, os.getpid())
+
+        try:
+            shutil.copyfile(filePath, tmpPath)
+
+            with open(tmpPath, 'rb') as tmpFile:
+                os.fsync(tmpFile.fileno())
+
+            if os.path.getsize(tmpPath) != os.path.getsize(filePath):
+                raise RuntimeError('Incomplete copy of {} to {}'.format(
+                    filePath, tmpPath))
+
+            os.replace(tmpPath, finalPath)
+
+        except BaseException:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+
+        os.remove(filePath)
+        return finalPath
+
+    # -------------------------------------------------------------------------
+    # _writeWaterStatistics()
+    # -------------------------------------------------------------------------
+    def _writeWaterStatistics(self) -> str:
+        """
+        Write the per-year water statistics of this lake to
+        water-statistics, apart from the rasters, and append them to the
+        batch table, if there is one.
+        """
+        rows = [self._yearStatistics[year]
+                for year in sorted(self._yearStatistics)]
+        os.makedirs(self._statsDir, exist_ok=True)
+        tablePath = WaterStatistics.write(rows, os.path.join(
+            self._statsDir,
+            'lake_{}_MOD44W_C6_stats.csv'.format(self._lakeNumber)))
+
+        if self._statsFile:
+            WaterStatistics.append(rows, self._statsFile)
+
+        if self._logger:
+            self._logger.info('Generated {}'.format(tablePath))
+
+        return tablePath
+
+    # -------------------------------------------------------------------------
+    # _getCutOptions()
+    # -------------------------------------------------------------------------
+    def _getCutOptions(self, cutline: str) -> str:
+        """
+        gdalwarp options cutting to the buffered lake and cropping to it.
+        """
+        return self._getWarpOptions() + \
+            ' -cutline' + \
+            ' ' + cutline + \
+            ' -crop_to_cutline' + \
+            ' -dstnodata 3.0'
+
+    # -------------------------------------------------------------------------
+    # _getBboxOptions()
+    # -------------------------------------------------------------------------
+    def _getBboxOptions(self) -> str:
+        """
+        gdalwarp options warping to the bounding box on the MODIS
+        sinusoidal grid.
+        """
+        xmin = str(self._getEnvelope().ulx())
+        xmax = str(self._getEnvelope().lrx())
+        ymin = str(self._getEnvelope().lry())
+        ymax = str(self._getEnvelope().uly())
+
+        return self._getWarpOptions() + \
+            ' -te ' + \
+            ' ' + xmin + \
+            ' ' + ymin + \
+            ' ' + xmax + \
+            ' ' + ymax + \
+            ' -te_srs' + \
+            ' ' + LakeExtract.BBOX_SRS_EPSG + \
+            ' -t_srs' + \
+            ' ' + LakeExtract.MOD_SRS + \
+            ' -tr' + \
+            ' ' + str(LakeExtract.TR_P) + \
+            ' ' + str(LakeExtract.TR_N) + \
+            ' -dstnodata 3.0'
+
+    # -------------------------------------------------------------------------
+    # _getWarpOptions()
+    # -------------------------------------------------------------------------
+    def _getWarpOptions(self) -> str:
+        """
+        gdalwarp options for multithreaded warping and the warp memory
+        limit, in MB. Empty by default, leaving GDAL's defaults.
+        """
+        options = ''
+
+        if self._warpThreads:
+            options += ' -multi -wo NUM_THREADS={}'.format(self._warpThreads)
+
+        if self._warpMemory:
+            options += ' -wm {}'.format(self._warpMemory)
+
+        return options
+
+    # -------------------------------------------------------------------------
+    # _getCompressOptions()
+    # -------------------------------------------------------------------------
+    def _getCompressOptions(self) -> str:
+        """
+        gdalwarp option compressing the GeoTIFF with warpThreads threads.
+        """
+        return ''.join(' -co ' + option
+                       for option in self._getCreationThreads())
+
+    # -------------------------------------------------------------------------
+    # _getCreationThreads()
+    # -------------------------------------------------------------------------
+    def _getCreationThreads(self) -> list:
+        """
+        GeoTIFF creation options compressing with warpThreads threads.
+        """
+        if not self._warpThreads:
+            return []
+
+        return ['NUM_THREADS={}'.format(self._warpThreads)]
+
+    # -------------------------------------------------------------------------
+    # _runCommand()
+    # -------------------------------------------------------------------------
+    def _runCommand(self, cmd: str,
+                    logger: logging.Logger or None = None,
+                    stage: str or None = None) -> None:
+        """
+        Run an external GDAL command, recording its duration and arguments.
+        """
+        from core.model.SystemCommand import SystemCommand
+
+        with self._metrics.command(cmd, stage=stage):
+            SystemCommand(cmd, logger=logger, raiseException=True)
+
+    # -------------------------------------------------------------------------
+    # _rmDownloadDir()
+    # -------------------------------------------------------------------------
+    def _rmDownloadDir(self, downloadDir: str) -> None:
+        """
+        Removes extractMasks' temporary downloads. A failure is only logged,
+        so it does not replace the exception the run may be raising.
+        """
+        try:
+            shutil.rmtree(downloadDir)
+
+        except OSError as e:
             if self._logger:
-                self._logger.info('Generated {}'.format(finalLakePath))
+                self._logger.warning('Could not remove {}: {}'.format(
+                    downloadDir, e))
 
     # -------------------------------------------------------------------------
     # _rmOutputDirs()
     # -------------------------------------------------------------------------
     def _rmOutputDirs(self) -> None:
         """
-        Creates the output directories.
+        Removes the intermediate directories. Downloads are kept when
+        keepDownloads is set, so later lakes on the same tile reuse them.
         """
-        shutil.rmtree(self._mod44wDir)
+        if not self._keepDownloads:
+            shutil.rmtree(self._mod44wDir)
         shutil.rmtree(self._maxExtentDir)
         shutil.rmtree(self._polygonDir)
         shutil.rmtree(self._bufferedDir)
 
-    # -------------------------------------------------------------------------
-    # _getPostStr()
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def _getPostStr() -> str:
-        sdtdate = datetime.datetime.now()
-        year = sdtdate.year
-        hm = sdtdate.strftime('%H%M')
-        sdtdate = sdtdate.timetuple()
-        jdate = sdtdate.tm_yday
-        post_str = '{}{:03}{}'.format(year, jdate, hm)
-        return post_str
+        if self._workDir != self._outDir:
+            try:
+                os.rmdir(self._workDir)
+            except OSError:
+                pass
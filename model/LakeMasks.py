@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+
+from birkett_lake_extract.model.WaterStatistics import WaterStatistics
+
+
+# -----------------------------------------------------------------------------
+# class LakeMasks
+#
+# The per-year water masks of one lake, as LakeExtract.extractMasks() returns
+# them in memory: a (years, rows, columns) stack on the MODIS sinusoidal grid
+# of the bounding box, 1 for water, 0 for land and 3 outside of the lake
+# buffer, with its geotransform, projection and the buffered lake polygon.
+# Writing the rasters is optional.
+#
+# masks = LakeExtract(bbox, outDir, '772', 2001, 2015).extractMasks()
+# dataArray = masks.toDataArray()
+# -----------------------------------------------------------------------------
+class LakeMasks(object):
+
+    NODATA = 3
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 lakeNumber: str,
+                 years: list,
+                 masks: np.ndarray,
+                 transform: tuple,
+                 projection: str,
+                 lakeWkt: str) -> None:
+
+        if len(years) != masks.shape[0]:
+            raise ValueError('{} years for {} masks'.format(len(years),
+                                                            masks.shape[0]))
+
+        self._lakeNumber = lakeNumber
+        self._years = [int(year) for year in years]
+        self._masks = masks
+        self._transform = tuple(transform)
+        self._projection = projection
+        self._lakeWkt = lakeWkt
+
+    # -------------------------------------------------------------------------
+    # getLakeNumber()
+    # -------------------------------------------------------------------------
+    def getLakeNumber(self) -> str:
+        return self._lakeNumber
+
+    # -------------------------------------------------------------------------
+    # getYears()
+    # -------------------------------------------------------------------------
+    def getYears(self) -> list:
+        return list(self._years)
+
+    # -------------------------------------------------------------------------
+    # getMasks()
+    # -------------------------------------------------------------------------
+    def getMasks(self) -> np.ndarray:
+        return self._masks
+
+    # -------------------------------------------------------------------------
+    # getMask()
+    # -------------------------------------------------------------------------
+    def getMask(self, year: int) -> np.ndarray:
+        return self._masks[self._years.index(int(year))]
+
+    # -------------------------------------------------------------------------
+    # getTransform()
+    # -------------------------------------------------------------------------
+    def getTransform(self) -> tuple:
+        return self._transform
+
+    # -------------------------------------------------------------------------
+    # getProjection()
+    # -------------------------------------------------------------------------
+    def getProjection(self) -> str:
+        return self._projection
+
+    # -------------------------------------------------------------------------
+    # getLakeWkt()
+    # -------------------------------------------------------------------------
+    def getLakeWkt(self) -> str:
+        return self._lakeWkt
+
+    # -------------------------------------------------------------------------
+    # getLake()
+    # -------------------------------------------------------------------------
+    def getLake(self):
+        """
+        The buffered lake the years were cut to, as a shapely geometry in
+        the projection of the masks.
+        """
+        from shapely import wkt
+
+        return wkt.loads(self._lakeWkt)
+
+    # -------------------------------------------------------------------------
+    # getCoordinates()
+    # -------------------------------------------------------------------------
+    def getCoordinates(self) -> tuple:
+        """
+        The x and y coordinates of the pixel centers.
+        """
+        rows, cols = self._masks.shape[1:]
+        x = self._transform[0] + (np.arange(cols) + 0.5) * self._transform[1]
+        y = self._transform[3] + (np.arange(rows) + 0.5) * self._transform[5]
+        return x, y
+
+    # -------------------------------------------------------------------------
+    # toDataArray()
+    # -------------------------------------------------------------------------
+    def toDataArray(self):
+        """
+        The masks as an xarray DataArray with year, y and x coordinates,
+        carrying the projection and geotransform in its attributes.
+        """
+        import xarray as xr
+
+        x, y = self.getCoordinates()
+
+        return xr.DataArray(
+            self._masks,
+            dims=('year', 'y', 'x'),
+            coords={'year': self._years, 'y': y, 'x': x},
+            name='lake_{}'.format(self._lakeNumber),
+            attrs={'crs': self._projection,
+                   'transform': self._transform,
+                   'nodata': LakeMasks.NODATA})
+
+    # -------------------------------------------------------------------------
+    # getStatistics()
+    # -------------------------------------------------------------------------
+    def getStatistics(self) -> list:
+        """
+        The water statistics rows of each year, as extractLakes writes
+        them, with no file.
+        """
+        return [WaterStatistics.fromArray(mask, self._transform,
+                                          self._lakeNumber, year, '')
+                for year, mask in zip(self._years, self._masks)]
+
+    # -------------------------------------------------------------------------
+    # write()
+    # -------------------------------------------------------------------------
+    def write(self, outDir: str) -> list:
+        """
+        Write each year as lake_<n>_MOD44W_<year>_C6.tif, the rasters
+        extractLakes writes, and return their paths.
+        """
+        from osgeo import gdal
+        from osgeo import gdal_array
+
+        os.makedirs(outDir, exist_ok=True)
+        driver = gdal.GetDriverByName('GTiff')
+        rows, cols = self._masks.shape[1:]
+        dataType = gdal_array.NumericTypeCodeToGDALTypeCode(
+            self._masks.dtype)
+        outputs = []
+
+        for year, mask in zip(self._years, self._masks):
+            filePath = os.path.join(
+                outDir, 'lake_{}_MOD44W_{}_C6.tif'.format(self._lakeNumber,
+                                                          year))
+            outDS = driver.Create(filePath, cols, rows, 1, dataType,
+                                  options=['COMPRESS=LZW'])
+            outDS.SetGeoTransform(self._transform)
+            outDS.SetProjection(self._projection)
+            outBand = outDS.GetRasterBand(1)
+            outBand.WriteArray(mask)
+            outBand.SetNoDataValue(LakeMasks.NODATA)
+            outBand = None
+            outDS = None
+            outputs.append(filePath)
+
+        driver = None
+        return outputs
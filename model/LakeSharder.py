@@ -0,0 +1,292 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+
+from birkett_lake_extract.model.ModisGrid import ModisGrid
+from birkett_lake_extract.model.OutputCatalog import OutputCatalog
+from birkett_lake_extract.model.WaterStatistics import WaterStatistics
+
+
+# -----------------------------------------------------------------------------
+# class LakeSharder
+#
+# Splits a lake catalog into N shards with MODIS tile affinity: all lakes
+# whose first CMR granule is of the same tile go to the same shard, so each
+# tile's granules are downloaded on one node only. A lake outside of its
+# first tile also downloads the second, which its neighbors usually share
+# but is not part of the assignment. The partition depends only on the
+# catalog and N, so every array task computes the same assignment.
+#
+# Each shard runs in <outDir>/shards/<i> and writes a completion manifest,
+# merge() then collects the shards' outputs and metrics into outDir, and the
+# water statistics of every lake into one batch table. Rows of an output
+# catalog are pointed at the merged outputs.
+# -----------------------------------------------------------------------------
+class LakeSharder(object):
+
+    SHARD_DIR = 'shards'
+    MANIFEST = 'manifest.json'
+    METRICS = 'metrics.jsonl'
+    STATS = 'water_stats.csv'
+    LAKE_STATS = '*_stats.csv'
+    FINAL_DIR = 'final-buffered-rasters'
+    STATS_DIR = 'water-statistics'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 lakes: list,
+                 numShards: int,
+                 logger: logging.Logger or None = None) -> None:
+
+        if numShards < 1:
+            raise RuntimeError('Number of shards must be at least 1, got {}'.
+                               format(numShards))
+
+        self._lakes = lakes
+        self._numShards = numShards
+        self._logger = logger
+        self._shards = LakeSharder._partition(lakes, numShards)
+
+    # -------------------------------------------------------------------------
+    # getTile()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def getTile(bbox: list) -> str:
+        """
+        The tile LakeExtract downloads first for a lake: of the tiles whose
+        lon/lat rectangle CMR finds intersecting the bounding box, the first
+        by name, as CMR lists them. That is often a neighbor of the tile
+        under the center of the box.
+        """
+        minLon, minLat, maxLon, maxLat = map(float, bbox)
+        tiles = ModisGrid.tilesForBbox(minLon, minLat, maxLon, maxLat)
+
+        if not tiles:
+            return ModisGrid.tileOfLonLat((minLon + maxLon) / 2,
+                                          (minLat + maxLat) / 2)
+
+        return min(ModisGrid.tileName(h, v) for h, v in tiles)
+
+    # -------------------------------------------------------------------------
+    # _partition()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _partition(lakes: list, numShards: int) -> list:
+        """
+        Group lakes by tile and assign the groups, largest first, to the
+        shard with the fewest lakes so far. Ties resolve by tile name and
+        shard index, which keeps the assignment deterministic.
+        """
+        tiles = {}
+
+        for lake in lakes:
+            tile = LakeSharder.getTile(lake['bbox'])
+            tiles.setdefault(tile, []).append(dict(lake, tile=tile))
+
+        shards = [[] for _ in range(numShards)]
+
+        for tile in sorted(tiles, key=lambda t: (-len(tiles[t]), t)):
+            smallest = min(range(numShards),
+                           key=lambda i: (len(shards[i]), i))
+            shards[smallest].extend(tiles[tile])
+
+        return shards
+
+    # -------------------------------------------------------------------------
+    # getShard()
+    # -------------------------------------------------------------------------
+    def getShard(self, shardIndex: int) -> list:
+
+        if not 0 <= shardIndex < self._numShards:
+            raise RuntimeError('Shard {} out of range 0-{}'.format(
+                shardIndex, self._numShards - 1))
+
+        return list(self._shards[shardIndex])
+
+    # -------------------------------------------------------------------------
+    # getLakeDirs()
+    # -------------------------------------------------------------------------
+    def getLakeDirs(self, outDir: str) -> list:
+        """
+        Each lake with the directory runShard runs it in, shard by shard.
+        """
+        return [(lake, LakeSharder.getShardDir(outDir, shardIndex))
+                for shardIndex in range(self._numShards)
+                for lake in self._shards[shardIndex]]
+
+    # -------------------------------------------------------------------------
+    # parseShard()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def parseShard(shard: str or None, environ: dict = os.environ) -> tuple:
+        """
+        Shard index and count from an explicit 'i/N', or from the Slurm array
+        task variables when shard is None.
+        """
+        if shard:
+            try:
+                index, count = map(int, shard.split('/'))
+            except ValueError:
+                raise RuntimeError('Invalid shard {}, expected i/N'.format(
+                    shard))
+            return index, count
+
+        if 'SLURM_ARRAY_TASK_ID' not in environ:
+            raise RuntimeError('No shard given and SLURM_ARRAY_TASK_ID ' +
+                               'is not set.')
+
+        taskMin = int(environ.get('SLURM_ARRAY_TASK_MIN', 0))
+        index = int(environ['SLURM_ARRAY_TASK_ID']) - taskMin
+
+        if 'SLURM_ARRAY_TASK_COUNT' in environ:
+            count = int(environ['SLURM_ARRAY_TASK_COUNT'])
+        else:
+            count = int(environ['SLURM_ARRAY_TASK_MAX']) - taskMin + 1
+
+        return index, count
+
+    # -------------------------------------------------------------------------
+    # getShardDir()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def getShardDir(outDir: str, shardIndex: int) -> str:
+        return os.path.join(outDir, LakeSharder.SHARD_DIR, str(shardIndex))
+
+    # -------------------------------------------------------------------------
+    # runShard()
+    # -------------------------------------------------------------------------
+    def runShard(self, shardIndex: int, outDir: str, lakeFactory) -> dict:
+        """
+        Run every lake of one shard in its shard directory. lakeFactory is
+        called as lakeFactory(lake, shardDir, metricsFile) and returns a
+        LakeExtract. A failing lake is recorded and the shard continues.
+        Returns the manifest, which is also written to the shard directory.
+        """
+        shardDir = LakeSharder.getShardDir(outDir, shardIndex)
+        metricsFile = os.path.join(shardDir, LakeSharder.METRICS)
+        os.makedirs(shardDir, exist_ok=True)
+        results = []
+
+        for lake in self.getShard(shardIndex):
+            start = time.perf_counter()
+            result = {'lakeNumber': lake['lakeNumber'], 'tile': lake['tile']}
+
+            try:
+                lakeFactory(lake, shardDir, metricsFile).extractLakes()
+                result['status'] = 'complete'
+
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = '{}: {}'.format(type(e).__name__, e)
+                if self._logger:
+                    self._logger.exception('Lake {} failed'.format(
+                        lake['lakeNumber']))
+
+            result['seconds'] = time.perf_counter() - start
+            results.append(result)
+
+        manifest = {'shard': shardIndex,
+                    'numShards': self._numShards,
+                    'completedAt': datetime.datetime.now().isoformat(),
+                    'lakes': results}
+        LakeSharder._writeJson(os.path.join(shardDir, LakeSharder.MANIFEST),
+                               manifest)
+        return manifest
+
+    # -------------------------------------------------------------------------
+    # merge()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def merge(outDir: str,
+              catalogFile: str or None = None,
+              logger: logging.Logger or None = None) -> dict:
+        """
+        Collect the final rasters and metrics of every completed shard into
+        outDir. Shards without a manifest are reported as missing. The
+        rows of catalogFile, if given, are pointed at the merged rasters.
+        """
+        finalDir = os.path.join(outDir, LakeSharder.FINAL_DIR)
+        os.makedirs(finalDir, exist_ok=True)
+        manifests = []
+
+        for manifestPath in sorted(glob.glob(os.path.join(
+                outDir, LakeSharder.SHARD_DIR, '*', LakeSharder.MANIFEST))):
+            with open(manifestPath) as inFile:
+                manifests.append((os.path.dirname(manifestPath),
+                                  json.load(inFile)))
+
+        numShards = max([m['numShards'] for _, m in manifests], default=0)
+        completed = {m['shard'] for _, m in manifests}
+        metricsLines = []
+        moves = {}
+
+        for shardDir, manifest in manifests:
+            shardFinalDir = os.path.join(shardDir, LakeSharder.FINAL_DIR)
+
+            if os.path.isdir(shardFinalDir):
+                for fileName in sorted(os.listdir(shardFinalDir)):
+                    shardPath = os.path.join(shardFinalDir, fileName)
+                    moves[shardPath] = os.path.join(finalDir, fileName)
+                    shutil.copy2(shardPath, moves[shardPath])
+
+            shardMetrics = os.path.join(shardDir, LakeSharder.METRICS)
+
+            if os.path.exists(shardMetrics):
+                with open(shardMetrics) as inFile:
+                    metricsLines.extend(line for line in inFile
+                                        if line.strip())
+
+        with open(os.path.join(outDir, LakeSharder.METRICS), 'w') as outFile:
+            outFile.writelines(metricsLines)
+
+        statsRows = [row
+                     for shardDir, _ in manifests
+                     for tablePath in sorted(glob.glob(os.path.join(
+                         shardDir, LakeSharder.STATS_DIR,
+                         LakeSharder.LAKE_STATS)))
+                     for row in WaterStatistics.read(tablePath)]
+        WaterStatistics.write(statsRows,
+                              os.path.join(outDir, LakeSharder.STATS))
+
+        if catalogFile:
+            OutputCatalog(catalogFile, logger=logger).relocate(moves)
+
+        numOutputs = len(moves)
+        lakes = [lake for _, m in manifests for lake in m['lakes']]
+        merged = {'numShards': numShards,
+                  'missingShards': sorted(set(range(numShards)) - completed),
+                  'numLakes': len(lakes),
+                  'numOutputs': numOutputs,
+                  'numStatsRows': len(statsRows),
+                  'failedLakes': [lake for lake in lakes
+                                  if lake['status'] != 'complete']}
+        LakeSharder._writeJson(os.path.join(outDir, LakeSharder.MANIFEST),
+                               merged)
+
+        if logger:
+            logger.info('Merged {} shards, {} outputs, {} failed lakes, '
+                        'missing shards: {}'.format(
+                            len(manifests), numOutputs,
+                            len(merged['failedLakes']),
+                            merged['missingShards']))
+
+        return merged
+
+    # -------------------------------------------------------------------------
+    # _writeJson()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _writeJson(filePath: str, content: dict) -> None:
+
+        tmpPath = '{}.{}.tmp'.format(filePath, os.getpid())
+
+        with open(tmpPath, 'w') as outFile:
+            json.dump(content, outFile, indent=2)
+
+        os.replace(tmpPath, filePath)
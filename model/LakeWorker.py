@@ -0,0 +1,290 @@
+import datetime
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+
+
+# -----------------------------------------------------------------------------
+# class LakeWorker
+#
+# A long-lived process that runs lake jobs from a file-based queue, so the
+# cost of importing GDAL and core and of initializing their drivers is
+# paid once instead of once per lake. The queue is a directory that any
+# number of workers, on any node sharing the file system, can poll:
+#
+# <queueDir>/pending/<job>.json   submitted, waiting
+# <queueDir>/running/<job>.json   claimed by a worker
+# <queueDir>/done/<job>.json      finished, with its result
+# <queueDir>/failed/<job>.json    raised, with the error
+#
+# Jobs are claimed by renaming them out of pending, which is atomic, so two
+# workers never run the same job. Creating <queueDir>/stop asks every
+# worker to exit after its current job.
+# -----------------------------------------------------------------------------
+class LakeWorker(object):
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STOP_FILE = 'stop'
+    JOB_KEYS = ['lakeNumber', 'bbox', 'startYear', 'endYear', 'outDir']
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 queueDir: str,
+                 lakeFactory,
+                 workerId: str or None = None,
+                 logger: logging.Logger or None = None) -> None:
+        """
+        lakeFactory is called as lakeFactory(job, logger) and returns a
+        LakeExtract, or anything with extractLakes().
+        """
+        self._queueDir = queueDir
+        self._lakeFactory = lakeFactory
+        self._workerId = workerId or '{}.{}'.format(socket.gethostname(),
+                                                    os.getpid())
+        self._logger = logger or logging.getLogger(__name__)
+        self._stopRequested = False
+        LakeWorker._makeQueueDirs(queueDir)
+
+    # -------------------------------------------------------------------------
+    # _makeQueueDirs()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeQueueDirs(queueDir: str) -> None:
+        for state in (LakeWorker.PENDING, LakeWorker.RUNNING,
+                      LakeWorker.DONE, LakeWorker.FAILED):
+            os.makedirs(os.path.join(queueDir, state), exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # submit()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def submit(queueDir: str, job: dict) -> str:
+        """
+        Add a job to the queue and return its id. Jobs run in submission
+        order.
+        """
+        missing = [key for key in LakeWorker.JOB_KEYS if key not in job]
+
+        if missing:
+            raise RuntimeError('Job is missing {}'.format(missing))
+
+        try:
+            bbox = [float(coord) for coord in job['bbox']]
+        except (TypeError, ValueError):
+            bbox = []
+
+        if len(bbox) != 4:
+            raise RuntimeError('Job bbox takes four numbers, got {}'.format(
+                job['bbox']))
+
+        LakeWorker._makeQueueDirs(queueDir)
+        jobId = '{}.lake{}.{}'.format(
+            datetime.datetime.now().strftime('%Y%m%d%H%M%S%f'),
+            job['lakeNumber'], uuid.uuid4().hex[:8])
+        job = dict(job, jobId=jobId,
+                   outDir=os.path.abspath(job['outDir']),
+                   submittedAt=datetime.datetime.now().isoformat())
+        LakeWorker._writeJson(LakeWorker._jobPath(queueDir,
+                                                  LakeWorker.PENDING,
+                                                  jobId), job)
+        return jobId
+
+    # -------------------------------------------------------------------------
+    # requeue()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def requeue(queueDir: str) -> list:
+        """
+        Move the jobs left in running by workers that died back to pending.
+        Only call this when no worker is running.
+        """
+        runningDir = os.path.join(queueDir, LakeWorker.RUNNING)
+        jobIds = []
+
+        for fileName in sorted(os.listdir(runningDir)):
+            if not fileName.endswith('.json'):
+                continue
+            jobId = fileName[:-len('.json')]
+            os.replace(os.path.join(runningDir, fileName),
+                       LakeWorker._jobPath(queueDir, LakeWorker.PENDING,
+                                           jobId))
+            jobIds.append(jobId)
+
+        return jobIds
+
+    # -------------------------------------------------------------------------
+    # status()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def status(queueDir: str) -> dict:
+        """
+        Number of jobs in each state.
+        """
+        return {state: len([f for f in os.listdir(os.path.join(queueDir,
+                                                               state))
+                            if f.endswith('.json')])
+                for state in (LakeWorker.PENDING, LakeWorker.RUNNING,
+                              LakeWorker.DONE, LakeWorker.FAILED)}
+
+    # -------------------------------------------------------------------------
+    # serve()
+    # -------------------------------------------------------------------------
+    def serve(self,
+              pollSeconds: float = 5.0,
+              exitWhenIdle: bool = False,
+              maxJobs: int or None = None) -> int:
+        """
+        Run jobs until stopped by SIGTERM, SIGINT or the stop file, or, with
+        exitWhenIdle, until the queue is empty. Returns the number of jobs
+        run.
+        """
+        previous = {sig: signal.signal(sig, self._requestStop)
+                    for sig in (signal.SIGTERM, signal.SIGINT)}
+        numJobs = 0
+
+        self._logger.info('Worker {} serving {}'.format(self._workerId,
+                                                        self._queueDir))
+        try:
+            while not self._shouldStop():
+
+                if maxJobs is not None and numJobs >= maxJobs:
+                    break
+
+                job = self.claim()
+
+                if job is None:
+                    if exitWhenIdle:
+                        break
+                    time.sleep(pollSeconds)
+                    continue
+
+                self.runJob(job)
+                numJobs += 1
+
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+        self._logger.info('Worker {} ran {} jobs'.format(self._workerId,
+                                                         numJobs))
+        return numJobs
+
+    # -------------------------------------------------------------------------
+    # claim()
+    # -------------------------------------------------------------------------
+    def claim(self) -> dict or None:
+        """
+        Take the oldest pending job, None when the queue is empty.
+        """
+        pendingDir = os.path.join(self._queueDir, LakeWorker.PENDING)
+
+        for fileName in sorted(os.listdir(pendingDir)):
+            if not fileName.endswith('.json'):
+                continue
+
+            jobId = fileName[:-len('.json')]
+            runningPath = LakeWorker._jobPath(self._queueDir,
+                                              LakeWorker.RUNNING, jobId)
+            try:
+                os.rename(os.path.join(pendingDir, fileName), runningPath)
+
+            except FileNotFoundError:
+                # Another worker claimed it first.
+                continue
+
+            with open(runningPath) as jobFile:
+                return json.load(jobFile)
+
+        return None
+
+    # -------------------------------------------------------------------------
+    # runJob()
+    # -------------------------------------------------------------------------
+    def runJob(self, job: dict) -> dict:
+        """
+        Run a claimed job, logging to <outDir>/<jobId>.log as well as the
+        worker's log, and move it to done or failed with its result.
+        """
+        jobId = job['jobId']
+        os.makedirs(job['outDir'], exist_ok=True)
+        logPath = os.path.join(job['outDir'], '{}.log'.format(jobId))
+        handler = logging.FileHandler(logPath)
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"))
+        self._logger.addHandler(handler)
+
+        result = {'worker': self._workerId,
+                  'startedAt': datetime.datetime.now().isoformat(),
+                  'log': logPath}
+        start = time.perf_counter()
+
+        try:
+            self._logger.info('Job {} started, lake {}'.format(
+                jobId, job['lakeNumber']))
+            self._lakeFactory(job, self._logger).extractLakes()
+            result['status'] = 'complete'
+
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = '{}: {}'.format(type(e).__name__, e)
+            self._logger.exception('Job {} failed'.format(jobId))
+
+        finally:
+            result['seconds'] = time.perf_counter() - start
+            self._logger.info('Job {} {} in {:.1f}s'.format(
+                jobId, result['status'], result['seconds']))
+            self._logger.removeHandler(handler)
+            handler.close()
+
+        state = LakeWorker.DONE if result['status'] == 'complete' \
+            else LakeWorker.FAILED
+        LakeWorker._writeJson(LakeWorker._jobPath(self._queueDir, state,
+                                                  jobId),
+                              dict(job, result=result))
+        os.remove(LakeWorker._jobPath(self._queueDir, LakeWorker.RUNNING,
+                                      jobId))
+        return result
+
+    # -------------------------------------------------------------------------
+    # _requestStop()
+    # -------------------------------------------------------------------------
+    def _requestStop(self, signum, frame) -> None:
+        self._logger.info('Worker {} stopping after the current job'.format(
+            self._workerId))
+        self._stopRequested = True
+
+    # -------------------------------------------------------------------------
+    # _shouldStop()
+    # -------------------------------------------------------------------------
+    def _shouldStop(self) -> bool:
+        return self._stopRequested or os.path.exists(
+            os.path.join(self._queueDir, LakeWorker.STOP_FILE))
+
+    # -------------------------------------------------------------------------
+    # _jobPath()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _jobPath(queueDir: str, state: str, jobId: str) -> str:
+        return os.path.join(queueDir, state, '{}.json'.format(jobId))
+
+    # -------------------------------------------------------------------------
+    # _writeJson()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _writeJson(filePath: str, content: dict) -> None:
+
+        tmpPath = '{}.{}.tmp'.format(filePath, os.getpid())
+
+        with open(tmpPath, 'w') as outFile:
+            json.dump(content, outFile, indent=2)
+
+        os.replace(tmpPath, filePath)
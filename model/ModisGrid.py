@@ -0,0 +1,152 @@
+import functools
+import math
+from typing import Tuple
+
+
+# -----------------------------------------------------------------------------
+# class ModisGrid
+#
+# The MODIS sinusoidal tile grid used by MOD44W. Pure Python so tiles can
+# be resolved without GDAL, e.g. by the sharder and the local CMR stand-in.
+# -----------------------------------------------------------------------------
+class ModisGrid(object):
+
+    EARTH_RADIUS = 6371007.181
+    TILE_SIZE = 1111950.5196666666
+    TILE_PIXELS = 4800
+    PIXEL_SIZE = TILE_SIZE / TILE_PIXELS
+    ULX = -20015109.354
+    ULY = 10007554.677
+    NUM_H = 36
+    NUM_V = 18
+
+    PROJ4 = '+proj=sinu +lon_0=0 +x_0=0 +y_0=0 +R=6371007.181 ' + \
+        '+units=m +no_defs'
+
+    # -------------------------------------------------------------------------
+    # toSinusoidal()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def toSinusoidal(lon: float, lat: float) -> Tuple[float, float]:
+        latRad = math.radians(lat)
+        x = ModisGrid.EARTH_RADIUS * math.radians(lon) * math.cos(latRad)
+        y = ModisGrid.EARTH_RADIUS * latRad
+        return x, y
+
+    # -------------------------------------------------------------------------
+    # toLonLat()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def toLonLat(x: float, y: float) -> Tuple[float, float]:
+        latRad = y / ModisGrid.EARTH_RADIUS
+        lon = math.degrees(x / (ModisGrid.EARTH_RADIUS * math.cos(latRad)))
+        return lon, math.degrees(latRad)
+
+    # -------------------------------------------------------------------------
+    # tileName()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def tileName(h: int, v: int) -> str:
+        return 'h{:02}v{:02}'.format(h, v)
+
+    # -------------------------------------------------------------------------
+    # parseTileName()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def parseTileName(tile: str) -> Tuple[int, int]:
+        return int(tile[1:3]), int(tile[4:6])
+
+    # -------------------------------------------------------------------------
+    # tileOrigin()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def tileOrigin(h: int, v: int) -> Tuple[float, float]:
+        """
+        Upper left corner of a tile in sinusoidal meters.
+        """
+        return ModisGrid.ULX + h * ModisGrid.TILE_SIZE, \
+            ModisGrid.ULY - v * ModisGrid.TILE_SIZE
+
+    # -------------------------------------------------------------------------
+    # geoTransform()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def geoTransform(h: int, v: int) -> tuple:
+        ulx, uly = ModisGrid.tileOrigin(h, v)
+        return (ulx, ModisGrid.PIXEL_SIZE, 0.0,
+                uly, 0.0, -ModisGrid.PIXEL_SIZE)
+
+    # -------------------------------------------------------------------------
+    # tileOf()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def tileOf(x: float, y: float) -> Tuple[int, int]:
+        h = int((x - ModisGrid.ULX) // ModisGrid.TILE_SIZE)
+        v = int((ModisGrid.ULY - y) // ModisGrid.TILE_SIZE)
+        return h, v
+
+    # -------------------------------------------------------------------------
+    # tileOfLonLat()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def tileOfLonLat(lon: float, lat: float) -> str:
+        """
+        Name of the tile containing a lon/lat point, e.g. h09v04.
+        """
+        return ModisGrid.tileName(*ModisGrid.tileOf(
+            *ModisGrid.toSinusoidal(lon, lat)))
+
+    # -------------------------------------------------------------------------
+    # tileLonLatBounds()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def tileLonLatBounds(h: int, v: int, samples: int = 16) -> tuple or None:
+        """
+        Lon/lat bounding rectangle of a tile, as CMR indexes MOD44W granules.
+        Sinusoidal meridians are curved, so the rectangle is much wider than
+        the tile and overlaps its neighbors. None for tiles off the globe.
+        """
+        ulx, uly = ModisGrid.tileOrigin(h, v)
+        lons = []
+        lats = []
+
+        for i in range(samples + 1):
+            for j in range(samples + 1):
+                x = ulx + ModisGrid.TILE_SIZE * i / samples
+                y = uly - ModisGrid.TILE_SIZE * j / samples
+                lon, lat = ModisGrid.toLonLat(x, y)
+                if -180 <= lon <= 180:
+                    lons.append(lon)
+                    lats.append(lat)
+                else:
+                    lons.append(math.copysign(180, lon))
+
+        if not lats:
+            return None
+
+        return min(lons), min(lats), max(lons), max(lats)
+
+    # -------------------------------------------------------------------------
+    # tilesForBbox()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def tilesForBbox(minLon: float, minLat: float, maxLon: float,
+                     maxLat: float) -> list:
+        """
+        Tiles whose lon/lat bounding rectangle intersects the bounding box.
+        Like CMR, this returns neighboring tiles that do not contain the box,
+        which exercises the LakeExtract fallback to the second granule.
+        """
+        tiles = []
+
+        for h in range(ModisGrid.NUM_H):
+            for v in range(ModisGrid.NUM_V):
+                bounds = ModisGrid.tileLonLatBounds(h, v)
+                if bounds is None:
+                    continue
+                if bounds[0] <= maxLon and minLon <= bounds[2] and \
+                        bounds[1] <= maxLat and minLat <= bounds[3]:
+                    tiles.append((h, v))
+
+        return tiles
@@ -0,0 +1,228 @@
+from contextlib import closing
+import datetime
+import hashlib
+import logging
+import os
+import sqlite3
+
+
+# -----------------------------------------------------------------------------
+# class OutputCatalog
+#
+# A SQLite record of every final raster produced, one row per lake and year,
+# with the lake's bounding box, the granule, the hash of the lake's
+# parameters and of its parameters and inputs, the output path, its SHA-256
+# checksum and the seconds the year took. A batch run asks isCurrent() before
+# processing a lake and skips it when the catalog already has its outputs for
+# the same inputs and parameters. The bounding boxes are indexed by an R*Tree
+# for spatial queries.
+#
+# Several processes may share a catalog on a local or lock-capable file
+# system, writes wait for each other up to TIMEOUT seconds.
+#
+# catalog = OutputCatalog('outputs.sqlite')
+# rows = catalog.query(bbox=[13.2, 46.1, 14.0, 47.0])
+# -----------------------------------------------------------------------------
+class OutputCatalog(object):
+
+    TIMEOUT = 60.0
+    COLUMNS = ['lakeNumber', 'year', 'minLon', 'minLat', 'maxLon', 'maxLat',
+               'granule', 'paramsKey', 'lakeKey', 'outputPath', 'bytes',
+               'checksum', 'seconds', 'createdAt']
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS outputs ('
+        ' id INTEGER PRIMARY KEY,'
+        ' lakeNumber TEXT NOT NULL,'
+        ' year INTEGER NOT NULL,'
+        ' minLon REAL, minLat REAL, maxLon REAL, maxLat REAL,'
+        ' granule TEXT,'
+        ' paramsKey TEXT,'
+        ' lakeKey TEXT,'
+        ' outputPath TEXT,'
+        ' bytes INTEGER,'
+        ' checksum TEXT,'
+        ' seconds REAL,'
+        ' createdAt TEXT,'
+        ' UNIQUE (lakeNumber, year))',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS outputs_bbox USING rtree('
+        ' id, minLon, maxLon, minLat, maxLat)',
+        'CREATE INDEX IF NOT EXISTS outputs_lakeKey'
+        ' ON outputs (lakeNumber, lakeKey)',
+    ]
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 catalogFile: str,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._catalogFile = catalogFile
+        self._logger = logger
+        catalogDir = os.path.dirname(catalogFile)
+
+        if catalogDir:
+            os.makedirs(catalogDir, exist_ok=True)
+
+        with closing(self._connect()) as connection, connection:
+            for statement in OutputCatalog.SCHEMA:
+                connection.execute(statement)
+
+    # -------------------------------------------------------------------------
+    # record()
+    # -------------------------------------------------------------------------
+    def record(self, rows: list) -> None:
+        """
+        Insert or replace the rows of a lake's years in one transaction.
+        Rows are dictionaries with the COLUMNS, createdAt is filled in.
+        """
+        createdAt = datetime.datetime.now().isoformat()
+
+        with closing(self._connect()) as connection, connection:
+            for row in rows:
+                row = dict(row, createdAt=row.get('createdAt') or createdAt)
+                connection.execute(
+                    'DELETE FROM outputs_bbox WHERE id IN (SELECT id FROM '
+                    'outputs WHERE lakeNumber = ? AND year = ?)',
+                    (row['lakeNumber'], int(row['year'])))
+                connection.execute(
+                    'INSERT OR REPLACE INTO outputs ({}) VALUES ({})'.format(
+                        ', '.join(OutputCatalog.COLUMNS),
+                        ', '.join('?' * len(OutputCatalog.COLUMNS))),
+                    [row[column] for column in OutputCatalog.COLUMNS])
+                connection.execute(
+                    'INSERT INTO outputs_bbox (id, minLon, maxLon, minLat, '
+                    'maxLat) SELECT id, minLon, maxLon, minLat, maxLat '
+                    'FROM outputs WHERE lakeNumber = ? AND year = ?',
+                    (row['lakeNumber'], int(row['year'])))
+
+        if self._logger:
+            self._logger.info('Cataloged {} outputs in {}'.format(
+                len(rows), self._catalogFile))
+
+    # -------------------------------------------------------------------------
+    # relocate()
+    # -------------------------------------------------------------------------
+    def relocate(self, moves: dict) -> int:
+        """
+        Point the rows whose output was moved to its new path. moves maps
+        old to new paths. Returns the number of rows updated.
+        """
+        updated = 0
+
+        with closing(self._connect()) as connection, connection:
+            for oldPath, newPath in moves.items():
+                updated += connection.execute(
+                    'UPDATE outputs SET outputPath = ? WHERE outputPath = ?',
+                    (os.path.abspath(newPath),
+                     os.path.abspath(oldPath))).rowcount
+
+        if self._logger:
+            self._logger.info('Relocated {} outputs in {}'.format(
+                updated, self._catalogFile))
+
+        return updated
+
+    # -------------------------------------------------------------------------
+    # isCurrent()
+    # -------------------------------------------------------------------------
+    def isCurrent(self, lakeNumber: str, lakeKey: str, paramsKey: str,
+                  years: list) -> bool:
+        """
+        True when every year is cataloged for the lake with the same inputs
+        and parameters keys, and its output still exists with the recorded
+        size.
+        """
+        current = {row['year']: row for row in self.getLake(lakeNumber)
+                   if row['lakeKey'] == lakeKey and
+                   row['paramsKey'] == paramsKey}
+
+        if not years:
+            return False
+
+        for year in years:
+            row = current.get(int(year))
+
+            if row is None:
+                return False
+
+            try:
+                if os.path.getsize(row['outputPath']) != row['bytes']:
+                    return False
+
+            except OSError:
+                return False
+
+        return True
+
+    # -------------------------------------------------------------------------
+    # getLake()
+    # -------------------------------------------------------------------------
+    def getLake(self, lakeNumber: str) -> list:
+        """
+        The rows of one lake, by year.
+        """
+        return self._select('WHERE lakeNumber = ? ORDER BY year',
+                            (str(lakeNumber),))
+
+    # -------------------------------------------------------------------------
+    # query()
+    # -------------------------------------------------------------------------
+    def query(self, bbox: list or None = None,
+              year: int or None = None) -> list:
+        """
+        The rows whose bounding box intersects bbox, given as min lon, min
+        lat, max lon, max lat, and of year if given, ordered by lake and
+        year.
+        """
+        clauses = []
+        params = []
+
+        if bbox is not None:
+            minLon, minLat, maxLon, maxLat = map(float, bbox)
+            clauses.append('id IN (SELECT id FROM outputs_bbox WHERE '
+                           'maxLon >= ? AND minLon <= ? AND '
+                           'maxLat >= ? AND minLat <= ?)')
+            params.extend([minLon, maxLon, minLat, maxLat])
+
+        if year is not None:
+            clauses.append('year = ?')
+            params.append(int(year))
+
+        where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        return self._select(where + ' ORDER BY lakeNumber, year',
+                            tuple(params))
+
+    # -------------------------------------------------------------------------
+    # checksum()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def checksum(filePath: str) -> str:
+
+        digest = hashlib.sha256()
+
+        with open(filePath, 'rb') as inFile:
+            for block in iter(lambda: inFile.read(1 << 20), b''):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+    # -------------------------------------------------------------------------
+    # _select()
+    # -------------------------------------------------------------------------
+    def _select(self, where: str, params: tuple) -> list:
+
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            cursor = connection.execute(
+                'SELECT {} FROM outputs {}'.format(
+                    ', '.join(OutputCatalog.COLUMNS), where), params)
+            return [dict(row) for row in cursor]
+
+    # -------------------------------------------------------------------------
+    # _connect()
+    # -------------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._catalogFile,
+                               timeout=OutputCatalog.TIMEOUT)
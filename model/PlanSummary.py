@@ -0,0 +1,76 @@
+# -----------------------------------------------------------------------------
+# class PlanSummary
+#
+# Aggregates the LakeExtract.plan() of many lakes into the totals needed to
+# size a campaign: unique downloads, expected bytes, tiles shared across
+# lakes and expected output count.
+# -----------------------------------------------------------------------------
+class PlanSummary(object):
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self) -> None:
+        self._plans = []
+
+    # -------------------------------------------------------------------------
+    # add()
+    # -------------------------------------------------------------------------
+    def add(self, plan: dict) -> None:
+        self._plans.append(plan)
+
+    # -------------------------------------------------------------------------
+    # summarize()
+    # -------------------------------------------------------------------------
+    def summarize(self) -> dict:
+        """
+        Granules already on disk are not counted as downloads. Fallback
+        granules are counted apart, they are only downloaded for lakes that
+        fall outside the first tile CMR returns.
+        """
+        primary = {}
+        fallback = {}
+        lakesPerTile = {}
+        granuleReferences = 0
+
+        for plan in self._plans:
+            if plan['complete']:
+                continue
+
+            for granule in plan['granules']:
+                target = fallback if granule['fallback'] else primary
+                target[granule['fileName']] = granule
+
+                if not granule['fallback']:
+                    granuleReferences += 1
+                    lakesPerTile.setdefault(granule['tile'], set()).add(
+                        plan['lakeNumber'])
+
+        fallback = {name: granule for name, granule in fallback.items()
+                    if name not in primary}
+        downloads = [g for g in primary.values() if not g['local']]
+        fallbackDownloads = [g for g in fallback.values() if not g['local']]
+
+        return {
+            'numLakes': len(self._plans),
+            'lakesComplete': sum(1 for p in self._plans if p['complete']),
+            'expectedOutputs': sum(p['expectedOutputs'] for p in self._plans),
+            'missingYears': sum(len(p['missingYears']) for p in self._plans),
+            'granuleReferences': granuleReferences,
+            'uniqueGranules': len(primary),
+            'uniqueDownloads': len(downloads),
+            'expectedBytes': PlanSummary._sumBytes(downloads),
+            'unknownSizeDownloads': sum(1 for g in downloads
+                                        if g['sizeBytes'] is None),
+            'fallbackDownloads': len(fallbackDownloads),
+            'fallbackBytes': PlanSummary._sumBytes(fallbackDownloads),
+            'numTiles': len(lakesPerTile),
+            'sharedTiles': {tile: len(lakes) for tile, lakes in
+                            sorted(lakesPerTile.items()) if len(lakes) > 1}}
+
+    # -------------------------------------------------------------------------
+    # _sumBytes()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _sumBytes(granules: list) -> int:
+        return sum(g['sizeBytes'] for g in granules if g['sizeBytes'])
@@ -0,0 +1,235 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import warnings
+
+
+# -----------------------------------------------------------------------------
+# class Profiler
+#
+# Profiles a LakeExtract run. Python time is captured with cProfile and
+# written as a pstats dump, optionally a py-spy sampling flame graph is
+# recorded. The text report combines the hottest Python functions with the
+# external GDAL commands recorded by StageMetrics. cProfile only sees the
+# thread that enables it, so threads started while profiling, the year and
+# download workers, get their own profile and are merged into the dump. From
+# Python 3.12, cProfile sees every thread.
+# -----------------------------------------------------------------------------
+class Profiler(object):
+
+    PY_SPY = 'py-spy'
+    NUM_FUNCTIONS = 40
+    PER_THREAD = sys.version_info < (3, 12)
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 profileFile: str,
+                 flameGraphFile: str or None = None,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._profileFile = profileFile
+        self._flameGraphFile = flameGraphFile
+        self._logger = logger
+        self._profile = cProfile.Profile()
+        self._threadProfiles = []
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    # -------------------------------------------------------------------------
+    # __enter__
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        self.start()
+        return self
+
+    # -------------------------------------------------------------------------
+    # __exit__
+    # -------------------------------------------------------------------------
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.stop()
+
+    # -------------------------------------------------------------------------
+    # start()
+    # -------------------------------------------------------------------------
+    def start(self) -> None:
+
+        if self._flameGraphFile:
+            self._startSampler()
+
+        if Profiler.PER_THREAD:
+            threading.setprofile(self._profileThread)
+
+        self._profile.enable()
+
+    # -------------------------------------------------------------------------
+    # stop()
+    # -------------------------------------------------------------------------
+    def stop(self) -> None:
+
+        self._profile.disable()
+        threading.setprofile(None)
+        self._stopSampler()
+
+        profileDir = os.path.dirname(self._profileFile)
+
+        if profileDir:
+            os.makedirs(profileDir, exist_ok=True)
+
+        self._getStats().dump_stats(self._profileFile)
+
+        if self._logger:
+            self._logger.info('Wrote profile {}'.format(self._profileFile))
+
+    # -------------------------------------------------------------------------
+    # _profileThread()
+    # -------------------------------------------------------------------------
+    def _profileThread(self, frame, event, arg) -> None:
+        """
+        Profile hook of new threads, called on their first event. Replaces
+        itself with a cProfile profile of the thread.
+        """
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+
+        with self._lock:
+            self._threadProfiles.append(profile)
+
+        profile.enable()
+
+    # -------------------------------------------------------------------------
+    # _getStats()
+    # -------------------------------------------------------------------------
+    def _getStats(self, stream: io.StringIO or None = None) -> pstats.Stats:
+        """
+        The calling thread's profile merged with the profiles of the other
+        threads.
+        """
+        stats = pstats.Stats(self._profile, stream=stream)
+
+        with self._lock:
+            threadProfiles = list(self._threadProfiles)
+
+        for profile in threadProfiles:
+            stats.add(profile)
+
+        return stats
+
+    # -------------------------------------------------------------------------
+    # _startSampler()
+    # -------------------------------------------------------------------------
+    def _startSampler(self) -> None:
+        """
+        Attach py-spy to this process. The --subprocesses flag makes the GDAL
+        Python scripts (gdal_polygonize.py) show up in the flame graph too.
+        """
+        pySpy = shutil.which(Profiler.PY_SPY)
+
+        if not pySpy:
+            msg = '{} not found, no flame graph will be written.'.format(
+                Profiler.PY_SPY)
+            warnings.warn(msg)
+            if self._logger:
+                self._logger.info(msg)
+            return
+
+        cmd = [pySpy, 'record',
+               '--pid', str(os.getpid()),
+               '--subprocesses',
+               '--format', 'flamegraph',
+               '--output', self._flameGraphFile]
+
+        self._sampler = subprocess.Popen(cmd,
+                                         stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.PIPE)
+
+    # -------------------------------------------------------------------------
+    # _stopSampler()
+    # -------------------------------------------------------------------------
+    def _stopSampler(self) -> None:
+        """
+        py-spy writes its output when interrupted.
+        """
+        if not self._sampler:
+            return
+
+        self._sampler.send_signal(signal.SIGINT)
+        _, err = self._sampler.communicate()
+
+        if self._sampler.returncode and self._logger:
+            self._logger.info('py-spy failed: {}'.format(err))
+
+        elif self._logger:
+            self._logger.info('Wrote flame graph {}'.format(
+                self._flameGraphFile))
+
+        self._sampler = None
+
+    # -------------------------------------------------------------------------
+    # writeReport()
+    # -------------------------------------------------------------------------
+    def writeReport(self, commands: list) -> str:
+        """
+        Write the combined Python and external command report next to the
+        pstats dump. Returns the path of the report.
+        """
+        reportFile = self._profileFile + '.txt'
+
+        with open(reportFile, 'w') as outFile:
+            outFile.write(Profiler._formatCommands(commands))
+            outFile.write('\n')
+            outFile.write(self._formatFunctions())
+
+        if self._logger:
+            self._logger.info('Wrote profile report {}'.format(reportFile))
+
+        return reportFile
+
+    # -------------------------------------------------------------------------
+    # _formatFunctions()
+    # -------------------------------------------------------------------------
+    def _formatFunctions(self) -> str:
+
+        stream = io.StringIO()
+        stream.write('Python functions by cumulative time\n')
+        stats = self._getStats(stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        stats.print_stats(Profiler.NUM_FUNCTIONS)
+        return stream.getvalue()
+
+    # -------------------------------------------------------------------------
+    # _formatCommands()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _formatCommands(commands: list) -> str:
+
+        lines = []
+        totals = {}
+
+        for command in commands:
+            totals[command['program']] = \
+                totals.get(command['program'], 0.0) + command['seconds']
+
+        lines.append('External commands by total time')
+        for program, seconds in sorted(totals.items(),
+                                       key=lambda item: -item[1]):
+            lines.append('{:>10.3f}s  {}'.format(seconds, program))
+
+        lines.append('')
+        lines.append('External commands in order run')
+        for command in commands:
+            lines.append('{:>10.3f}s  {:<8} {:<28} {}'.format(
+                command['seconds'],
+                command['status'],
+                command['stage'],
+                command['command']))
+
+        return '\n'.join(lines) + '\n'
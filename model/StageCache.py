@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import os
+
+
+# -----------------------------------------------------------------------------
+# class StageCache
+#
+# Completion markers for LakeExtract stages, keyed by a hash of the stage's
+# inputs and parameters. A marker stores the stage's result (an output path,
+# a list of paths or a small JSON value), so a rerun with the same inputs
+# can reuse the result instead of recomputing it. A cache without a
+# directory keeps nothing, for runs that must not write any files.
+# -----------------------------------------------------------------------------
+class StageCache(object):
+
+    KEY_LENGTH = 16
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 cacheDir: str or None,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._cacheDir = cacheDir
+        self._logger = logger
+
+    # -------------------------------------------------------------------------
+    # key()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def key(params: dict) -> str:
+        """
+        Hash of JSON serializable parameters, independent of key order.
+        """
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+        return digest[:StageCache.KEY_LENGTH]
+
+    # -------------------------------------------------------------------------
+    # load()
+    # -------------------------------------------------------------------------
+    def load(self, stageName: str, key: str):
+        """
+        Return the stored result of a completed stage, None if there is none.
+        """
+        if self._cacheDir is None:
+            return None
+
+        markerPath = self._markerPath(stageName, key)
+
+        if not os.path.exists(markerPath):
+            return None
+
+        try:
+            with open(markerPath) as markerFile:
+                return json.load(markerFile)['result']
+
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # -------------------------------------------------------------------------
+    # save()
+    # -------------------------------------------------------------------------
+    def save(self, stageName: str, key: str, result) -> None:
+        """
+        Record a stage as complete. The marker is written to a temporary file
+        and renamed so a preempted job never leaves a partial marker.
+        """
+        if self._cacheDir is None:
+            return
+
+        os.makedirs(self._cacheDir, exist_ok=True)
+        markerPath = self._markerPath(stageName, key)
+        tmpPath = '{}.{}.tmp'.format(markerPath, os.getpid())
+
+        with open(tmpPath, 'w') as markerFile:
+            json.dump({'stage': stageName, 'key': key, 'result': result},
+                      markerFile)
+
+        os.replace(tmpPath, markerPath)
+
+        if self._logger:
+            self._logger.debug('Checkpointed {} ({})'.format(stageName, key))
+
+    # -------------------------------------------------------------------------
+    # _markerPath()
+    # -------------------------------------------------------------------------
+    def _markerPath(self, stageName: str, key: str) -> str:
+        return os.path.join(self._cacheDir, '{}.{}.json'.format(
+            stageName.replace('/', '_'), key))
@@ -0,0 +1,328 @@
+from contextlib import contextmanager
+import datetime
+import json
+import logging
+import os
+import resource
+import time
+
+from birkett_lake_extract.model.libraries.daac_download \
+    import getDownloadStats
+from birkett_lake_extract.model.libraries.daac_download import getNetworkBytes
+
+
+# -----------------------------------------------------------------------------
+# class StageMetrics
+#
+# Records wall time, CPU time, peak RSS, disk and network bytes for each
+# stage of a LakeExtract run. CPU, RSS and disk figures include the GDAL
+# subprocesses the stage waited on. The download throughput and retries of
+# the run are recorded from the shared download limiter.
+# -----------------------------------------------------------------------------
+class StageMetrics(object):
+
+    PROC_IO = '/proc/self/io'
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 lakeNumber: str,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._lakeNumber = lakeNumber
+        self._logger = logger
+        self._stages = []
+        self._commands = []
+        self._granuleDownloads = []
+        self._stageStack = []
+        self._info = {}
+        self._startTime = datetime.datetime.now().isoformat()
+        self._startWall = time.perf_counter()
+        self._startDownloads = getDownloadStats()
+
+    # -------------------------------------------------------------------------
+    # setInfo()
+    # -------------------------------------------------------------------------
+    def setInfo(self, **kwargs) -> None:
+        """
+        Attach run level information (bbox, years, ...) to the record.
+        """
+        self._info.update(kwargs)
+
+    # -------------------------------------------------------------------------
+    # getStageName()
+    # -------------------------------------------------------------------------
+    def getStageName(self) -> str:
+        """
+        The full name of the innermost open stage, parent/child.
+        """
+        return '/'.join(self._stageStack)
+
+    # -------------------------------------------------------------------------
+    # stage()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager measuring the enclosed block. Stages may be nested,
+        nested stages are recorded as parent/child.
+        """
+        self._stageStack.append(name)
+        stageName = '/'.join(self._stageStack)
+        status = 'ok'
+        start = StageMetrics._snapshot()
+
+        try:
+            yield
+
+        except BaseException:
+            status = 'failed'
+            raise
+
+        finally:
+            end = StageMetrics._snapshot()
+            self._stageStack.pop()
+            record = StageMetrics._diff(stageName, start, end)
+            record['status'] = status
+            self._stages.append(record)
+
+            if self._logger:
+                self._logger.debug('Stage {} took {:.3f}s'.format(
+                    stageName, record['wallSeconds']))
+
+    # -------------------------------------------------------------------------
+    # workerStage()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def workerStage(self, stageName: str):
+        """
+        Context manager measuring a block run on a worker thread, recorded
+        under the full stage name the caller gives, as the stage stack is
+        the main thread's. CPU seconds are the worker thread's own. Child
+        CPU, disk and network counters are process-wide and include the
+        stages running concurrently.
+        """
+        status = 'ok'
+        start = StageMetrics._snapshot(thread=True)
+
+        try:
+            yield
+
+        except BaseException:
+            status = 'failed'
+            raise
+
+        finally:
+            end = StageMetrics._snapshot(thread=True)
+            record = StageMetrics._diff(stageName, start, end)
+            record['status'] = status
+            self._stages.append(record)
+
+            if self._logger:
+                self._logger.debug('Stage {} took {:.3f}s'.format(
+                    stageName, record['wallSeconds']))
+
+    # -------------------------------------------------------------------------
+    # command()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def command(self, cmd: str, stage: str or None = None):
+        """
+        Context manager timing an external command run by the enclosed
+        block. External commands are invisible to cProfile. Commands run by
+        other threads give their stage, the stage stack is the main
+        thread's.
+        """
+        status = 'ok'
+        start = time.perf_counter()
+
+        try:
+            yield
+
+        except BaseException:
+            status = 'failed'
+            raise
+
+        finally:
+            seconds = time.perf_counter() - start
+            self._commands.append({'program': cmd.split()[0],
+                                   'stage': stage or self.getStageName(),
+                                   'seconds': seconds,
+                                   'status': status,
+                                   'command': cmd})
+
+            if self._logger:
+                self._logger.debug('Command took {:.3f}s: {}'.format(
+                    seconds, cmd))
+
+    # -------------------------------------------------------------------------
+    # download()
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def download(self, filePath: str, stage: str or None = None):
+        """
+        Context manager timing the download of one file by the enclosed
+        block, and its size once it is on disk. Downloads run by other
+        threads give their stage, so download time is not charged to the
+        stage consuming the files.
+        """
+        status = 'ok'
+        start = time.perf_counter()
+
+        try:
+            yield
+
+        except BaseException:
+            status = 'failed'
+            raise
+
+        finally:
+            seconds = time.perf_counter() - start
+            self._granuleDownloads.append(
+                {'file': os.path.basename(filePath),
+                 'stage': stage or self.getStageName(),
+                 'seconds': seconds,
+                 'bytes': os.path.getsize(filePath)
+                 if os.path.exists(filePath) else 0,
+                 'status': status})
+
+            if self._logger:
+                self._logger.debug('Download took {:.3f}s: {}'.format(
+                    seconds, filePath))
+
+    # -------------------------------------------------------------------------
+    # _snapshot()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _snapshot(thread: bool = False) -> dict:
+        """
+        Sample the resource counters of this process and its reaped children.
+        With thread, the CPU time is the calling thread's.
+        """
+        selfUsage = resource.getrusage(resource.RUSAGE_SELF)
+        childUsage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        procIO = StageMetrics._readProcIO()
+
+        return {
+            'wall': time.perf_counter(),
+            'cpu': time.thread_time() if thread else
+            selfUsage.ru_utime + selfUsage.ru_stime,
+            'childCpu': childUsage.ru_utime + childUsage.ru_stime,
+            'maxRssKb': selfUsage.ru_maxrss,
+            'childMaxRssKb': childUsage.ru_maxrss,
+            'readBytes': procIO.get('read_bytes'),
+            'writeBytes': procIO.get('write_bytes'),
+            'networkBytes': getNetworkBytes(),
+            'downloadRetries': sum(getDownloadStats()['retries'].values())}
+
+    # -------------------------------------------------------------------------
+    # _readProcIO()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _readProcIO() -> dict:
+        """
+        Read the storage I/O counters from /proc. Linux accumulates the
+        counters of reaped children into the parent, so GDAL commands are
+        included. Returns an empty dictionary where /proc is unavailable.
+        """
+        counters = {}
+
+        try:
+            with open(StageMetrics.PROC_IO) as procIO:
+                for line in procIO:
+                    key, value = line.split(':')
+                    counters[key.strip()] = int(value)
+
+        except (OSError, ValueError):
+            pass
+
+        return counters
+
+    # -------------------------------------------------------------------------
+    # _diff()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _diff(stageName: str, start: dict, end: dict) -> dict:
+
+        def delta(key):
+            if start[key] is None or end[key] is None:
+                return None
+            return end[key] - start[key]
+
+        return {
+            'stage': stageName,
+            'wallSeconds': delta('wall'),
+            'cpuSeconds': delta('cpu'),
+            'childCpuSeconds': delta('childCpu'),
+            'peakRssKb': end['maxRssKb'],
+            'childPeakRssKb': end['childMaxRssKb'],
+            'rssGrowthKb': delta('maxRssKb'),
+            'readBytes': delta('readBytes'),
+            'writeBytes': delta('writeBytes'),
+            'networkBytes': delta('networkBytes'),
+            'downloadRetries': delta('downloadRetries')}
+
+    # -------------------------------------------------------------------------
+    # toDict()
+    # -------------------------------------------------------------------------
+    def toDict(self) -> dict:
+
+        record = {'lakeNumber': self._lakeNumber,
+                  'host': os.uname().nodename,
+                  'pid': os.getpid(),
+                  'startTime': self._startTime,
+                  'totalWallSeconds':
+                      time.perf_counter() - self._startWall}
+
+        record.update(self._info)
+        record['stages'] = list(self._stages)
+        record['commands'] = list(self._commands)
+        record['downloads'] = self._getDownloads()
+        return record
+
+    # -------------------------------------------------------------------------
+    # _getDownloads()
+    # -------------------------------------------------------------------------
+    def _getDownloads(self) -> dict:
+        """
+        Requests, completed downloads, bytes, throughput and retries by
+        reason since this record started, and each granule download with
+        its stage. Concurrent downloads overlap, so the throughput is of the
+        download time summed over threads.
+        """
+        start = self._startDownloads
+        end = getDownloadStats()
+        downloads = {key: end[key] - start[key]
+                     for key in ['requests', 'downloads', 'bytes', 'seconds']}
+        downloads['bytesPerSecond'] = \
+            downloads['bytes'] / downloads['seconds'] \
+            if downloads['seconds'] else None
+        downloads['retries'] = {
+            reason: count - start['retries'].get(reason, 0)
+            for reason, count in end['retries'].items()
+            if count > start['retries'].get(reason, 0)}
+        downloads['granules'] = list(self._granuleDownloads)
+        return downloads
+
+    # -------------------------------------------------------------------------
+    # toJson()
+    # -------------------------------------------------------------------------
+    def toJson(self) -> str:
+        return json.dumps(self.toDict(), default=str)
+
+    # -------------------------------------------------------------------------
+    # write()
+    # -------------------------------------------------------------------------
+    def write(self, metricsFile: str) -> None:
+        """
+        Append this lake's record as one JSON line, so the records of a batch
+        run can share one file.
+        """
+        metricsDir = os.path.dirname(metricsFile)
+
+        if metricsDir:
+            os.makedirs(metricsDir, exist_ok=True)
+
+        with open(metricsFile, 'a') as outFile:
+            outFile.write(self.toJson() + '\n')
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from birkett_lake_extract.model.GranuleReader import GranuleReader
+
+
+# -----------------------------------------------------------------------------
+# class TileCache
+#
+# Decoded copies of MOD44W water masks that can be memory-mapped. Each
+# granule is decoded from HDF once into <cacheDir>/<granule>.npy, an
+# uncompressed array, with a JSON sidecar holding its geotransform,
+# projection and nodata value and a raw VRT over the same bytes for the
+# GDAL command line tools. Later lakes on the same tile read windows of the
+# array through np.memmap, so repeated work costs page cache hits instead of
+# HDF decompression.
+#
+# The values are stored as read, not bit-packed, so windows are views of
+# the mapped file and gdalwarp can read it without conversion.
+# -----------------------------------------------------------------------------
+class TileCache(object):
+
+    ARRAY_EXT = '.npy'
+    SIDECAR_EXT = '.json'
+    VRT_EXT = '.vrt'
+    GDAL_TYPES = {'uint8': 'Byte', 'int8': 'Int8', 'uint16': 'UInt16',
+                  'int16': 'Int16', 'uint32': 'UInt32', 'int32': 'Int32',
+                  'float32': 'Float32', 'float64': 'Float64'}
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 cacheDir: str,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._cacheDir = cacheDir
+        self._logger = logger
+        os.makedirs(self._cacheDir, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # get()
+    # -------------------------------------------------------------------------
+    def get(self, granulePath: str) -> dict:
+        """
+        The cache entry of a granule, converting its water mask first if it
+        is not cached yet or the granule changed. The entry holds the
+        sidecar fields plus the paths of the array and VRT.
+        """
+        entry = self._load(granulePath)
+
+        if entry is None:
+            entry = self._convert(granulePath)
+
+        return entry
+
+    # -------------------------------------------------------------------------
+    # read()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def read(entry: dict, window: tuple or None = None) -> np.ndarray:
+        """
+        Read-only memory-mapped view of a cached water mask, or of a window
+        given as (xOff, yOff, xSize, ySize). No data is copied.
+        """
+        array = np.load(entry['array'], mmap_mode='r')
+
+        if window is None:
+            return array
+
+        xOff, yOff, xSize, ySize = window
+        return array[yOff:yOff + ySize, xOff:xOff + xSize]
+
+    # -------------------------------------------------------------------------
+    # _load()
+    # -------------------------------------------------------------------------
+    def _load(self, granulePath: str) -> dict or None:
+        """
+        The entry of a granule, None if it is missing, incomplete or was
+        made from a different file of the same name.
+        """
+        sidecarPath = self._getPath(granulePath, TileCache.SIDECAR_EXT)
+
+        try:
+            with open(sidecarPath) as sidecarFile:
+                entry = json.load(sidecarFile)
+
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('sourceSize') != os.path.getsize(granulePath) or \
+                not os.path.exists(entry['array']) or \
+                not os.path.exists(entry['vrt']):
+            return None
+
+        return entry
+
+    # -------------------------------------------------------------------------
+    # _convert()
+    # -------------------------------------------------------------------------
+    def _convert(self, granulePath: str) -> dict:
+        """
+        Decode the water mask once and write the array, VRT and sidecar.
+        Each file is written under a temporary name and renamed, the
+        sidecar last, so concurrent lakes never see a partial entry.
+        """
+        with GranuleReader(granulePath, logger=self._logger) as reader:
+            image = reader.readArray()
+            transform = reader.getTransform()
+            projection = reader.getProjection()
+            nodata = reader.getNoDataValue()
+
+        arrayPath = self._getPath(granulePath, TileCache.ARRAY_EXT)
+        tmpSuffix = '.{}.tmp'.format(os.getpid())
+
+        with open(arrayPath + tmpSuffix, 'wb') as arrayFile:
+            np.save(arrayFile, image)
+
+        os.replace(arrayPath + tmpSuffix, arrayPath)
+
+        entry = {'source': os.path.basename(granulePath),
+                 'sourceSize': os.path.getsize(granulePath),
+                 'array': arrayPath,
+                 'vrt': self._getPath(granulePath, TileCache.VRT_EXT),
+                 'shape': list(image.shape),
+                 'dataType': TileCache.GDAL_TYPES[image.dtype.name],
+                 'offset': int(np.load(arrayPath, mmap_mode='r').offset),
+                 'transform': list(transform),
+                 'projection': projection,
+                 'nodata': nodata}
+
+        with open(entry['vrt'] + tmpSuffix, 'w') as vrtFile:
+            vrtFile.write(TileCache._makeVrt(entry, image.dtype))
+
+        os.replace(entry['vrt'] + tmpSuffix, entry['vrt'])
+
+        sidecarPath = self._getPath(granulePath, TileCache.SIDECAR_EXT)
+
+        with open(sidecarPath + tmpSuffix, 'w') as sidecarFile:
+            json.dump(entry, sidecarFile)
+
+        os.replace(sidecarPath + tmpSuffix, sidecarPath)
+
+        if self._logger:
+            self._logger.debug('Cached {}'.format(arrayPath))
+
+        return entry
+
+    # -------------------------------------------------------------------------
+    # _makeVrt()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _makeVrt(entry: dict, dtype: np.dtype) -> str:
+        """
+        A raw raster VRT reading the array straight out of the .npy file.
+        """
+        rows, cols = entry['shape']
+        nodata = '' if entry['nodata'] is None else \
+            '    <NoDataValue>{}</NoDataValue>\n'.format(entry['nodata'])
+        byteOrder = 'MSB' if dtype.byteorder == '>' else 'LSB'
+
+        return ('<VRTDataset rasterXSize="{cols}" rasterYSize="{rows}">\n'
+                '  <SRS>{srs}</SRS>\n'
+                '  <GeoTransform>{transform}</GeoTransform>\n'
+                '  <VRTRasterBand dataType="{dataType}" band="1" '
+                'subClass="VRTRawRasterBand">\n'
+                '{nodata}'
+                '    <SourceFilename relativeToVRT="1">{source}'
+                '</SourceFilename>\n'
+                '    <ImageOffset>{offset}</ImageOffset>\n'
+                '    <PixelOffset>{pixel}</PixelOffset>\n'
+                '    <LineOffset>{line}</LineOffset>\n'
+                '    <ByteOrder>{byteOrder}</ByteOrder>\n'
+                '  </VRTRasterBand>\n'
+                '</VRTDataset>\n').format(
+                    cols=cols,
+                    rows=rows,
+                    srs=escape(entry['projection']),
+                    transform=', '.join(repr(v) for v in entry['transform']),
+                    dataType=entry['dataType'],
+                    nodata=nodata,
+                    source=escape(os.path.basename(entry['array'])),
+                    offset=entry['offset'],
+                    pixel=dtype.itemsize,
+                    line=cols * dtype.itemsize,
+                    byteOrder=byteOrder)
+
+    # -------------------------------------------------------------------------
+    # _getPath()
+    # -------------------------------------------------------------------------
+    def _getPath(self, granulePath: str, extension: str) -> str:
+        return os.path.join(self._cacheDir,
+                            os.path.basename(granulePath) + extension)
@@ -0,0 +1,298 @@
+from contextlib import contextmanager
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class TileStack
+#
+# The water masks of one tile for a range of years, held once per node in
+# POSIX shared memory so that worker processes running lakes on the same
+# tile attach read-only views instead of each loading the same 4800 x 4800
+# arrays into private memory. LakeExtract folds the stack into the max
+# extent. The per-year cuts still read each year's granule, which every
+# process downloads, since they need its raw values and gdalwarp reads
+# files.
+#
+# Every process holding a stack is recorded by PID in a small reference file
+# next to a lock. The process that releases the last reference, or finds
+# only dead processes left, unlinks the shared memory and the reference
+# file.
+#
+# with TileStack.acquire(key, (numYears, 4800, 4800), loader) as stack:
+#     maxExtent = stack.getArray().any(axis=0)
+# -----------------------------------------------------------------------------
+class TileStack(object):
+
+    PREFIX = 'blx_'
+    DTYPE = np.uint8
+    REF_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else \
+        tempfile.gettempdir()
+
+    # -------------------------------------------------------------------------
+    # __init__
+    # -------------------------------------------------------------------------
+    def __init__(self,
+                 name: str,
+                 shape: tuple,
+                 sharedMemory: shared_memory.SharedMemory,
+                 refDir: str,
+                 logger: logging.Logger or None = None) -> None:
+
+        self._name = name
+        self._shape = tuple(shape)
+        self._sharedMemory = sharedMemory
+        self._refDir = refDir
+        self._logger = logger
+        self._array = np.ndarray(self._shape, dtype=TileStack.DTYPE,
+                                 buffer=sharedMemory.buf)
+        self._array.flags.writeable = False
+
+    # -------------------------------------------------------------------------
+    # __enter__
+    # -------------------------------------------------------------------------
+    def __enter__(self):
+        return self
+
+    # -------------------------------------------------------------------------
+    # __exit__
+    # -------------------------------------------------------------------------
+    def __exit__(self, excType, excValue, traceback) -> None:
+        self.release()
+
+    # -------------------------------------------------------------------------
+    # getName()
+    # -------------------------------------------------------------------------
+    def getName(self) -> str:
+        return self._name
+
+    # -------------------------------------------------------------------------
+    # getArray()
+    # -------------------------------------------------------------------------
+    def getArray(self) -> np.ndarray:
+        """
+        Read-only (years, rows, columns) view of the shared water masks,
+        1 for water and 0 otherwise.
+        """
+        if self._array is None:
+            raise RuntimeError('Tile stack {} was released'.format(
+                self._name))
+
+        return self._array
+
+    # -------------------------------------------------------------------------
+    # acquire()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def acquire(key: str,
+                shape: tuple,
+                loader,
+                refDir: str or None = None,
+                logger: logging.Logger or None = None):
+        """
+        Attach to the stack identified by key, creating it if no live
+        process holds it. loader(array) fills a new, writable stack once.
+        """
+        refDir = refDir or TileStack.REF_DIR
+        name = TileStack.PREFIX + key
+
+        with TileStack._locked(refDir, name) as refs:
+            pids = TileStack._livePids(refs['pids'])
+
+            if not pids:
+                TileStack._unlink(name)
+                size = int(np.prod(shape)) * \
+                    np.dtype(TileStack.DTYPE).itemsize
+                sharedMemory = shared_memory.SharedMemory(name=name,
+                                                          create=True,
+                                                          size=size)
+                TileStack._untrack(sharedMemory)
+                array = np.ndarray(tuple(shape), dtype=TileStack.DTYPE,
+                                   buffer=sharedMemory.buf)
+
+                try:
+                    loader(array)
+
+                except Exception:
+                    del array
+                    sharedMemory.close()
+                    TileStack._unlink(name)
+                    raise
+
+                del array
+
+                if logger:
+                    logger.info('Loaded tile stack {} {}'.format(name,
+                                                                 shape))
+            else:
+                sharedMemory = shared_memory.SharedMemory(name=name)
+                TileStack._untrack(sharedMemory)
+
+            refs['pids'] = pids + [os.getpid()]
+
+        return TileStack(name, shape, sharedMemory, refDir, logger=logger)
+
+    # -------------------------------------------------------------------------
+    # release()
+    # -------------------------------------------------------------------------
+    def release(self) -> None:
+        """
+        Drop this process's reference, unlinking the shared memory when it
+        was the last one. The array must not be used afterwards.
+        """
+        if self._sharedMemory is None:
+            return
+
+        self._array = None
+
+        with TileStack._locked(self._refDir, self._name) as refs:
+            pids = TileStack._livePids(refs['pids'])
+
+            if os.getpid() in pids:
+                pids.remove(os.getpid())
+
+            refs['pids'] = pids
+
+            try:
+                self._sharedMemory.close()
+
+            except BufferError:
+                # Views of the array are still referenced, the mapping goes
+                # away with them.
+                pass
+
+            self._sharedMemory = None
+
+            if not pids:
+                TileStack._unlink(self._name)
+
+                if self._logger:
+                    self._logger.info('Released tile stack {}'.format(
+                        self._name))
+
+    # -------------------------------------------------------------------------
+    # getReferences()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def getReferences(key: str, refDir: str or None = None) -> list:
+        """
+        The PIDs of the live processes holding a stack.
+        """
+        with TileStack._locked(refDir or TileStack.REF_DIR,
+                               TileStack.PREFIX + key) as refs:
+            return TileStack._livePids(refs['pids'])
+
+    # -------------------------------------------------------------------------
+    # _locked()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    @contextmanager
+    def _locked(refDir: str, name: str):
+        """
+        The reference record of a stack, exclusively locked and written
+        back on exit, or removed when no process holds the stack.
+        """
+        refPath = os.path.join(refDir, name + '.refs')
+
+        while True:
+            refFile = open(refPath, 'a+')
+            fcntl.flock(refFile, fcntl.LOCK_EX)
+
+            # Another process may have removed the file while this one
+            # waited for the lock, then the lock protects nothing.
+            try:
+                current = os.stat(refPath).st_ino == \
+                    os.fstat(refFile.fileno()).st_ino
+
+            except FileNotFoundError:
+                current = False
+
+            if current:
+                break
+
+            refFile.close()
+
+        refs = None
+
+        with refFile:
+            try:
+                refFile.seek(0)
+
+                try:
+                    refs = json.loads(refFile.read() or '{}')
+
+                except ValueError:
+                    refs = {}
+
+                refs.setdefault('pids', [])
+                yield refs
+
+                if refs['pids']:
+                    refFile.seek(0)
+                    refFile.truncate()
+                    json.dump(refs, refFile)
+                    refFile.flush()
+
+            finally:
+                if refs is not None and not refs['pids']:
+                    os.remove(refPath)
+
+                fcntl.flock(refFile, fcntl.LOCK_UN)
+
+    # -------------------------------------------------------------------------
+    # _livePids()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _livePids(pids: list) -> list:
+
+        live = []
+
+        for pid in pids:
+            try:
+                os.kill(pid, 0)
+                live.append(pid)
+
+            except ProcessLookupError:
+                pass
+
+            except PermissionError:
+                live.append(pid)
+
+        return live
+
+    # -------------------------------------------------------------------------
+    # _unlink()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _unlink(name: str) -> None:
+        """
+        Remove a shared memory block, if it exists.
+        """
+        try:
+            sharedMemory = shared_memory.SharedMemory(name=name)
+
+        except FileNotFoundError:
+            return
+
+        TileStack._untrack(sharedMemory)
+        sharedMemory.close()
+        sharedMemory.unlink()
+
+    # -------------------------------------------------------------------------
+    # _untrack()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _untrack(sharedMemory: shared_memory.SharedMemory) -> None:
+        """
+        The reference file decides when a stack is unlinked, not the
+        resource tracker, which would unlink it when its creator exits.
+        """
+        resource_tracker.unregister(sharedMemory._name, 'shared_memory')
+
@@ -0,0 +1,135 @@
+import csv
+import fcntl
+import os
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# class WaterStatistics
+#
+# Water, land and nodata pixel counts and areas of the final per-year lake
+# rasters, computed as each year is written so downstream users do not
+# reopen every output. Each lake gets a CSV table with one row per year, and
+# a batch CSV table gathers the rows of many lakes.
+# -----------------------------------------------------------------------------
+class WaterStatistics(object):
+
+    WATER = 1
+    LAND = 0
+    COLUMNS = ['lakeNumber', 'year', 'waterPixels', 'landPixels',
+               'nodataPixels', 'pixelAreaKm2', 'waterKm2', 'landKm2',
+               'nodataKm2', 'file']
+
+    # -------------------------------------------------------------------------
+    # fromArray()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fromArray(array: np.ndarray,
+                  transform: tuple,
+                  lakeNumber: str,
+                  year: str,
+                  filePath: str) -> dict:
+        """
+        The row of one year. Pixels neither water nor land, including the
+        area outside of the lake cutline, count as nodata. Areas assume the
+        equal-area sinusoidal grid of the outputs, in km2.
+        """
+        water = int(np.count_nonzero(array == WaterStatistics.WATER))
+        land = int(np.count_nonzero(array == WaterStatistics.LAND))
+        nodata = int(array.size) - water - land
+        pixelArea = abs(transform[1] * transform[5]) / 1e6
+
+        return {'lakeNumber': lakeNumber,
+                'year': int(year),
+                'waterPixels': water,
+                'landPixels': land,
+                'nodataPixels': nodata,
+                'pixelAreaKm2': pixelArea,
+                'waterKm2': water * pixelArea,
+                'landKm2': land * pixelArea,
+                'nodataKm2': nodata * pixelArea,
+                'file': os.path.basename(filePath)}
+
+    # -------------------------------------------------------------------------
+    # fromFile()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def fromFile(filePath: str, lakeNumber: str, year: str) -> dict:
+        """
+        The row of one year's raster, read while it is still in the page
+        cache.
+        """
+        from osgeo import gdal
+
+        dataset = gdal.Open(filePath)
+
+        if dataset is None:
+            raise RuntimeError('Unable to open {}'.format(filePath))
+
+        array = dataset.GetRasterBand(1).ReadAsArray()
+        transform = dataset.GetGeoTransform()
+        dataset = None
+        return WaterStatistics.fromArray(array, transform, lakeNumber, year,
+                                         filePath)
+
+    # -------------------------------------------------------------------------
+    # write()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def write(rows: list, tablePath: str) -> str:
+        """
+        Write the table of one lake, replacing any earlier one.
+        """
+        tmpPath = '{}.{}.tmp'.format(tablePath, os.getpid())
+
+        with open(tmpPath, 'w', newline='') as tableFile:
+            writer = csv.DictWriter(tableFile,
+                                    fieldnames=WaterStatistics.COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        os.replace(tmpPath, tablePath)
+        return tablePath
+
+    # -------------------------------------------------------------------------
+    # append()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def append(rows: list, tablePath: str) -> None:
+        """
+        Append rows to a batch CSV table shared by many lakes, writing the
+        header when the table is new. Appends are locked so lakes running
+        concurrently do not interleave their rows.
+        """
+        tableDir = os.path.dirname(tablePath)
+
+        if tableDir:
+            os.makedirs(tableDir, exist_ok=True)
+
+        with open(tablePath, 'a', newline='') as tableFile:
+            fcntl.flock(tableFile, fcntl.LOCK_EX)
+
+            try:
+                writer = csv.DictWriter(tableFile,
+                                        fieldnames=WaterStatistics.COLUMNS)
+
+                if os.fstat(tableFile.fileno()).st_size == 0:
+                    writer.writeheader()
+
+                writer.writerows(rows)
+                tableFile.flush()
+
+            finally:
+                fcntl.flock(tableFile, fcntl.LOCK_UN)
+
+    # -------------------------------------------------------------------------
+    # read()
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def read(tablePath: str) -> list:
+        """
+        The rows of a CSV table, as written.
+        """
+        with open(tablePath, newline='') as tableFile:
+            return list(csv.DictReader(tableFile))
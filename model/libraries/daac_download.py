@@ -3,6 +3,9 @@
 # Requires a valid .netrc file in the user home ($HOME), e.g.:
 #    machine urs.earthdata.nasa.gov login USERNAME password PASSWD
 #
+# With setAuth(EarthdataAuth(cacheFile)), downloads send a cached Earthdata
+# bearer token instead of following the URS login redirects.
+#
 # Author: OBDAAC
 #
 # from obdaac_download import httpdl
@@ -17,15 +20,83 @@ import os
 import re
 import subprocess
 import logging
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
 import requests
 from requests.adapters import HTTPAdapter
 from datetime import datetime
 
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+
 DEFAULT_CHUNK_SIZE = 131072
 
 # requests session object used to keep connections around
 obpgSession = None
 
+# running count of bytes received over the network by this process
+networkBytes = 0
+networkBytesLock = threading.Lock()
+
+# rate and concurrency limiter shared by every download thread
+downloadLimiter = None
+downloadLimiterLock = threading.Lock()
+
+# Earthdata Login token source, None to rely on the .netrc redirects
+earthdataAuth = None
+
+
+def addNetworkBytes(nbytes):
+    global networkBytes
+
+    with networkBytesLock:
+        networkBytes += nbytes
+
+
+def getNetworkBytes():
+    return networkBytes
+
+
+def getLimiter():
+    global downloadLimiter
+
+    with downloadLimiterLock:
+        if not downloadLimiter:
+            downloadLimiter = DownloadLimiter()
+
+    return downloadLimiter
+
+
+def setLimiter(limiter):
+    global downloadLimiter
+
+    with downloadLimiterLock:
+        downloadLimiter = limiter
+
+
+def getDownloadStats():
+    return getLimiter().getStats()
+
+
+def setAuth(auth):
+    global earthdataAuth
+
+    earthdataAuth = auth
+
+    if obpgSession and auth:
+        auth.apply(obpgSession)
+
+
+def refreshAuth():
+    # replace a refused token, once per request
+    if not earthdataAuth:
+        return False
+
+    earthdataAuth.invalidate()
+    obpgSession.headers.pop('Authorization', None)
+    return earthdataAuth.apply(obpgSession)
+
 
 def getSession(verbose=0, ntries=5):
     global obpgSession
@@ -36,8 +107,16 @@ def getSession(verbose=0, ntries=5):
             print("Session started")
             logging.basicConfig(level=logging.DEBUG)
 
+        # httpdl retries with backoff, so the adapter does not retry, and
+        # keeps a connection per concurrent download
         obpgSession = requests.Session()
-        obpgSession.mount('https://', HTTPAdapter(max_retries=ntries))
+        adapter = HTTPAdapter(max_retries=0,
+                              pool_maxsize=getLimiter().getMaxConcurrency())
+        obpgSession.mount('https://', adapter)
+        obpgSession.mount('http://', adapter)
+
+        if earthdataAuth:
+            earthdataAuth.apply(obpgSession)
 
     else:
         if verbose > 1:
@@ -79,59 +158,115 @@ def httpdl(urlStr, localpath='.', outputfilename=None, ntries=5,
             headers = {
                 "If-Modified-Since": modified_since.strftime("%a, %d %b\
                     %Y %H:%M:%S GMT")}
-    try:
-        with closing(obpgSession.get(urlStr,
-                                     stream=True,
-                                     timeout=timeout,
-                                     headers=headers)) as req:
-
-            if req.status_code != 200:
-                status = req.status_code
-            elif isRequestAuthFailure(req):
-                status = 401
-            else:
-                if not os.path.exists(localpath):
-                    os.umask(0o02)
-                    os.makedirs(localpath, mode=0o2775)
-
-                if not outputfilename:
-                    cd = req.headers.get('Content-Disposition')
-                    if cd:
-                        outputfilename = re.findall("filename=(.+)", cd)[0]
-                    else:
-                        outputfilename = urlStr.split('/')[-1]
-
-                ofile = os.path.join(localpath, outputfilename)
-
-                # This is here just in case we didn't get a 304
-                # when we should have...
-                # Tue, 11 Dec 2012 10:10:24 GMT
-                download = True
-                if 'last-modified' in req.headers:
-                    remote_lmt = req.headers['last-modified']
-                    remote_ftime = datetime.strptime(
-                        remote_lmt, "%a, %d %b %Y %H:%M:%S GMT").replace(
-                            tzinfo=None)
-                    if modified_since and not force_download:
-                        if (remote_ftime - modified_since).total_seconds() < 0:
-                            download = False
-                            if verbose:
-                                print(
-                                    "Skipping download of %s" % outputfilename)
-
-                if download:
-                    with open(ofile, 'wb') as fd:
-                        for chunk in req.iter_content(chunk_size=chunk_size):
-                            if chunk:  # filter out keep-alive new chunks
-                                fd.write(chunk)
-
-                    if uncompress and re.search(".(Z|gz|bz2)$", ofile):
-                        compressStatus = uncompressFile(ofile)
-                        if compressStatus:
-                            status = compressStatus
-                    else:
-                        status = 0
-    except requests.exceptions.ConnectionError:
+
+    limiter = getLimiter()
+    host = urlparse(urlStr).netloc
+    authRefreshed = False
+
+    for attempt in range(ntries):
+        status = 0
+        reason = None
+        retryAfter = None
+
+        try:
+            with limiter.slot(host), \
+                    closing(obpgSession.get(urlStr,
+                                            stream=True,
+                                            timeout=timeout,
+                                            headers=headers)) as req:
+
+                if req.status_code in DownloadLimiter.THROTTLE_STATUSES:
+                    status = req.status_code
+                    reason = str(status)
+                    retryAfter = getRetryAfter(req)
+                    raise ThrottledError()
+
+                start = time.perf_counter()
+                nbytes = 0
+
+                if req.status_code != 200:
+                    status = req.status_code
+                elif isRequestAuthFailure(req):
+                    status = 401
+                else:
+                    if not os.path.exists(localpath):
+                        os.umask(0o02)
+                        os.makedirs(localpath, mode=0o2775)
+
+                    if not outputfilename:
+                        cd = req.headers.get('Content-Disposition')
+                        if cd:
+                            outputfilename = re.findall("filename=(.+)",
+                                                        cd)[0]
+                        else:
+                            outputfilename = urlStr.split('/')[-1]
+
+                    ofile = os.path.join(localpath, outputfilename)
+
+                    # This is here just in case we didn't get a 304
+                    # when we should have...
+                    # Tue, 11 Dec 2012 10:10:24 GMT
+                    download = True
+                    if 'last-modified' in req.headers:
+                        remote_lmt = req.headers['last-modified']
+                        remote_ftime = datetime.strptime(
+                            remote_lmt, "%a, %d %b %Y %H:%M:%S GMT").replace(
+                                tzinfo=None)
+                        if modified_since and not force_download:
+                            age = remote_ftime - modified_since
+                            if age.total_seconds() < 0:
+                                download = False
+                                if verbose:
+                                    print("Skipping download of %s" %
+                                          outputfilename)
+
+                    if download:
+                        # write to a temporary name so an interrupted
+                        # download is never mistaken for a complete file,
+                        # unique so concurrent downloads of the same file
+                        # never share it
+                        partfd, partfile = tempfile.mkstemp(
+                            prefix=outputfilename + '.', suffix='.part',
+                            dir=localpath)
+                        with os.fdopen(partfd, 'wb') as fd:
+                            for chunk in req.iter_content(
+                                    chunk_size=chunk_size):
+                                if chunk:  # filter out keep-alive new chunks
+                                    fd.write(chunk)
+                                    addNetworkBytes(len(chunk))
+                                    nbytes += len(chunk)
+                        os.replace(partfile, ofile)
+                        limiter.addDownload(nbytes,
+                                            time.perf_counter() - start)
+
+                        if uncompress and re.search(".(Z|gz|bz2)$", ofile):
+                            compressStatus = uncompressFile(ofile)
+                            if compressStatus:
+                                status = compressStatus
+                        else:
+                            status = 0
+
+        except ThrottledError:
+            pass
+        except requests.exceptions.Timeout:
+            reason = 'timeout'
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError):
+            reason = 'connection'
+
+        if reason is None and status == 401 and not authRefreshed:
+            authRefreshed = True
+            if refreshAuth():
+                continue
+
+        if reason is None:
+            limiter.succeeded(host)
+            return status
+
+        if attempt + 1 < ntries:
+            time.sleep(limiter.throttled(host, reason, attempt, retryAfter))
+
+    if reason in ('timeout', 'connection'):
         msg = 'ERROR: Max retries exceeded with url: {}'.format(urlStr) + \
             '\n Number of tries allowed: ' + \
             '{}. \n Timeout limit: {}'.format(ntries, timeout) + \
@@ -142,6 +277,17 @@ def httpdl(urlStr, localpath='.', outputfilename=None, ntries=5,
     return status
 
 
+class ThrottledError(Exception):
+    pass
+
+
+def getRetryAfter(req):
+    try:
+        return float(req.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
 def uncompressFile(compressed_file):
     """
     uncompress file
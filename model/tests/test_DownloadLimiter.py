@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+
+
+# -----------------------------------------------------------------------------
+# class DownloadLimiterTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_DownloadLimiter
+# -----------------------------------------------------------------------------
+class DownloadLimiterTestCase(unittest.TestCase):
+
+    host = 'e4ftl01.cr.usgs.gov'
+
+    # -------------------------------------------------------------------------
+    # testRate
+    # -------------------------------------------------------------------------
+    def testRate(self):
+        limiter = DownloadLimiter(requestsPerSecond=50, maxConcurrency=1,
+                                  burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            with limiter.slot(self.host):
+                pass
+        # The first request uses the burst, the other five wait for tokens.
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 * 0.9)
+        self.assertEqual(limiter.getStats()['requests'], 6)
+
+    # -------------------------------------------------------------------------
+    # testConcurrency
+    # -------------------------------------------------------------------------
+    def testConcurrency(self):
+        limiter = DownloadLimiter(requestsPerSecond=1000, maxConcurrency=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def request():
+            with limiter.slot(self.host):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.02)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=request) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+
+    # -------------------------------------------------------------------------
+    # testAdaptiveConcurrency
+    # -------------------------------------------------------------------------
+    def testAdaptiveConcurrency(self):
+        limiter = DownloadLimiter(maxConcurrency=8, increaseAfter=2)
+        limiter.throttled(self.host, '429', 0)
+        limiter.throttled(self.host, 'timeout', 0)
+        self.assertEqual(limiter.getConcurrency(self.host), 2)
+        self.assertEqual(limiter.getConcurrency('other.host'), 8)
+        limiter.succeeded(self.host)
+        limiter.succeeded(self.host)
+        self.assertEqual(limiter.getConcurrency(self.host), 3)
+        self.assertEqual(limiter.getStats()['retries'],
+                         {'429': 1, 'timeout': 1})
+
+    # -------------------------------------------------------------------------
+    # testBackoff
+    # -------------------------------------------------------------------------
+    def testBackoff(self):
+        limiter = DownloadLimiter(backoffBase=1.0, backoffMax=5.0)
+        for attempt in range(6):
+            delay = limiter.throttled(self.host, '503', attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(5.0, 2 ** attempt))
+        self.assertEqual(limiter.throttled(self.host, '503', 0,
+                                           retryAfter=3.0), 3.0)
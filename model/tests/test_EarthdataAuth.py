@@ -0,0 +1,78 @@
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+import requests
+
+from birkett_lake_extract.model.EarthdataAuth import EarthdataAuth
+
+
+# -----------------------------------------------------------------------------
+# class EarthdataAuthTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_EarthdataAuth
+# -----------------------------------------------------------------------------
+class EarthdataAuthTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.cacheFile = os.path.join(self.tmpDir.name, 'auth',
+                                      'earthdata.json')
+
+        # No .netrc entry, so nothing is ever fetched from URS.
+        self.netrcFile = os.path.join(self.tmpDir.name, 'netrc')
+        with open(self.netrcFile, 'w') as netrcFile:
+            netrcFile.write('machine example.com login a password b\n')
+
+        self.auth = EarthdataAuth(self.cacheFile, netrcFile=self.netrcFile)
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testCachedToken
+    # -------------------------------------------------------------------------
+    def testCachedToken(self):
+        os.makedirs(os.path.dirname(self.cacheFile))
+        self.auth._save({'token': 'abc', 'expires': time.time() + 864000})
+        mode = stat.S_IMODE(os.stat(self.cacheFile).st_mode)
+        self.assertEqual(mode, 0o600)
+        session = requests.Session()
+        self.assertTrue(self.auth.apply(session))
+        self.assertEqual(session.headers['Authorization'], 'Bearer abc')
+
+    # -------------------------------------------------------------------------
+    # testExpiringToken
+    # -------------------------------------------------------------------------
+    def testExpiringToken(self):
+        os.makedirs(os.path.dirname(self.cacheFile))
+        with open(self.cacheFile, 'w') as cacheFile:
+            json.dump({'token': 'abc', 'expires': time.time() + 60},
+                      cacheFile)
+        self.assertIsNone(self.auth._load())
+
+        # Refreshing needs credentials, without them the session is left to
+        # the .netrc redirects.
+        session = requests.Session()
+        self.assertFalse(self.auth.apply(session))
+        self.assertNotIn('Authorization', session.headers)
+
+    # -------------------------------------------------------------------------
+    # testInvalidate
+    # -------------------------------------------------------------------------
+    def testInvalidate(self):
+        os.makedirs(os.path.dirname(self.cacheFile))
+        self.auth._save({'token': 'abc', 'expires': time.time() + 864000})
+        self.auth.invalidate()
+        self.assertFalse(os.path.exists(self.cacheFile))
+        self.auth.invalidate()
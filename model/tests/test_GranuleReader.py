@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from birkett_lake_extract.model.GranuleReader import GranuleReader
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+
+# -----------------------------------------------------------------------------
+# class GranuleReaderTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_GranuleReader
+# -----------------------------------------------------------------------------
+@unittest.skipIf(gdal is None, 'GDAL is not installed')
+class GranuleReaderTestCase(unittest.TestCase):
+
+    transform = (-10007554.677, 231.656358264, 0.0,
+                 5559752.598333, 0.0, -231.656358264)
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self._filePath = os.path.join(self._tmpDir.name, 'granule.tif')
+        image = np.zeros((20, 30), dtype=np.uint8)
+        image[5:10, 10:20] = 1
+        image[0, 0] = 250
+        ds = gdal.GetDriverByName('GTiff').Create(self._filePath, 30, 20, 1,
+                                                  gdal.GDT_Byte)
+        ds.SetGeoTransform(self.transform)
+        ds.GetRasterBand(1).WriteArray(image)
+        ds = None
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testRead
+    # -------------------------------------------------------------------------
+    def testRead(self):
+
+        with GranuleReader(self._filePath, cacheArray=True) as reader:
+            self.assertEqual(reader.getWaterMaskName(), self._filePath)
+            self.assertEqual(reader.getTransform(), self.transform)
+            water = reader.readWater()
+            self.assertEqual(water.sum(), 50)
+            self.assertIs(reader.readWater(), water)
+            self.assertEqual(reader.readWater((10, 5, 5, 5)).sum(), 25)
+
+        self.assertIsNone(reader._dataset)
+
+    # -------------------------------------------------------------------------
+    # testMissing
+    # -------------------------------------------------------------------------
+    def testMissing(self):
+
+        with self.assertRaises(RuntimeError):
+            GranuleReader(os.path.join(self._tmpDir.name,
+                                       'missing.hdf')).getTransform()
@@ -1,9 +1,21 @@
+import errno
 import os
 import shutil
+import tempfile
+import threading
 import unittest
+from unittest import mock
+
+import numpy as np
 
 from birkett_lake_extract.model.LakeExtract import LakeExtract
 
+try:
+    from osgeo import gdal
+    from osgeo import ogr
+except ImportError:
+    gdal = None
+
 
 # -----------------------------------------------------------------------------
 # class LakeExtractTestCase
@@ -20,15 +32,393 @@ class LakeExtractTestCase(unittest.TestCase):
                              lakeNumber='772',
                              startYear=2001,
                              endYear=2015)
+
+        # Plans and option checks do not touch the disk.
+        self.assertFalse(os.path.exists(leTest._mod44wDir))
+        self.assertFalse(os.path.exists(leTest._checkpointDir))
+        leTest._makeOutputDirs()
         self.assertTrue(os.path.exists(leTest._mod44wDir))
         self.assertTrue(os.path.exists(leTest._maxExtentDir))
         self.assertTrue(os.path.exists(leTest._polygonDir))
         self.assertTrue(os.path.exists(leTest._bufferedDir))
         self.assertTrue(os.path.exists(leTest._finalBufferedDir))
+        self.assertTrue(os.path.exists(leTest._checkpointDir))
         leTest._rmOutputDirs()
         self.assertFalse(os.path.exists(leTest._mod44wDir))
         self.assertFalse(os.path.exists(leTest._maxExtentDir))
         self.assertFalse(os.path.exists(leTest._polygonDir))
         self.assertFalse(os.path.exists(leTest._bufferedDir))
         self.assertTrue(os.path.exists(leTest._finalBufferedDir))
+        self.assertTrue(os.path.exists(leTest._checkpointDir))
         shutil.rmtree(leTest._finalBufferedDir)
+        shutil.rmtree(leTest._checkpointDir)
+
+    def testStreamMOD44W(self):
+        leTest = LakeExtract(outDir='.',
+                             bbox=['12', '20', '12.5', '20.5'],
+                             lakeNumber='772',
+                             startYear=2001,
+                             endYear=2003)
+        downloads = [('url{}'.format(i), 'MOD44W.A{}'.format(2001 + i))
+                     for i in range(3)]
+
+        leTest._downloadMOD44W = lambda url, filePath, stage: \
+            filePath != 'MOD44W.A2002'
+        self.assertEqual(list(leTest._streamMOD44W(downloads)),
+                         ['MOD44W.A2001', 'MOD44W.A2003'])
+
+        def failSecond(url, filePath, stage):
+            self.assertEqual(stage, '/downloadMOD44W')
+            if url == 'url1':
+                raise FileNotFoundError(filePath)
+            return True
+
+        leTest._downloadMOD44W = failSecond
+        stream = leTest._streamMOD44W(downloads)
+        self.assertEqual(next(stream), 'MOD44W.A2001')
+        with self.assertRaises(FileNotFoundError):
+            next(stream)
+
+    def testWarpOptions(self):
+        leTest = LakeExtract(outDir='.',
+                             bbox=['12', '20', '12.5', '20.5'],
+                             lakeNumber='772',
+                             startYear=2001,
+                             endYear=2003,
+                             warpThreads=4,
+                             warpMemory=512)
+        self.assertEqual(leTest._getWarpOptions(),
+                         ' -multi -wo NUM_THREADS=4 -wm 512')
+        self.assertEqual(leTest._getCompressOptions(),
+                         ' -co NUM_THREADS=4')
+        self.assertEqual(leTest._getCutOptions('lake.shp'),
+                         ' -multi -wo NUM_THREADS=4 -wm 512' +
+                         ' -cutline lake.shp -crop_to_cutline' +
+                         ' -dstnodata 3.0')
+        leTest._warpThreads = None
+        leTest._warpMemory = None
+        self.assertEqual(leTest._getWarpOptions(), '')
+        self.assertEqual(leTest._getCompressOptions(), '')
+
+    def testScratchDir(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            outDir = os.path.join(tmpDir, 'out')
+            scratchDir = os.path.join(tmpDir, 'scratch')
+            leTest = LakeExtract(outDir=outDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2003,
+                                 scratchDir=scratchDir)
+            leTest._makeOutputDirs()
+            workDir = os.path.join(scratchDir, 'lake_772')
+            self.assertEqual(os.path.dirname(leTest._mod44wDir), workDir)
+            self.assertEqual(os.path.dirname(leTest._bufferedDir), workDir)
+            self.assertEqual(os.path.dirname(leTest._finalBufferedDir),
+                             outDir)
+            self.assertEqual(sorted(os.listdir(outDir)),
+                             ['checkpoints', 'final-buffered-rasters'])
+
+            scratchPath = os.path.join(leTest._bufferedDir, 'lake.tif')
+            with open(scratchPath, 'w') as outFile:
+                outFile.write('lake')
+            finalPath = leTest._publish(scratchPath)
+            self.assertEqual(finalPath, os.path.join(
+                leTest._finalBufferedDir, 'lake.tif'))
+            self.assertFalse(os.path.exists(scratchPath))
+
+            # Across file systems, the output is copied and then renamed.
+            with open(scratchPath, 'w') as outFile:
+                outFile.write('lake2')
+            replace = os.replace
+
+            def crossDevice(src, dst):
+                if src == scratchPath:
+                    raise OSError(errno.EXDEV, 'Invalid cross-device link')
+                replace(src, dst)
+
+            with mock.patch('os.replace', side_effect=crossDevice):
+                leTest._publish(scratchPath)
+
+            self.assertFalse(os.path.exists(scratchPath))
+            with open(finalPath) as inFile:
+                self.assertEqual(inFile.read(), 'lake2')
+            self.assertEqual(os.listdir(leTest._finalBufferedDir),
+                             ['lake.tif'])
+
+            leTest._rmOutputDirs()
+            self.assertFalse(os.path.exists(workDir))
+
+    def testCutlineOptionsInvalidateLake(self):
+        with tempfile.TemporaryDirectory() as outDir:
+            statsPath = os.path.join(outDir, 'lake_772_stats.csv')
+            with open(statsPath, 'w') as outFile:
+                outFile.write('stats')
+
+            def makeLake(**kwargs):
+                leTest = LakeExtract(outDir=outDir,
+                                     bbox=['12', '20', '12.5', '20.5'],
+                                     lakeNumber='772',
+                                     startYear=2001,
+                                     endYear=2002,
+                                     **kwargs)
+                leTest._getGranuleUrls = lambda year: ['url{}'.format(year)]
+                return leTest
+
+            defaultLake = makeLake()
+            defaultLake._stageCache.save('lake', defaultLake._getLakeKey(),
+                                         [statsPath])
+            self.assertEqual(makeLake()._loadStage(
+                'lake', makeLake()._getLakeKey()), [statsPath])
+
+            for options in ({'cutlineTolerance': 57.9},
+                            {'cutlineMaxVertices': 1000}):
+                leTest = makeLake(**options)
+                self.assertIsNone(leTest._loadStage('lake',
+                                                    leTest._getLakeKey()))
+                self.assertNotEqual(leTest._createStr,
+                                    defaultLake._createStr)
+
+    def testWriterThread(self):
+        with tempfile.TemporaryDirectory() as outDir:
+            leTest = LakeExtract(outDir=outDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2002)
+            leTest._stageKeys['prepareCutline'] = 'cutline'
+            leTest._getEnvelope = lambda: None
+            leTest._getGranuleReader = lambda fileName: mock.Mock(
+                getWaterMaskName=lambda: fileName)
+            threads = []
+
+            def cut(mod44wFilePath, subdatasetName, lake, year, stage):
+                threads.append(('cut', year,
+                                threading.current_thread().name))
+                return year + '.tif'
+
+            def write(year, key, bufferedLakeFilePath, start, stage):
+                threads.append(('write', year,
+                                threading.current_thread().name))
+                return bufferedLakeFilePath
+
+            leTest._cutOneYear = cut
+            leTest._writeOneYear = write
+
+            with leTest._metrics.stage('extractLakePerYear'):
+                outputs = leTest._extractLakePerYear(
+                    ['MOD44W.A2001001.h18v07.hdf',
+                     'MOD44W.A2002001.h18v07.hdf'], 'lake.fgb')
+
+            self.assertEqual(outputs, ['2001.tif', '2002.tif'])
+            self.assertEqual(
+                sorted((step, name.split('_')[0])
+                       for step, _, name in threads),
+                [('cut', 'MainThread'), ('cut', 'MainThread'),
+                 ('write', 'year'), ('write', 'year')])
+            stages = [record['stage'] for record in
+                      leTest.getMetrics()['stages']]
+            self.assertIn('extractLakePerYear/2001', stages)
+            self.assertIn('extractLakePerYear/2002/write', stages)
+
+    def testEmptyGranulesCached(self):
+        with tempfile.TemporaryDirectory() as outDir:
+            leTest = LakeExtract(outDir=outDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2002)
+            cmrProcess = 'birkett_lake_extract.model.CmrProcess.CmrProcess'
+
+            # A failed search is asked again, a year without granules is not.
+            with mock.patch(cmrProcess + '.runGranules',
+                            return_value=[]) as runGranules:
+                with mock.patch(cmrProcess + '.failed', return_value=True):
+                    self.assertEqual(leTest._getGranules(2001), [])
+                    self.assertEqual(leTest._getGranules(2001), [])
+                    self.assertEqual(runGranules.call_count, 2)
+
+                with mock.patch(cmrProcess + '.failed', return_value=False):
+                    self.assertEqual(leTest._getGranules(2001), [])
+                    self.assertEqual(leTest._getGranules(2001), [])
+                    self.assertEqual(runGranules.call_count, 3)
+
+    def testExtractMasksWorkspace(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            outDir = os.path.join(tmpDir, 'out')
+            scratchDir = os.path.join(tmpDir, 'scratch')
+            os.makedirs(scratchDir)
+            leTest = LakeExtract(outDir=outDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2003,
+                                 scratchDir=scratchDir)
+            keptDir = leTest._mod44wDir
+            downloadDirs = []
+
+            def fail(index=0):
+                downloadDirs.append(leTest._mod44wDir)
+                self.assertTrue(os.path.isdir(leTest._mod44wDir))
+                raise ValueError('No water')
+
+            leTest._makeLakeInMemory = fail
+
+            # The run's error is raised, not the failed cleanup's.
+            with mock.patch('shutil.rmtree', side_effect=OSError('busy')):
+                with self.assertRaisesRegex(ValueError, 'No water'):
+                    leTest.extractMasks()
+
+            self.assertEqual(os.path.dirname(downloadDirs[0]), scratchDir)
+            self.assertEqual(leTest._mod44wDir, keptDir)
+
+            with self.assertRaisesRegex(ValueError, 'No water'):
+                leTest.extractMasks()
+
+            self.assertFalse(os.path.exists(downloadDirs[1]))
+            self.assertFalse(os.path.exists(outDir))
+
+    def testExtractMasksWritesNothing(self):
+        with tempfile.TemporaryDirectory() as outDir:
+            leTest = LakeExtract(outDir=outDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2002)
+            granules = [{'file_name': 'MOD44W.A2001001.h18v07.061.hdf',
+                         'file_url': 'https://daac/MOD44W.A2001001.h18v07'
+                                     '.061.hdf',
+                         'size_bytes': 1}]
+            resolved = []
+
+            def makeLakeInMemory(index=0):
+                resolved.extend(leTest._getMOD44WDownloads(index))
+                raise ValueError('No water')
+
+            leTest._makeLakeInMemory = makeLakeInMemory
+
+            # Granule resolution runs, against a stubbed CMR.
+            with mock.patch('birkett_lake_extract.model.CmrProcess.'
+                            'CmrProcess.runGranules',
+                            return_value=granules):
+                with self.assertRaisesRegex(ValueError, 'No water'):
+                    leTest.extractMasks()
+
+            self.assertEqual([url for url, _ in resolved],
+                             [granules[0]['file_url']] * 2)
+            self.assertEqual(os.listdir(outDir), [])
+
+    @unittest.skipIf(gdal is None, 'GDAL is not installed')
+    def testVectorStages(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            leTest = LakeExtract(outDir=tmpDir,
+                                 bbox=['12', '20', '12.5', '20.5'],
+                                 lakeNumber='772',
+                                 startYear=2001,
+                                 endYear=2003)
+            leTest._makeOutputDirs()
+
+            # Two lakes a pixel apart, a small distant one and land.
+            polygonized = os.path.join(leTest._polygonDir, 'lake.fgb')
+            polygonDS, polygonLayer = LakeExtract._createDS(
+                polygonized, 'FlatGeobuf', ogr.wkbPolygon, None)
+            polygonLayer.CreateField(ogr.FieldDefn('DN', ogr.OFTInteger))
+            boxes = [(1, 0, 0, 2000, 2000),
+                     (1, 2300, 0, 4000, 2000),
+                     (1, 10000, 10000, 10500, 10500),
+                     (0, 0, 5000, 9000, 9000)]
+            for dn, minX, minY, maxX, maxY in boxes:
+                feature = ogr.Feature(polygonLayer.GetLayerDefn())
+                feature.SetField('DN', dn)
+                feature.SetGeometry(ogr.CreateGeometryFromWkt(
+                    'POLYGON (({0} {1}, {2} {1}, {2} {3}, {0} {3}, '
+                    '{0} {1}))'.format(minX, minY, maxX, maxY)))
+                polygonLayer.CreateFeature(feature)
+                feature = None
+            polygonLayer = None
+            polygonDS = None
+
+            polygonDS = ogr.Open(polygonized)
+            cleaned = LakeExtract._cleanPolygon(polygonDS.GetLayer())
+            polygonDS = None
+            self.assertEqual(len(cleaned), 3)
+            buffered = LakeExtract._createBuffer(cleaned,
+                                                 LakeExtract.BUFFER_1PX)
+            dissolved = leTest._dissolveBuffered(buffered)
+            self.assertEqual(len(dissolved), 2)
+            target = LakeExtract._getTargetLake(dissolved)
+            self.assertEqual(len(target), 1)
+            self.assertAlmostEqual(target[0].GetEnvelope()[1],
+                                   4000 + LakeExtract.BUFFER_1PX)
+
+            # Only the buffered lake, the checkpoint, is written.
+            bufferedPath = leTest._bufferLakeFile(polygonized)
+            self.assertEqual(sorted(os.listdir(leTest._polygonDir)),
+                             sorted(['lake.fgb',
+                                     os.path.basename(bufferedPath)]))
+            bufferedDS = ogr.Open(bufferedPath)
+            self.assertEqual(bufferedDS.GetLayer().GetFeatureCount(), 1)
+            bufferedDS = None
+
+            # Without a tolerance the buffered lake is the cutline.
+            self.assertEqual(leTest._prepareCutline(bufferedPath, None),
+                             bufferedPath)
+
+    @unittest.skipIf(gdal is None, 'GDAL is not installed')
+    def testPrepareCutline(self):
+        leTest = LakeExtract(outDir='.',
+                             bbox=['12', '20', '12.5', '20.5'],
+                             lakeNumber='772',
+                             startYear=2001,
+                             endYear=2003,
+                             cutlineTolerance=LakeExtract.TR_P / 4,
+                             cutlineMaxVertices=4)
+        leTest._makeOutputDirs()
+        try:
+            # A 30 x 20 granule, water in rows 5-9 and columns 10-19.
+            transform = (0.0, 100.0, 0.0, 2000.0, 0.0, -100.0)
+            granulePath = os.path.join(leTest._mod44wDir, 'granule.tif')
+            image = np.zeros((20, 30), dtype=np.uint8)
+            image[5:10, 10:20] = 1
+            ds = gdal.GetDriverByName('GTiff').Create(granulePath, 30, 20, 1,
+                                                      gdal.GDT_Byte)
+            ds.SetGeoTransform(transform)
+            ds.GetRasterBand(1).WriteArray(image)
+            ds = None
+
+            # A rectangle around the water, drawn with many vertices.
+            ring = ogr.Geometry(ogr.wkbLinearRing)
+            for x in np.arange(1000, 2000.1, 10):
+                ring.AddPoint_2D(x, 1500)
+            for y in np.arange(1490, 999, -10):
+                ring.AddPoint_2D(2000, y)
+            ring.AddPoint_2D(1000, 1000)
+            ring.CloseRings()
+            polygon = ogr.Geometry(ogr.wkbPolygon)
+            polygon.AddGeometry(ring)
+            bufferedPath = os.path.join(leTest._polygonDir, 'buffered.shp')
+            outDS, outLayer = LakeExtract._createDS(
+                bufferedPath, 'ESRI Shapefile', ogr.wkbPolygon, None)
+            feature = ogr.Feature(outLayer.GetLayerDefn())
+            feature.SetGeometry(polygon)
+            outLayer.CreateFeature(feature)
+            feature = None
+            outLayer = None
+            del outDS
+
+            maskPath = leTest._prepareCutline(bufferedPath, granulePath)
+            info = leTest.getMetrics()
+            self.assertGreater(info['cutlineVertices'], 100)
+            self.assertEqual(info['cutlineSimplifiedVertices'], 5)
+            self.assertTrue(info['cutlineRasterized'])
+            self.assertTrue(maskPath.endswith('.tif'))
+
+            cutPath = os.path.join(leTest._bufferedDir, 'cut.tif')
+            leTest._maskOneYear(granulePath, maskPath, cutPath)
+            cut = gdal.Open(cutPath).GetRasterBand(1).ReadAsArray()
+            np.testing.assert_array_equal(cut, image[5:10, 10:20])
+        finally:
+            leTest._closeGranuleReaders()
+            leTest._rmOutputDirs()
+            shutil.rmtree(leTest._finalBufferedDir)
+            shutil.rmtree(leTest._checkpointDir)
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from birkett_lake_extract.model.LakeMasks import LakeMasks
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+try:
+    import xarray
+except ImportError:
+    xarray = None
+
+
+# -----------------------------------------------------------------------------
+# class LakeMasksTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_LakeMasks
+# -----------------------------------------------------------------------------
+class LakeMasksTestCase(unittest.TestCase):
+
+    transform = (1000.0, 500.0, 0.0, 3000.0, 0.0, -500.0)
+    lakeWkt = 'POLYGON ((1000 3000, 2500 3000, 2500 2000, 1000 3000))'
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self.masks = np.full((2, 2, 3), 3, dtype=np.uint8)
+        self.masks[0, 0] = [1, 1, 0]
+        self.masks[1, 0] = [1, 0, 0]
+        self.lakeMasks = LakeMasks('772', ['2001', '2002'], self.masks,
+                                   self.transform, 'PROJCS[]', self.lakeWkt)
+
+    # -------------------------------------------------------------------------
+    # testGetters
+    # -------------------------------------------------------------------------
+    def testGetters(self):
+        self.assertEqual(self.lakeMasks.getYears(), [2001, 2002])
+        np.testing.assert_array_equal(self.lakeMasks.getMask(2002),
+                                      self.masks[1])
+        x, y = self.lakeMasks.getCoordinates()
+        np.testing.assert_array_equal(x, [1250, 1750, 2250])
+        np.testing.assert_array_equal(y, [2750, 2250])
+        self.assertEqual(self.lakeMasks.getLake().area, 750000)
+
+        with self.assertRaises(ValueError):
+            LakeMasks('772', ['2001'], self.masks, self.transform, '',
+                      self.lakeWkt)
+
+    # -------------------------------------------------------------------------
+    # testGetStatistics
+    # -------------------------------------------------------------------------
+    def testGetStatistics(self):
+        rows = self.lakeMasks.getStatistics()
+        self.assertEqual([row['year'] for row in rows], [2001, 2002])
+        self.assertEqual([row['waterPixels'] for row in rows], [2, 1])
+        self.assertEqual([row['nodataPixels'] for row in rows], [3, 3])
+        self.assertEqual(rows[0]['waterKm2'], 0.5)
+
+    # -------------------------------------------------------------------------
+    # testToDataArray
+    # -------------------------------------------------------------------------
+    @unittest.skipIf(xarray is None, 'xarray is not installed')
+    def testToDataArray(self):
+        dataArray = self.lakeMasks.toDataArray()
+        self.assertEqual(dataArray.dims, ('year', 'y', 'x'))
+        self.assertEqual(int(dataArray.sel(year=2001, y=2750, x=1250)), 1)
+        self.assertEqual(dataArray.attrs['nodata'], 3)
+        self.assertEqual(dataArray.attrs['crs'], 'PROJCS[]')
+
+    # -------------------------------------------------------------------------
+    # testWrite
+    # -------------------------------------------------------------------------
+    @unittest.skipIf(gdal is None, 'GDAL is not installed')
+    def testWrite(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            outputs = self.lakeMasks.write(tmpDir)
+            self.assertEqual([os.path.basename(output) for output in outputs],
+                             ['lake_772_MOD44W_2001_C6.tif',
+                              'lake_772_MOD44W_2002_C6.tif'])
+            ds = gdal.Open(outputs[1])
+            np.testing.assert_array_equal(ds.GetRasterBand(1).ReadAsArray(),
+                                          self.masks[1])
+            self.assertEqual(ds.GetGeoTransform(), self.transform)
+            self.assertEqual(ds.GetRasterBand(1).GetNoDataValue(), 3)
+            ds = None
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from birkett_lake_extract.model.LakeSharder import LakeSharder
+from birkett_lake_extract.model.OutputCatalog import OutputCatalog
+from birkett_lake_extract.model.WaterStatistics import WaterStatistics
+
+
+# -----------------------------------------------------------------------------
+# class LakeSharderTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_LakeSharder
+# -----------------------------------------------------------------------------
+class LakeSharderTestCase(unittest.TestCase):
+
+    # CMR lists h08v04 first for the first two and for a lake centered in
+    # it, h07v05 for the third and h19v06 for the last.
+    lakes = [{'lakeNumber': '366', 'bbox': ['-122.52', '42.8',
+                                            '-121.69', '43.05']},
+             {'lakeNumber': '367', 'bbox': ['-121.5', '43.1',
+                                            '-121.4', '43.2']},
+             {'lakeNumber': '368', 'bbox': ['-120.0', '38.0',
+                                            '-119.9', '38.1']},
+             {'lakeNumber': '772', 'bbox': ['12', '20', '12.5', '20.5']}]
+
+    # -------------------------------------------------------------------------
+    # testTileAffinity
+    # -------------------------------------------------------------------------
+    def testTileAffinity(self):
+        sharder = LakeSharder(self.lakes, 3)
+        shards = [[lake['lakeNumber'] for lake in sharder.getShard(i)]
+                  for i in range(3)]
+        self.assertEqual(sorted(sum(shards, [])),
+                         ['366', '367', '368', '772'])
+        self.assertIn(['366', '367'], shards)
+
+        # Grouped by the tile downloaded first, not the one at the center.
+        edgeLake = {'lakeNumber': '369', 'bbox': ['-124.5', '43.0',
+                                                  '-124.4', '43.1']}
+        self.assertEqual(LakeSharder.getTile(self.lakes[0]['bbox']),
+                         'h08v04')
+        self.assertEqual(LakeSharder.getTile(edgeLake['bbox']), 'h08v04')
+        edgeSharder = LakeSharder(self.lakes + [edgeLake], 3)
+        self.assertIn(['366', '367', '369'],
+                      [[lake['lakeNumber']
+                        for lake in edgeSharder.getShard(i)]
+                       for i in range(3)])
+
+        # Every array task must compute the same partition.
+        again = LakeSharder(self.lakes, 3)
+        self.assertEqual([sharder.getShard(i) for i in range(3)],
+                         [again.getShard(i) for i in range(3)])
+
+    # -------------------------------------------------------------------------
+    # testLakeDirs
+    # -------------------------------------------------------------------------
+    def testLakeDirs(self):
+        sharder = LakeSharder(self.lakes, 3)
+        lakeDirs = {lake['lakeNumber']: lakeDir
+                    for lake, lakeDir in sharder.getLakeDirs('out')}
+        self.assertEqual(sorted(lakeDirs), ['366', '367', '368', '772'])
+
+        for shardIndex in range(3):
+            for lake in sharder.getShard(shardIndex):
+                self.assertEqual(lakeDirs[lake['lakeNumber']],
+                                 LakeSharder.getShardDir('out', shardIndex))
+
+    # -------------------------------------------------------------------------
+    # testParseShard
+    # -------------------------------------------------------------------------
+    def testParseShard(self):
+        self.assertEqual(LakeSharder.parseShard('3/16'), (3, 16))
+        environ = {'SLURM_ARRAY_TASK_ID': '5',
+                   'SLURM_ARRAY_TASK_MIN': '1',
+                   'SLURM_ARRAY_TASK_COUNT': '8'}
+        self.assertEqual(LakeSharder.parseShard(None, environ), (4, 8))
+        with self.assertRaises(RuntimeError):
+            LakeSharder.parseShard(None, {})
+
+    # -------------------------------------------------------------------------
+    # testRunAndMerge
+    # -------------------------------------------------------------------------
+    def testRunAndMerge(self):
+
+        class FakeLake(object):
+
+            def __init__(self, lake, shardDir):
+                self._lake = lake
+                self._finalDir = os.path.join(shardDir,
+                                              LakeSharder.FINAL_DIR)
+                self._statsDir = os.path.join(shardDir,
+                                              LakeSharder.STATS_DIR)
+
+            def extractLakes(self):
+                if self._lake['lakeNumber'] == '772':
+                    raise RuntimeError('outside of extent')
+                os.makedirs(self._finalDir, exist_ok=True)
+                os.makedirs(self._statsDir, exist_ok=True)
+                open(os.path.join(self._finalDir, 'lake_{}.tif'.format(
+                    self._lake['lakeNumber'])), 'w').close()
+                WaterStatistics.write(
+                    [WaterStatistics.fromArray(
+                        np.ones((2, 2)), (0, 100, 0, 0, 0, -100),
+                        self._lake['lakeNumber'], '2001', 'lake.tif')],
+                    os.path.join(self._statsDir, 'lake_{}_stats.csv'.format(
+                        self._lake['lakeNumber'])))
+
+        with tempfile.TemporaryDirectory() as outDir:
+            sharder = LakeSharder(self.lakes, 2)
+            sharder.runShard(0, outDir,
+                             lambda lake, shardDir, _: FakeLake(lake,
+                                                                shardDir))
+            merged = LakeSharder.merge(outDir)
+            self.assertEqual(merged['missingShards'], [1])
+
+            sharder.runShard(1, outDir,
+                             lambda lake, shardDir, _: FakeLake(lake,
+                                                                shardDir))
+            merged = LakeSharder.merge(outDir)
+            self.assertEqual(merged['missingShards'], [])
+            self.assertEqual(merged['numOutputs'], 3)
+            self.assertEqual(merged['numStatsRows'], 3)
+            rows = WaterStatistics.read(os.path.join(outDir,
+                                                     LakeSharder.STATS))
+            self.assertEqual(sorted(row['lakeNumber'] for row in rows),
+                             sorted(lake['lakeNumber']
+                                    for lake in self.lakes
+                                    if lake['lakeNumber'] != '772'))
+            self.assertEqual([lake['lakeNumber'] for lake in
+                              merged['failedLakes']], ['772'])
+            with open(os.path.join(outDir, LakeSharder.MANIFEST)) as f:
+                self.assertEqual(json.load(f)['numLakes'], 4)
+
+            # Catalog rows of shard outputs point at the merged outputs.
+            catalogFile = os.path.join(outDir, 'outputs.sqlite')
+            shardPath = os.path.join(LakeSharder.getShardDir(outDir, 0),
+                                     LakeSharder.FINAL_DIR, 'lake_366.tif')
+            OutputCatalog(catalogFile).record(
+                [{'lakeNumber': '366', 'year': 2001, 'minLon': 0,
+                  'minLat': 0, 'maxLon': 1, 'maxLat': 1, 'granule': 'g',
+                  'paramsKey': 'pk', 'lakeKey': 'lk',
+                  'outputPath': os.path.abspath(shardPath), 'bytes': 0,
+                  'checksum': '', 'seconds': 1.0}])
+            LakeSharder.merge(outDir, catalogFile=catalogFile)
+            self.assertEqual(
+                OutputCatalog(catalogFile).getLake('366')[0]['outputPath'],
+                os.path.abspath(os.path.join(outDir, LakeSharder.FINAL_DIR,
+                                             'lake_366.tif')))
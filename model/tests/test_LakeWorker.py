@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from birkett_lake_extract.model.LakeWorker import LakeWorker
+
+
+# -----------------------------------------------------------------------------
+# class LakeWorkerTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_LakeWorker
+# -----------------------------------------------------------------------------
+class LakeWorkerTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _job
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _job(lakeNumber, outDir):
+        return {'lakeNumber': lakeNumber,
+                'bbox': ['12', '20', '12.5', '20.5'],
+                'startYear': 2001,
+                'endYear': 2002,
+                'outDir': outDir}
+
+    # -------------------------------------------------------------------------
+    # testServe
+    # -------------------------------------------------------------------------
+    def testServe(self):
+
+        ran = []
+
+        class FakeLake(object):
+
+            def __init__(self, job, logger):
+                self._job = job
+                self._logger = logger
+
+            def extractLakes(self):
+                self._logger.info('extracting {}'.format(
+                    self._job['lakeNumber']))
+                if self._job['lakeNumber'] == '772':
+                    raise RuntimeError('outside of extent')
+                ran.append(self._job['lakeNumber'])
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            queueDir = os.path.join(tmpDir, 'queue')
+            LakeWorker.submit(queueDir, self._job('366', tmpDir))
+            failedId = LakeWorker.submit(queueDir, self._job('772', tmpDir))
+            LakeWorker.submit(queueDir, self._job('367', tmpDir))
+
+            logger = logging.getLogger('test_LakeWorker')
+            logger.setLevel(logging.INFO)
+            worker = LakeWorker(queueDir, FakeLake, workerId='test',
+                                logger=logger)
+            self.assertEqual(worker.serve(exitWhenIdle=True), 3)
+            self.assertEqual(ran, ['366', '367'])
+            self.assertEqual(LakeWorker.status(queueDir),
+                             {'pending': 0, 'running': 0, 'done': 2,
+                              'failed': 1})
+
+            with open(os.path.join(queueDir, 'failed',
+                                   failedId + '.json')) as jobFile:
+                result = json.load(jobFile)['result']
+
+            self.assertIn('outside of extent', result['error'])
+
+            with open(result['log']) as logFile:
+                self.assertIn('extracting 772', logFile.read())
+
+    # -------------------------------------------------------------------------
+    # testClaimAndRequeue
+    # -------------------------------------------------------------------------
+    def testClaimAndRequeue(self):
+
+        with tempfile.TemporaryDirectory() as queueDir:
+            jobId = LakeWorker.submit(queueDir, self._job('366', queueDir))
+            worker = LakeWorker(queueDir, None)
+            self.assertEqual(worker.claim()['jobId'], jobId)
+            self.assertIsNone(worker.claim())
+            self.assertEqual(LakeWorker.requeue(queueDir), [jobId])
+            self.assertEqual(worker.claim()['jobId'], jobId)
+
+    # -------------------------------------------------------------------------
+    # testSubmitMissingKey
+    # -------------------------------------------------------------------------
+    def testSubmitMissingKey(self):
+
+        with tempfile.TemporaryDirectory() as queueDir:
+            with self.assertRaises(RuntimeError):
+                LakeWorker.submit(queueDir, {'lakeNumber': '366'})
+
+    # -------------------------------------------------------------------------
+    # testSubmitValidates
+    # -------------------------------------------------------------------------
+    def testSubmitValidates(self):
+
+        with tempfile.TemporaryDirectory() as queueDir:
+            job = dict(self._job('366', 'output'), bbox=['12', '20', 'x'])
+            with self.assertRaises(RuntimeError):
+                LakeWorker.submit(queueDir, job)
+
+            LakeWorker.submit(queueDir, self._job('366', 'output'))
+            claimed = LakeWorker(queueDir, None).claim()
+            self.assertEqual(claimed['outDir'], os.path.abspath('output'))
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+
+from birkett_lake_extract.model.OutputCatalog import OutputCatalog
+
+
+# -----------------------------------------------------------------------------
+# class OutputCatalogTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_OutputCatalog
+# -----------------------------------------------------------------------------
+class OutputCatalogTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.catalog = OutputCatalog(os.path.join(self.tmpDir.name, 'db',
+                                                  'outputs.sqlite'))
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # _rows
+    # -------------------------------------------------------------------------
+    def _rows(self, lakeNumber, bbox, lakeKey='lk', paramsKey='pk'):
+        rows = []
+
+        for year in (2001, 2002):
+            outputPath = os.path.join(
+                self.tmpDir.name, 'lake_{}_MOD44W_{}_C6.tif'.format(
+                    lakeNumber, year))
+            with open(outputPath, 'w') as outFile:
+                outFile.write(str(year))
+            rows.append({'lakeNumber': lakeNumber, 'year': year,
+                         'minLon': bbox[0], 'minLat': bbox[1],
+                         'maxLon': bbox[2], 'maxLat': bbox[3],
+                         'granule': 'MOD44W.A{}001.h18v09.hdf'.format(year),
+                         'paramsKey': paramsKey, 'lakeKey': lakeKey,
+                         'outputPath': outputPath, 'bytes': 4,
+                         'checksum': OutputCatalog.checksum(outputPath),
+                         'seconds': 1.5})
+        return rows
+
+    # -------------------------------------------------------------------------
+    # testRecordAndQuery
+    # -------------------------------------------------------------------------
+    def testRecordAndQuery(self):
+        self.catalog.record(self._rows('772', [5.3, -11.15, 26.22, -10.32]))
+        self.catalog.record(self._rows('366', [-122.5, 42.8, -121.7, 43.0]))
+
+        rows = self.catalog.query(bbox=[20, -12, 21, -11])
+        self.assertEqual([(r['lakeNumber'], r['year']) for r in rows],
+                         [('772', 2001), ('772', 2002)])
+        self.assertEqual(len(self.catalog.query()), 4)
+        self.assertEqual(len(self.catalog.query(year=2002)), 2)
+        self.assertEqual(self.catalog.query(bbox=[0, 0, 1, 1]), [])
+        self.assertIsNotNone(self.catalog.getLake('366')[0]['createdAt'])
+
+        # Rerunning a lake replaces its rows and their index entries.
+        self.catalog.record(self._rows('772', [0.1, 0.1, 0.2, 0.2]))
+        self.assertEqual(len(self.catalog.query()), 4)
+        self.assertEqual(self.catalog.query(bbox=[20, -12, 21, -11]), [])
+        self.assertEqual(len(self.catalog.query(bbox=[0, 0, 1, 1])), 2)
+
+    # -------------------------------------------------------------------------
+    # testIsCurrent
+    # -------------------------------------------------------------------------
+    def testIsCurrent(self):
+        rows = self._rows('772', [5.3, -11.15, 26.22, -10.32])
+        self.catalog.record(rows)
+        years = [2001, 2002]
+
+        self.assertTrue(self.catalog.isCurrent('772', 'lk', 'pk', years))
+        self.assertFalse(self.catalog.isCurrent('772', 'new', 'pk', years))
+        self.assertFalse(self.catalog.isCurrent('772', 'lk', 'new', years))
+        self.assertFalse(self.catalog.isCurrent('772', 'lk', 'pk',
+                                                years + [2003]))
+        self.assertFalse(self.catalog.isCurrent('366', 'lk', 'pk', years))
+
+        os.remove(rows[1]['outputPath'])
+        self.assertFalse(self.catalog.isCurrent('772', 'lk', 'pk', years))
+
+    # -------------------------------------------------------------------------
+    # testRelocate
+    # -------------------------------------------------------------------------
+    def testRelocate(self):
+        rows = self._rows('772', [5.3, -11.15, 26.22, -10.32])
+        self.catalog.record(rows)
+        newPath = os.path.join(self.tmpDir.name, 'merged.tif')
+        os.replace(rows[0]['outputPath'], newPath)
+        self.assertFalse(self.catalog.isCurrent('772', 'lk', 'pk',
+                                                [2001, 2002]))
+
+        self.assertEqual(self.catalog.relocate(
+            {rows[0]['outputPath']: newPath, 'missing.tif': newPath}), 1)
+        self.assertEqual(self.catalog.getLake('772')[0]['outputPath'],
+                         newPath)
+        self.assertTrue(self.catalog.isCurrent('772', 'lk', 'pk',
+                                               [2001, 2002]))
@@ -0,0 +1,72 @@
+import unittest
+
+from birkett_lake_extract.model.PlanSummary import PlanSummary
+
+
+# -----------------------------------------------------------------------------
+# class PlanSummaryTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_PlanSummary
+# -----------------------------------------------------------------------------
+class PlanSummaryTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # _granule
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _granule(year, tile, fallback=False, local=False):
+        return {'year': year,
+                'fileName': 'MOD44W.A{}001.{}.006.hdf'.format(year, tile),
+                'tile': tile,
+                'sizeBytes': 1000,
+                'fallback': fallback,
+                'local': local}
+
+    # -------------------------------------------------------------------------
+    # _plan
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _plan(lakeNumber, granules, complete=False):
+        return {'lakeNumber': lakeNumber,
+                'complete': complete,
+                'expectedOutputs': 0 if complete else
+                len({g['year'] for g in granules}),
+                'missingYears': [],
+                'granules': granules}
+
+    # -------------------------------------------------------------------------
+    # testSharedTiles
+    # -------------------------------------------------------------------------
+    def testSharedTiles(self):
+        summary = PlanSummary()
+        summary.add(self._plan('1', [self._granule(2001, 'h08v04'),
+                                     self._granule(2001, 'h09v04', True)]))
+        summary.add(self._plan('2', [
+            self._granule(2001, 'h09v04'),
+            self._granule(2002, 'h09v04', local=True)]))
+        summary.add(self._plan('3', [self._granule(2001, 'h10v04')],
+                               complete=True))
+        result = summary.summarize()
+        self.assertEqual(result['numLakes'], 3)
+        self.assertEqual(result['lakesComplete'], 1)
+        self.assertEqual(result['expectedOutputs'], 3)
+        self.assertEqual(result['granuleReferences'], 3)
+        self.assertEqual(result['uniqueGranules'], 3)
+        self.assertEqual(result['uniqueDownloads'], 2)
+        self.assertEqual(result['expectedBytes'], 2000)
+        self.assertEqual(result['fallbackDownloads'], 0)
+        self.assertEqual(result['sharedTiles'], {})
+        self.assertEqual(result['numTiles'], 2)
+
+    # -------------------------------------------------------------------------
+    # testTileSharedAcrossLakes
+    # -------------------------------------------------------------------------
+    def testTileSharedAcrossLakes(self):
+        summary = PlanSummary()
+        summary.add(self._plan('1', [self._granule(2001, 'h09v04')]))
+        summary.add(self._plan('2', [self._granule(2001, 'h09v04')]))
+        result = summary.summarize()
+        self.assertEqual(result['uniqueDownloads'], 1)
+        self.assertEqual(result['granuleReferences'], 2)
+        self.assertEqual(result['sharedTiles'], {'h09v04': 2})
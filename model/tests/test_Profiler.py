@@ -0,0 +1,65 @@
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+
+from birkett_lake_extract.model.Profiler import Profiler
+
+
+# -----------------------------------------------------------------------------
+# class ProfilerTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_Profiler
+# -----------------------------------------------------------------------------
+class ProfilerTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testProfile
+    # -------------------------------------------------------------------------
+    def testProfile(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            profileFile = os.path.join(tmpDir, 'lake', 'lake772.pstats')
+            profiler = Profiler(profileFile)
+
+            with profiler:
+                mainWork()
+                worker = threading.Thread(target=workerWork)
+                worker.start()
+                worker.join()
+
+            functions = {key[2] for key in
+                         pstats.Stats(profileFile).stats}
+            self.assertIn('mainWork', functions)
+            self.assertIn('workerWork', functions)
+
+            reportFile = profiler.writeReport(
+                [{'program': 'gdalwarp',
+                  'stage': 'extractLakePerYear/2001',
+                  'seconds': 1.5,
+                  'status': 'ok',
+                  'command': 'gdalwarp a.tif b.tif'}])
+            self.assertEqual(reportFile, profileFile + '.txt')
+
+            with open(reportFile) as inFile:
+                report = inFile.read()
+
+        self.assertIn('External commands by total time', report)
+        self.assertIn('gdalwarp a.tif b.tif', report)
+        self.assertIn('Python functions by cumulative time', report)
+        self.assertIn('workerWork', report)
+
+
+# -----------------------------------------------------------------------------
+# mainWork()
+# -----------------------------------------------------------------------------
+def mainWork() -> int:
+    return sum(range(1000))
+
+
+# -----------------------------------------------------------------------------
+# workerWork()
+# -----------------------------------------------------------------------------
+def workerWork() -> int:
+    return sum(range(1000))
@@ -0,0 +1,35 @@
+import tempfile
+import unittest
+
+from birkett_lake_extract.model.StageCache import StageCache
+
+
+# -----------------------------------------------------------------------------
+# class StageCacheTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_StageCache
+# -----------------------------------------------------------------------------
+class StageCacheTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testKeyOrder
+    # -------------------------------------------------------------------------
+    def testKeyOrder(self):
+        self.assertEqual(StageCache.key({'bbox': [1, 2], 'year': 2001}),
+                         StageCache.key({'year': 2001, 'bbox': [1, 2]}))
+        self.assertNotEqual(StageCache.key({'year': 2001}),
+                            StageCache.key({'year': 2002}))
+
+    # -------------------------------------------------------------------------
+    # testSaveLoad
+    # -------------------------------------------------------------------------
+    def testSaveLoad(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            cache = StageCache(tmpDir)
+            key = StageCache.key({'granules': ['a.hdf', 'b.hdf']})
+            self.assertIsNone(cache.load('makeMaxExtent', key))
+            cache.save('makeMaxExtent', key, 'maxextent/MaxExtent.tif')
+            self.assertEqual(cache.load('makeMaxExtent', key),
+                             'maxextent/MaxExtent.tif')
+            self.assertIsNone(cache.load('clipMaxExtent', key))
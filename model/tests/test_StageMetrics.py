@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.libraries.daac_download import setLimiter
+from birkett_lake_extract.model.StageMetrics import StageMetrics
+
+
+# -----------------------------------------------------------------------------
+# class StageMetricsTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_StageMetrics
+# -----------------------------------------------------------------------------
+class StageMetricsTestCase(unittest.TestCase):
+
+    # -------------------------------------------------------------------------
+    # testNestedStages
+    # -------------------------------------------------------------------------
+    def testNestedStages(self):
+        metrics = StageMetrics('772')
+        with metrics.stage('extractLakePerYear'):
+            with metrics.stage('2001'):
+                pass
+        stages = [s['stage'] for s in metrics.toDict()['stages']]
+        self.assertEqual(stages, ['extractLakePerYear/2001',
+                                  'extractLakePerYear'])
+
+    # -------------------------------------------------------------------------
+    # testFailedStage
+    # -------------------------------------------------------------------------
+    def testFailedStage(self):
+        metrics = StageMetrics('772')
+        with self.assertRaises(RuntimeError):
+            with metrics.stage('clipMaxExtent'):
+                raise RuntimeError('outside of extent')
+        stage = metrics.toDict()['stages'][0]
+        self.assertEqual(stage['status'], 'failed')
+        self.assertGreaterEqual(stage['wallSeconds'], 0)
+
+    # -------------------------------------------------------------------------
+    # testWrite
+    # -------------------------------------------------------------------------
+    def testWrite(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            metricsFile = os.path.join(tmpDir, 'metrics.jsonl')
+            for lakeNumber in ['772', '773']:
+                metrics = StageMetrics(lakeNumber)
+                metrics.setInfo(startYear=2001, endYear=2015)
+                with metrics.stage('getMOD44W'):
+                    pass
+                metrics.write(metricsFile)
+            with open(metricsFile) as inFile:
+                records = [json.loads(line) for line in inFile]
+        self.assertEqual([r['lakeNumber'] for r in records], ['772', '773'])
+        self.assertEqual(records[0]['startYear'], 2001)
+
+    # -------------------------------------------------------------------------
+    # testCommandStage
+    # -------------------------------------------------------------------------
+    def testCommandStage(self):
+        metrics = StageMetrics('772')
+        with metrics.stage('extractLakePerYear'):
+            with metrics.command('gdalwarp a b'):
+                pass
+            with metrics.command('gdalwarp b c',
+                                 stage='extractLakePerYear/2001/write'):
+                pass
+        stages = [c['stage'] for c in metrics.toDict()['commands']]
+        self.assertEqual(stages, ['extractLakePerYear',
+                                  'extractLakePerYear/2001/write'])
+
+    # -------------------------------------------------------------------------
+    # testWorkerStage
+    # -------------------------------------------------------------------------
+    def testWorkerStage(self):
+        metrics = StageMetrics('772')
+
+        def work():
+            with metrics.workerStage('extractLakePerYear/2001'):
+                sum(range(200000))
+
+        with metrics.stage('extractLakePerYear'):
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+        stages = metrics.toDict()['stages']
+        self.assertEqual([s['stage'] for s in stages],
+                         ['extractLakePerYear/2001', 'extractLakePerYear'])
+        self.assertGreater(stages[0]['cpuSeconds'], 0)
+        self.assertEqual(stages[0]['status'], 'ok')
+
+    # -------------------------------------------------------------------------
+    # testDownloads
+    # -------------------------------------------------------------------------
+    def testDownloads(self):
+        limiter = DownloadLimiter()
+        setLimiter(limiter)
+        try:
+            limiter.addDownload(1000, 0.5)
+            metrics = StageMetrics('772')
+            with metrics.stage('makeMaxExtent'):
+                limiter.throttled('e4ftl01.cr.usgs.gov', '503', 0)
+                limiter.addDownload(2000, 1.0)
+            record = metrics.toDict()
+        finally:
+            setLimiter(None)
+        self.assertEqual(record['downloads']['bytes'], 2000)
+        self.assertEqual(record['downloads']['bytesPerSecond'], 2000)
+        self.assertEqual(record['downloads']['retries'], {'503': 1})
+        self.assertEqual(record['stages'][0]['downloadRetries'], 1)
+
+    # -------------------------------------------------------------------------
+    # testGranuleDownloads
+    # -------------------------------------------------------------------------
+    def testGranuleDownloads(self):
+        metrics = StageMetrics('772')
+        with tempfile.TemporaryDirectory() as tmpDir:
+            filePath = os.path.join(tmpDir, 'MOD44W.A2001.hdf')
+
+            def download():
+                with metrics.download(filePath,
+                                      stage='makeMaxExtent/downloadMOD44W'):
+                    with open(filePath, 'wb') as outFile:
+                        outFile.write(b'0' * 100)
+
+            with metrics.stage('makeMaxExtent'):
+                worker = threading.Thread(target=download)
+                worker.start()
+                worker.join()
+        granules = metrics.toDict()['downloads']['granules']
+        self.assertEqual(len(granules), 1)
+        self.assertEqual(granules[0]['file'], 'MOD44W.A2001.hdf')
+        self.assertEqual(granules[0]['stage'], 'makeMaxExtent/downloadMOD44W')
+        self.assertEqual(granules[0]['bytes'], 100)
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from birkett_lake_extract.model.GranuleReader import GranuleReader
+from birkett_lake_extract.model.TileCache import TileCache
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+
+# -----------------------------------------------------------------------------
+# class TileCacheTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_TileCache
+# -----------------------------------------------------------------------------
+class TileCacheTestCase(unittest.TestCase):
+
+    transform = (-10007554.677, 231.656358264, 0.0,
+                 5559752.598333, 0.0, -231.656358264)
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self._image = np.zeros((20, 30), dtype=np.uint8)
+        self._image[5:10, 10:20] = 1
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # testReadWindow
+    # -------------------------------------------------------------------------
+    def testReadWindow(self):
+        arrayPath = os.path.join(self._tmpDir.name, 'granule.npy')
+        np.save(arrayPath, self._image)
+        window = TileCache.read({'array': arrayPath}, (10, 5, 5, 3))
+        self.assertIsInstance(window.base, np.memmap)
+        self.assertFalse(window.flags.writeable)
+        np.testing.assert_array_equal(window, self._image[5:8, 10:15])
+
+    # -------------------------------------------------------------------------
+    # testConvert
+    # -------------------------------------------------------------------------
+    @unittest.skipIf(gdal is None, 'GDAL is not installed')
+    def testConvert(self):
+        granulePath = os.path.join(self._tmpDir.name, 'granule.tif')
+        ds = gdal.GetDriverByName('GTiff').Create(granulePath, 30, 20, 1,
+                                                  gdal.GDT_Byte)
+        ds.SetGeoTransform(self.transform)
+        ds.GetRasterBand(1).WriteArray(self._image)
+        ds.GetRasterBand(1).SetNoDataValue(250)
+        ds = None
+
+        tileCache = TileCache(os.path.join(self._tmpDir.name, 'cache'))
+
+        with GranuleReader(granulePath, tileCache=tileCache) as reader:
+            self.assertEqual(reader.getTransform(), self.transform)
+            self.assertEqual(reader.readWater().sum(), 50)
+            vrtPath = reader.getWaterMaskName()
+
+        vrt = gdal.Open(vrtPath)
+        np.testing.assert_array_equal(vrt.GetRasterBand(1).ReadAsArray(),
+                                      self._image)
+        self.assertEqual(vrt.GetRasterBand(1).GetNoDataValue(), 250)
+        self.assertEqual(vrt.GetGeoTransform(), self.transform)
+
+        # A cached tile is served without decoding the granule again.
+        os.utime(granulePath)
+        self.assertEqual(tileCache.get(granulePath)['vrt'], vrtPath)
@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+import uuid
+from multiprocessing import shared_memory
+
+from birkett_lake_extract.model.TileStack import TileStack
+
+
+# -----------------------------------------------------------------------------
+# _sumInChild
+# -----------------------------------------------------------------------------
+def _sumInChild(key, shape, refDir, queue):
+
+    def fail(array):
+        raise AssertionError('The stack should already be loaded')
+
+    with TileStack.acquire(key, shape, fail, refDir=refDir) as stack:
+        queue.put(int(stack.getArray().sum()))
+
+
+# -----------------------------------------------------------------------------
+# class TileStackTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_TileStack
+# -----------------------------------------------------------------------------
+class TileStackTestCase(unittest.TestCase):
+
+    shape = (3, 40, 50)
+
+    # -------------------------------------------------------------------------
+    # setUp
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        self._refDir = tempfile.TemporaryDirectory()
+        self._key = uuid.uuid4().hex[:16]
+        self._loads = 0
+
+    # -------------------------------------------------------------------------
+    # tearDown
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        self._refDir.cleanup()
+
+    # -------------------------------------------------------------------------
+    # _load
+    # -------------------------------------------------------------------------
+    def _load(self, array):
+        self._loads += 1
+        for year in range(array.shape[0]):
+            array[year, :10 + year, :] = 1
+
+    # -------------------------------------------------------------------------
+    # testShared
+    # -------------------------------------------------------------------------
+    def testShared(self):
+        first = TileStack.acquire(self._key, self.shape, self._load,
+                                  refDir=self._refDir.name)
+        second = TileStack.acquire(self._key, self.shape, self._load,
+                                   refDir=self._refDir.name)
+        self.assertEqual(self._loads, 1)
+        self.assertEqual(first.getArray().any(axis=0).sum(), 12 * 50)
+        self.assertFalse(second.getArray().flags.writeable)
+        self.assertEqual(len(TileStack.getReferences(
+            self._key, refDir=self._refDir.name)), 2)
+
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        child = context.Process(target=_sumInChild,
+                                args=(self._key, self.shape,
+                                      self._refDir.name, queue))
+        child.start()
+        child.join()
+        self.assertEqual(child.exitcode, 0)
+        self.assertEqual(queue.get(timeout=5), (10 + 11 + 12) * 50)
+
+        first.release()
+        self.assertEqual(len(TileStack.getReferences(
+            self._key, refDir=self._refDir.name)), 1)
+        second.release()
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=first.getName())
+
+        self.assertEqual(os.listdir(self._refDir.name), [])
+
+        with self.assertRaises(RuntimeError):
+            first.getArray()
+
+    # -------------------------------------------------------------------------
+    # testFailedLoad
+    # -------------------------------------------------------------------------
+    def testFailedLoad(self):
+
+        def fail(array):
+            raise RuntimeError('unreadable granule')
+
+        with self.assertRaises(RuntimeError):
+            TileStack.acquire(self._key, self.shape, fail,
+                              refDir=self._refDir.name)
+
+        self.assertEqual(TileStack.getReferences(
+            self._key, refDir=self._refDir.name), [])
+        self.assertEqual(os.listdir(self._refDir.name), [])
+
+        with TileStack.acquire(self._key, self.shape, self._load,
+                               refDir=self._refDir.name) as stack:
+            self.assertEqual(stack.getArray()[0].sum(), 10 * 50)
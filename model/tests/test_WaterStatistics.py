@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from birkett_lake_extract.model.WaterStatistics import WaterStatistics
+
+
+# -----------------------------------------------------------------------------
+# class WaterStatisticsTestCase
+#
+# export PYTHONPATH="$PWD:$PWD/core:$PWD/lake_extract"
+# python -m unittest model.tests.test_WaterStatistics
+# -----------------------------------------------------------------------------
+class WaterStatisticsTestCase(unittest.TestCase):
+
+    transform = (0.0, 500.0, 0.0, 0.0, 0.0, -500.0)
+
+    # -------------------------------------------------------------------------
+    # testFromArray
+    # -------------------------------------------------------------------------
+    def testFromArray(self):
+        array = np.array([[1, 1, 0], [0, 3, 250]], dtype=np.uint8)
+        row = WaterStatistics.fromArray(array, self.transform, '772',
+                                        '2001', '/out/lake_772.tif')
+        self.assertEqual(row['waterPixels'], 2)
+        self.assertEqual(row['landPixels'], 2)
+        self.assertEqual(row['nodataPixels'], 2)
+        self.assertEqual(row['pixelAreaKm2'], 0.25)
+        self.assertEqual(row['waterKm2'], 0.5)
+        self.assertEqual(row['year'], 2001)
+        self.assertEqual(row['file'], 'lake_772.tif')
+
+    # -------------------------------------------------------------------------
+    # testWriteAndAppend
+    # -------------------------------------------------------------------------
+    def testWriteAndAppend(self):
+        rows = [WaterStatistics.fromArray(np.ones((2, 2)), self.transform,
+                                          '772', year, 'lake.tif')
+                for year in ['2001', '2002']]
+        with tempfile.TemporaryDirectory() as tmpDir:
+            lakeTable = WaterStatistics.write(
+                rows, os.path.join(tmpDir, 'lake_772_stats.csv'))
+            self.assertEqual([row['year'] for row in
+                              WaterStatistics.read(lakeTable)],
+                             ['2001', '2002'])
+
+            batchTable = os.path.join(tmpDir, 'batch', 'water_stats.csv')
+            WaterStatistics.append(rows, batchTable)
+            WaterStatistics.append(rows[:1], batchTable)
+            batch = WaterStatistics.read(batchTable)
+            self.assertEqual(len(batch), 3)
+            self.assertEqual(batch[2]['waterPixels'], '4')
@@ -1,9 +1,16 @@
 #!/usr/bin/python
 import argparse
+import json
 import logging
 import sys
 
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.EarthdataAuth import EarthdataAuth
 from birkett_lake_extract.model.LakeExtract import LakeExtract
+from birkett_lake_extract.model.libraries.daac_download import setAuth
+from birkett_lake_extract.model.libraries.daac_download import setLimiter
+from birkett_lake_extract.model.PlanSummary import PlanSummary
+from birkett_lake_extract.model.Profiler import Profiler
 
 
 # -------------------------------------------------------------------------
@@ -50,8 +57,133 @@ def main() -> None:
                         ' <lon min> <lat min> <lon max> <lat max>\n' +
                         'Ex. 13.2 46.1 14.0 47.0',)
 
+    parser.add_argument('-scratch',
+                        default=None,
+                        help='Directory for downloads and intermediates, ' +
+                        'e.g. node-local SSD or tmpfs. Only finished ' +
+                        'outputs are published to the output directory.')
+
+    parser.add_argument('-metrics',
+                        default=None,
+                        help='Path to a JSON lines file to append the ' +
+                        'per-stage timing and memory metrics of this lake to.')
+
+    parser.add_argument('-stats',
+                        default=None,
+                        help='Path to a CSV batch table to append the ' +
+                        'per-year water statistics of this lake to.')
+
+    parser.add_argument('-outputcatalog',
+                        default=None,
+                        help='SQLite catalog of the outputs, one row per ' +
+                        'lake and year. Lakes whose outputs are cataloged ' +
+                        'for the same granules and parameters are skipped.')
+
+    parser.add_argument('-plan',
+                        action='store_true',
+                        help='Resolve the granules and tiles this lake ' +
+                        'needs and print the plan without downloading or ' +
+                        'processing any raster.')
+
+    parser.add_argument('-force',
+                        action='store_true',
+                        help='Ignore checkpoints from previous runs and ' +
+                        'regenerate every stage and output.')
+
+    parser.add_argument('-profile',
+                        default=None,
+                        help='Path to write a cProfile/pstats dump to. A ' +
+                        'text report of the hottest functions and every ' +
+                        'external command is written to <path>.txt. ' +
+                        'Threads started during the run, the year and ' +
+                        'download workers, are profiled and merged in.')
+
+    parser.add_argument('-flamegraph',
+                        default=None,
+                        help='Path to write a py-spy flame graph (SVG) to. ' +
+                        'Requires -profile and py-spy on the PATH.')
+
+    parser.add_argument('-tilecache',
+                        default=None,
+                        help='Directory of memory-mappable copies of the ' +
+                        'MOD44W water masks, shared by lakes on the same ' +
+                        'tiles.')
+
+    parser.add_argument('-sharetiles',
+                        action='store_true',
+                        help='Hold the yearly water masks of the tile in ' +
+                        'shared memory, shared with other lakes running on ' +
+                        'this node.')
+
+    parser.add_argument('-rate',
+                        default=10.0,
+                        type=float,
+                        help='Maximum MOD44W download requests per second.')
+
+    parser.add_argument('-concurrency',
+                        default=4,
+                        type=int,
+                        help='Maximum concurrent MOD44W downloads per host. ' +
+                        'Halved while LP DAAC throttles, then raised again.')
+
+    parser.add_argument('-tokencache',
+                        default=None,
+                        help='File caching an Earthdata Login bearer token, ' +
+                        'fetched once with the .netrc credentials and ' +
+                        'shared by every process using the same file.')
+
+    parser.add_argument('-yearworkers',
+                        default=1,
+                        type=int,
+                        help='Number of years of a lake extracted ' +
+                        'concurrently. With 1, a writer thread warps each ' +
+                        'year while the next one is cut to the lake.')
+
+    parser.add_argument('-warpthreads',
+                        default=None,
+                        type=int,
+                        help='Threads each gdalwarp uses to warp and ' +
+                        'compress. Keep -yearworkers times -warpthreads ' +
+                        'within the cores available.')
+
+    parser.add_argument('-warpmemory',
+                        default=None,
+                        type=int,
+                        help='Warp memory limit of each gdalwarp, in MB.')
+
+    parser.add_argument('-cutlinetolerance',
+                        default=None,
+                        type=float,
+                        help='Tolerance, in meters, of the topology ' +
+                        'preserving simplification of the lake cutline. ' +
+                        'Off by default, a quarter pixel is 57.9.')
+
+    parser.add_argument('-cutlinemaxvertices',
+                        default=None,
+                        type=int,
+                        help='Cut the years against a rasterized mask of ' +
+                        'the lake when its simplified cutline has more ' +
+                        'vertices than this.')
+
     args = parser.parse_args()
 
+    if args.yearworkers < 1:
+        parser.error('-yearworkers must be at least 1')
+
+    if args.rate <= 0 or args.concurrency < 1:
+        parser.error('-rate must be positive and -concurrency at least 1')
+
+    if args.flamegraph and not args.profile:
+        parser.error('-flamegraph requires -profile')
+
+    try:
+        bbox = [float(coord) for coord in args.bbox]
+    except ValueError:
+        bbox = []
+
+    if len(bbox) != 4:
+        parser.error('-bbox takes four numbers, got {}'.format(args.bbox))
+
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     ch = logging.StreamHandler(sys.stdout)
@@ -62,14 +194,52 @@ def main() -> None:
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
+    setLimiter(DownloadLimiter(requestsPerSecond=args.rate,
+                               maxConcurrency=args.concurrency,
+                               logger=logger))
+
+    if args.tokencache:
+        setAuth(EarthdataAuth(args.tokencache, logger=logger))
+
     lakeExtract = LakeExtract(outDir=args.o,
                               bbox=args.bbox,
                               lakeNumber=args.lakenumber,
                               startYear=args.start,
                               endYear=args.end,
-                              logger=logger)
-
-    lakeExtract.extractLakes()
+                              logger=logger,
+                              metricsFile=args.metrics,
+                              force=args.force,
+                              tileCacheDir=args.tilecache,
+                              shareTileStacks=args.sharetiles,
+                              yearWorkers=args.yearworkers,
+                              warpThreads=args.warpthreads,
+                              warpMemory=args.warpmemory,
+                              cutlineTolerance=args.cutlinetolerance,
+                              cutlineMaxVertices=args.cutlinemaxvertices,
+                              statsFile=args.stats,
+                              catalogFile=args.outputcatalog,
+                              scratchDir=args.scratch)
+
+    if args.plan:
+        plan = lakeExtract.plan()
+        summary = PlanSummary()
+        summary.add(plan)
+        print(json.dumps({'plan': plan, 'summary': summary.summarize()},
+                         indent=2))
+        return
+
+    if not args.profile:
+        lakeExtract.extractLakes()
+        return
+
+    profiler = Profiler(args.profile,
+                        flameGraphFile=args.flamegraph,
+                        logger=logger)
+    try:
+        with profiler:
+            lakeExtract.extractLakes()
+    finally:
+        profiler.writeReport(lakeExtract.getMetrics()['commands'])
 
 
 # -----------------------------------------------------------------------------
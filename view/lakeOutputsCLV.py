@@ -0,0 +1,62 @@
+#!/usr/bin/python
+import argparse
+import json
+import sys
+
+from birkett_lake_extract.model.OutputCatalog import OutputCatalog
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to list the outputs recorded in an output catalog,
+# optionally those intersecting a bounding box or of one year.
+#
+# Ex.
+# python lakeOutputsCLV.py -outputcatalog outputs.sqlite \
+#   -bbox 5.3 -11.15 26.22 -10.32 -year 2005
+# -------------------------------------------------------------------------
+def main() -> None:
+
+    desc = 'Use this application to list the outputs recorded in an ' + \
+        'output catalog.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-outputcatalog',
+                        required=True,
+                        help='SQLite catalog of the outputs.')
+
+    parser.add_argument('-bbox',
+                        default=None,
+                        nargs='+',
+                        help='Only outputs of lakes intersecting this bbox, ' +
+                        '<lon min> <lat min> <lon max> <lat max>')
+
+    parser.add_argument('-year',
+                        default=None,
+                        type=int,
+                        help='Only outputs of this year.')
+
+    args = parser.parse_args()
+
+    bbox = None
+
+    if args.bbox:
+        try:
+            bbox = [float(coord) for coord in args.bbox]
+        except ValueError:
+            bbox = []
+
+        if len(bbox) != 4:
+            parser.error('-bbox takes four numbers, got {}'.format(args.bbox))
+
+    catalog = OutputCatalog(args.outputcatalog)
+    print(json.dumps(catalog.query(bbox=bbox, year=args.year), indent=2))
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+import argparse
+import json
+import logging
+import sys
+
+from birkett_lake_extract.model.LakeCatalog import LakeCatalog
+from birkett_lake_extract.model.LakeExtract import LakeExtract
+from birkett_lake_extract.model.LakeSharder import LakeSharder
+from birkett_lake_extract.model.PlanSummary import PlanSummary
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to estimate the work of a lake catalog before
+# running it: unique granule downloads, expected bytes, tiles shared across
+# lakes and expected output count. Nothing is downloaded or processed, CMR
+# results are checkpointed in the output directory for the real run. With
+# -shards, each lake is planned in the shard directory lakeShardCLV runs it
+# in.
+#
+# Ex.
+# python lakePlanCLV.py -catalog lakes.csv -o output -start 2001 -end 2015
+# python lakePlanCLV.py -catalog lakes.csv -o output -shards 16
+# -------------------------------------------------------------------------
+def main() -> None:
+
+    desc = 'Use this application to estimate the downloads and outputs ' + \
+        'of a lake catalog without processing it.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-catalog',
+                        required=True,
+                        help='CSV with columns lakenumber,minlon,minlat,' +
+                        'maxlon,maxlat')
+
+    parser.add_argument('-o',
+                        default='.',
+                        help='Path to output directory')
+
+    parser.add_argument('-start',
+                        default=2001,
+                        type=int,
+                        help='Starting year.')
+
+    parser.add_argument('-end',
+                        default=2015,
+                        type=int,
+                        help='Ending year.')
+
+    parser.add_argument('-outputcatalog',
+                        default=None,
+                        help='SQLite catalog of the outputs. Lakes whose ' +
+                        'outputs are cataloged for the same granules and ' +
+                        'parameters are planned as complete.')
+
+    parser.add_argument('-shards',
+                        default=None,
+                        type=int,
+                        help='Number of shards of the lakeShardCLV run to ' +
+                        'plan, whose checkpoints and downloads are in ' +
+                        'the shard directories of the output directory.')
+
+    parser.add_argument('-cutlinetolerance',
+                        default=None,
+                        type=float,
+                        help='Cutline tolerance of the run, part of the ' +
+                        'parameters its outputs are checked against.')
+
+    parser.add_argument('-cutlinemaxvertices',
+                        default=None,
+                        type=int,
+                        help='Cutline maximum vertices of the run, part of ' +
+                        'the parameters its outputs are checked against.')
+
+    parser.add_argument('-planfile',
+                        default=None,
+                        help='Path to write the per-lake plans and the ' +
+                        'summary to as JSON.')
+
+    args = parser.parse_args()
+
+    if args.shards is not None and args.shards < 1:
+        parser.error('-shards must be at least 1')
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stderr)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    summary = PlanSummary()
+    plans = []
+
+    lakes = LakeCatalog(args.catalog).lakes()
+    lakeDirs = LakeSharder(lakes, args.shards).getLakeDirs(args.o) \
+        if args.shards else [(lake, args.o) for lake in lakes]
+
+    for lake, outDir in lakeDirs:
+        lakeExtract = LakeExtract(outDir=outDir,
+                                  bbox=lake['bbox'],
+                                  lakeNumber=lake['lakeNumber'],
+                                  startYear=args.start,
+                                  endYear=args.end,
+                                  logger=logger,
+                                  cutlineTolerance=args.cutlinetolerance,
+                                  cutlineMaxVertices=args.cutlinemaxvertices,
+                                  catalogFile=args.outputcatalog)
+        plan = lakeExtract.plan()
+        summary.add(plan)
+        plans.append(plan)
+        logger.info('Planned lake {}: {} granules'.format(
+            lake['lakeNumber'], len(plan['granules'])))
+
+    result = summary.summarize()
+
+    if args.planfile:
+        with open(args.planfile, 'w') as outFile:
+            json.dump({'summary': result, 'plans': plans}, outFile, indent=2)
+
+    print(json.dumps(result, indent=2))
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
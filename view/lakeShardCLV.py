@@ -0,0 +1,226 @@
+#!/usr/bin/python
+import argparse
+import logging
+import os
+import shutil
+import sys
+
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.EarthdataAuth import EarthdataAuth
+from birkett_lake_extract.model.LakeCatalog import LakeCatalog
+from birkett_lake_extract.model.LakeExtract import LakeExtract
+from birkett_lake_extract.model.LakeSharder import LakeSharder
+from birkett_lake_extract.model.libraries.daac_download import setAuth
+from birkett_lake_extract.model.libraries.daac_download import setLimiter
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to process one shard of a lake catalog, e.g. as a
+# Slurm array task, and to merge the shards once they have finished. Lakes
+# are assigned to shards by MODIS tile so a tile's granules are downloaded
+# on one node only.
+#
+# Ex.
+# sbatch --array=0-15 --wrap="python lakeShardCLV.py -catalog lakes.csv \
+#   -o output"
+# python lakeShardCLV.py -catalog lakes.csv -o output -shard 3/16
+# python lakeShardCLV.py -o output -merge
+# -------------------------------------------------------------------------
+def main() -> int:
+
+    desc = 'Use this application to process one tile-affine shard of a ' + \
+        'lake catalog, or to merge the finished shards.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-catalog',
+                        default=None,
+                        help='CSV with columns lakenumber,minlon,minlat,' +
+                        'maxlon,maxlat')
+
+    parser.add_argument('-o',
+                        default='.',
+                        help='Path to output directory')
+
+    parser.add_argument('-start',
+                        default=2001,
+                        type=int,
+                        help='Starting year.')
+
+    parser.add_argument('-end',
+                        default=2015,
+                        type=int,
+                        help='Ending year.')
+
+    parser.add_argument('-shard',
+                        default=None,
+                        help='Shard to run as i/N, zero based. Defaults to ' +
+                        'the Slurm array task.')
+
+    parser.add_argument('-scratch',
+                        default=None,
+                        help='Directory for downloads and intermediates, ' +
+                        'e.g. node-local SSD or tmpfs. Each shard works in ' +
+                        'its own shard_<i> directory. Only finished ' +
+                        'outputs are published to the output directory.')
+
+    parser.add_argument('-keepdownloads',
+                        action='store_true',
+                        help='Keep the shard\'s MOD44W downloads when ' +
+                        'done. They are always kept between the lakes of ' +
+                        'the shard, which share tiles.')
+
+    parser.add_argument('-outputcatalog',
+                        default=None,
+                        help='SQLite catalog of the outputs, one row per ' +
+                        'lake and year. Lakes whose outputs are cataloged ' +
+                        'for the same granules and parameters are skipped. ' +
+                        'With -merge, the rows are pointed at the merged ' +
+                        'outputs.')
+
+    parser.add_argument('-merge',
+                        action='store_true',
+                        help='Merge the outputs and metrics of the ' +
+                        'finished shards into the output directory.')
+
+    parser.add_argument('-tilecache',
+                        default=None,
+                        help='Directory of memory-mappable copies of the ' +
+                        'MOD44W water masks. No cache unless given.')
+
+    parser.add_argument('-rate',
+                        default=10.0,
+                        type=float,
+                        help='Maximum MOD44W download requests per second.')
+
+    parser.add_argument('-concurrency',
+                        default=4,
+                        type=int,
+                        help='Maximum concurrent MOD44W downloads per host. ' +
+                        'Halved while LP DAAC throttles, then raised again.')
+
+    parser.add_argument('-tokencache',
+                        default=None,
+                        help='File caching an Earthdata Login bearer token, ' +
+                        'fetched once with the .netrc credentials and ' +
+                        'shared by every process using the same file.')
+
+    parser.add_argument('-yearworkers',
+                        default=1,
+                        type=int,
+                        help='Number of years of a lake extracted ' +
+                        'concurrently. With 1, a writer thread warps each ' +
+                        'year while the next one is cut to the lake.')
+
+    parser.add_argument('-warpthreads',
+                        default=None,
+                        type=int,
+                        help='Threads each gdalwarp uses to warp and ' +
+                        'compress. Keep -yearworkers times -warpthreads ' +
+                        'within the cores available.')
+
+    parser.add_argument('-warpmemory',
+                        default=None,
+                        type=int,
+                        help='Warp memory limit of each gdalwarp, in MB.')
+
+    parser.add_argument('-cutlinetolerance',
+                        default=None,
+                        type=float,
+                        help='Tolerance, in meters, of the topology ' +
+                        'preserving simplification of the lake cutline. ' +
+                        'Off by default, a quarter pixel is 57.9.')
+
+    parser.add_argument('-cutlinemaxvertices',
+                        default=None,
+                        type=int,
+                        help='Cut the years against a rasterized mask of ' +
+                        'the lake when its simplified cutline has more ' +
+                        'vertices than this.')
+
+    args = parser.parse_args()
+
+    if args.yearworkers < 1:
+        parser.error('-yearworkers must be at least 1')
+
+    if args.rate <= 0 or args.concurrency < 1:
+        parser.error('-rate must be positive and -concurrency at least 1')
+
+    if not args.merge and not args.catalog:
+        parser.error('-catalog is required unless -merge is given')
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    setLimiter(DownloadLimiter(requestsPerSecond=args.rate,
+                               maxConcurrency=args.concurrency,
+                               logger=logger))
+
+    if args.tokencache:
+        setAuth(EarthdataAuth(args.tokencache, logger=logger))
+
+    if args.merge:
+        merged = LakeSharder.merge(args.o,
+                                   catalogFile=args.outputcatalog,
+                                   logger=logger)
+        return 1 if merged['missingShards'] or merged['failedLakes'] else 0
+
+    shardIndex, numShards = LakeSharder.parseShard(args.shard)
+    sharder = LakeSharder(LakeCatalog(args.catalog).lakes(),
+                          numShards,
+                          logger=logger)
+
+    # ---
+    # Shards sharing a node-local scratch directory keep their downloads
+    # apart, so one never reads or removes another's granules.
+    # ---
+    scratchDir = os.path.join(args.scratch, 'shard_{}'.format(shardIndex)) \
+        if args.scratch else None
+
+    def lakeFactory(lake, shardDir, metricsFile):
+        return LakeExtract(outDir=shardDir,
+                           bbox=lake['bbox'],
+                           lakeNumber=lake['lakeNumber'],
+                           startYear=args.start,
+                           endYear=args.end,
+                           logger=logger,
+                           metricsFile=metricsFile,
+                           keepDownloads=True,
+                           tileCacheDir=args.tilecache,
+                           yearWorkers=args.yearworkers,
+                           warpThreads=args.warpthreads,
+                           warpMemory=args.warpmemory,
+                           cutlineTolerance=args.cutlinetolerance,
+                           cutlineMaxVertices=args.cutlinemaxvertices,
+                           catalogFile=args.outputcatalog,
+                           scratchDir=scratchDir)
+
+    logger.info('Running shard {}/{}'.format(shardIndex, numShards))
+    manifest = sharder.runShard(shardIndex, args.o, lakeFactory)
+
+    if not args.keepdownloads:
+        workDir = scratchDir or LakeSharder.getShardDir(args.o, shardIndex)
+        shutil.rmtree(os.path.join(workDir, 'MOD44W'), ignore_errors=True)
+
+    failed = [lake for lake in manifest['lakes']
+              if lake['status'] != 'complete']
+    logger.info('Shard {}/{} done, {} lakes, {} failed'.format(
+        shardIndex, numShards, len(manifest['lakes']), len(failed)))
+
+    return 1 if failed else 0
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
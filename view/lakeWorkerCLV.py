@@ -0,0 +1,290 @@
+#!/usr/bin/python
+import argparse
+import json
+import logging
+import os
+import sys
+
+from birkett_lake_extract.model.DownloadLimiter import DownloadLimiter
+from birkett_lake_extract.model.EarthdataAuth import EarthdataAuth
+from birkett_lake_extract.model.LakeCatalog import LakeCatalog
+from birkett_lake_extract.model.LakeExtract import LakeExtract
+from birkett_lake_extract.model.LakeWorker import LakeWorker
+from birkett_lake_extract.model.libraries.daac_download import setAuth
+from birkett_lake_extract.model.libraries.daac_download import setLimiter
+
+
+# -------------------------------------------------------------------------
+# main()
+#
+# Use this application to run lakes in a long-lived worker that keeps GDAL
+# and core loaded, and to submit lakes to the worker's queue.
+# Several workers may serve the same queue.
+#
+# Ex.
+# python lakeWorkerCLV.py -queue queue -serve
+# python lakeWorkerCLV.py -queue queue -submit -o output -lakenumber 366 \
+#   -bbox -122.52 42.8 -121.69 43.05
+# python lakeWorkerCLV.py -queue queue -submit -o output -catalog lakes.csv
+# -------------------------------------------------------------------------
+def main() -> int:
+
+    desc = 'Use this application to run lake extraction jobs from a queue ' + \
+        'in a persistent worker, or to submit jobs to the queue.'
+
+    parser = argparse.ArgumentParser(description=desc)
+
+    parser.add_argument('-queue',
+                        required=True,
+                        help='Path to the queue directory')
+
+    mode = parser.add_mutually_exclusive_group(required=True)
+
+    mode.add_argument('-serve',
+                      action='store_true',
+                      help='Run jobs from the queue until stopped.')
+
+    mode.add_argument('-submit',
+                      action='store_true',
+                      help='Add the lake given by -lakenumber and -bbox, ' +
+                      'or every lake in -catalog, to the queue.')
+
+    mode.add_argument('-requeue',
+                      action='store_true',
+                      help='Return the jobs of dead workers to the queue.')
+
+    mode.add_argument('-status',
+                      action='store_true',
+                      help='Print the number of jobs in each state.')
+
+    parser.add_argument('-once',
+                        action='store_true',
+                        help='With -serve, exit when the queue is empty.')
+
+    parser.add_argument('-poll',
+                        default=5.0,
+                        type=float,
+                        help='Seconds between queue checks when idle.')
+
+    parser.add_argument('-o',
+                        default='.',
+                        help='Path to output directory. Lakes from a ' +
+                        'catalog are written to <o>/lake_<lakenumber>.')
+
+    parser.add_argument('-start',
+                        default=2001,
+                        type=int,
+                        help='Starting year.')
+
+    parser.add_argument('-end',
+                        default=2015,
+                        type=int,
+                        help='Ending year.')
+
+    parser.add_argument('-lakenumber',
+                        default=None,
+                        help='Name of the lake to submit.')
+
+    parser.add_argument('-bbox',
+                        default=None,
+                        nargs='+',
+                        help='Bounding box of the lake to submit.')
+
+    parser.add_argument('-catalog',
+                        default=None,
+                        help='CSV with columns lakenumber,minlon,minlat,' +
+                        'maxlon,maxlat')
+
+    parser.add_argument('-metrics',
+                        default=None,
+                        help='Path to a JSON lines file to append the ' +
+                        'per-stage metrics of submitted lakes to.')
+
+    parser.add_argument('-stats',
+                        default=None,
+                        help='Path to a CSV batch table to append the ' +
+                        'per-year water statistics of submitted lakes to.')
+
+    parser.add_argument('-outputcatalog',
+                        default=None,
+                        help='SQLite catalog of the outputs of submitted ' +
+                        'lakes, one row per lake and year. Lakes whose ' +
+                        'outputs are cataloged for the same granules and ' +
+                        'parameters are skipped.')
+
+    parser.add_argument('-scratch',
+                        default=None,
+                        help='With -serve, directory for the downloads and ' +
+                        'intermediates of all jobs, e.g. node-local SSD or ' +
+                        'tmpfs. Only finished outputs are published to ' +
+                        'the jobs\' output directories.')
+
+    parser.add_argument('-tilecache',
+                        default=None,
+                        help='With -serve, directory of memory-mappable ' +
+                        'copies of the MOD44W water masks shared by all jobs.')
+
+    parser.add_argument('-sharetiles',
+                        action='store_true',
+                        help='With -serve, hold the yearly water masks of ' +
+                        'each tile in shared memory, shared with the other ' +
+                        'workers on this node.')
+
+    parser.add_argument('-rate',
+                        default=10.0,
+                        type=float,
+                        help='Maximum MOD44W download requests per second.')
+
+    parser.add_argument('-concurrency',
+                        default=4,
+                        type=int,
+                        help='Maximum concurrent MOD44W downloads per host. ' +
+                        'Halved while LP DAAC throttles, then raised again.')
+
+    parser.add_argument('-tokencache',
+                        default=None,
+                        help='File caching an Earthdata Login bearer token, ' +
+                        'fetched once with the .netrc credentials and ' +
+                        'shared by every process using the same file.')
+
+    parser.add_argument('-yearworkers',
+                        default=1,
+                        type=int,
+                        help='Number of years of a lake extracted ' +
+                        'concurrently. With 1, a writer thread warps each ' +
+                        'year while the next one is cut to the lake.')
+
+    parser.add_argument('-warpthreads',
+                        default=None,
+                        type=int,
+                        help='Threads each gdalwarp uses to warp and ' +
+                        'compress. Keep -yearworkers times -warpthreads ' +
+                        'within the cores available.')
+
+    parser.add_argument('-warpmemory',
+                        default=None,
+                        type=int,
+                        help='Warp memory limit of each gdalwarp, in MB.')
+
+    parser.add_argument('-cutlinetolerance',
+                        default=None,
+                        type=float,
+                        help='Tolerance, in meters, of the topology ' +
+                        'preserving simplification of the lake cutline. ' +
+                        'Off by default, a quarter pixel is 57.9.')
+
+    parser.add_argument('-cutlinemaxvertices',
+                        default=None,
+                        type=int,
+                        help='Cut the years against a rasterized mask of ' +
+                        'the lake when its simplified cutline has more ' +
+                        'vertices than this.')
+
+    args = parser.parse_args()
+
+    if args.yearworkers < 1:
+        parser.error('-yearworkers must be at least 1')
+
+    if args.rate <= 0 or args.concurrency < 1:
+        parser.error('-rate must be positive and -concurrency at least 1')
+
+    if args.submit and not args.catalog and \
+            not (args.lakenumber and args.bbox):
+        parser.error('-submit requires -catalog, or -lakenumber and -bbox')
+
+    if args.submit and not args.catalog:
+        try:
+            bbox = [float(coord) for coord in args.bbox]
+        except ValueError:
+            bbox = []
+
+        if len(bbox) != 4:
+            parser.error('-bbox takes four numbers, got {}'.format(args.bbox))
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        "%(asctime)s; %(levelname)s; %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    setLimiter(DownloadLimiter(requestsPerSecond=args.rate,
+                               maxConcurrency=args.concurrency,
+                               logger=logger))
+
+    if args.tokencache:
+        setAuth(EarthdataAuth(args.tokencache, logger=logger))
+
+    if args.submit:
+
+        # Workers may run from another directory.
+        def absPath(path):
+            return os.path.abspath(path) if path else path
+
+        if args.catalog:
+            lakes = [dict(lake, outDir=os.path.join(
+                args.o, 'lake_{}'.format(lake['lakeNumber'])))
+                for lake in LakeCatalog(args.catalog).lakes()]
+        else:
+            lakes = [{'lakeNumber': args.lakenumber,
+                      'bbox': args.bbox,
+                      'outDir': args.o}]
+
+        for lake in lakes:
+            jobId = LakeWorker.submit(args.queue,
+                                      dict(lake,
+                                           startYear=args.start,
+                                           endYear=args.end,
+                                           metricsFile=absPath(args.metrics),
+                                           statsFile=absPath(args.stats),
+                                           catalogFile=absPath(
+                                               args.outputcatalog)))
+            logger.info('Submitted {}'.format(jobId))
+
+        return 0
+
+    if args.requeue:
+        jobIds = LakeWorker.requeue(args.queue)
+        logger.info('Requeued {} jobs'.format(len(jobIds)))
+        return 0
+
+    if args.status:
+        print(json.dumps(LakeWorker.status(args.queue), indent=2))
+        return 0
+
+    def lakeFactory(job, jobLogger):
+        return LakeExtract(outDir=job['outDir'],
+                           bbox=job['bbox'],
+                           lakeNumber=job['lakeNumber'],
+                           startYear=job['startYear'],
+                           endYear=job['endYear'],
+                           logger=jobLogger,
+                           metricsFile=job.get('metricsFile'),
+                           statsFile=job.get('statsFile'),
+                           catalogFile=job.get('catalogFile'),
+                           force=job.get('force', False),
+                           tileCacheDir=args.tilecache,
+                           shareTileStacks=args.sharetiles,
+                           yearWorkers=args.yearworkers,
+                           warpThreads=args.warpthreads,
+                           warpMemory=args.warpmemory,
+                           cutlineTolerance=args.cutlinetolerance,
+                           cutlineMaxVertices=args.cutlinemaxvertices,
+                           scratchDir=args.scratch)
+
+    # Pay the geospatial import and initialization cost once, up front.
+    LakeExtract.warmUp()
+    worker = LakeWorker(args.queue, lakeFactory, logger=logger)
+    worker.serve(pollSeconds=args.poll, exitWhenIdle=args.once)
+
+    return 0
+
+
+# -----------------------------------------------------------------------------
+# Invoke the main
+# -----------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())